@@ -2,6 +2,12 @@ import demo_models_kp
 
 # GLOBAL VARIABLES
 SET_PTS = [100, 120, 130]
+# Smaller grids for the rough first search and a finer grid to check the optimum with (optimise_manual.py --coarse/--verify)
+COARSE_PTS = [40, 50, 60]
+FINE_PTS = [140, 160, 170]
+# dadi integration timescale_factor (default 1e-3) used to score prescreen points (optimise_manual.py --prescreen),
+# larger is faster and rougher, points with small population sizes take the most time steps
+PRESCREEN_TIMESCALE = 1e-2
 
 
 def get_settings(model, ALL=False):
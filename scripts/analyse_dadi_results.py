@@ -14,11 +14,16 @@ import numpy as np
 import argparse
 import sys
 from pathlib import Path
+import results_db
 
 def load_data(file_path):
-    """Load and clean the dadi optimisation results."""
+    """Load and clean the dadi optimisation results (a dadi_optimisation.txt file or a results database)."""
     try:
-        df = pd.read_csv(file_path, sep='\t')
+        if file_path.endswith('.db'):
+            header, rows = results_db.read_runs(results_db.connect_readonly(file_path))
+            df = pd.DataFrame(rows, columns=header)
+        else:
+            df = pd.read_csv(file_path, sep='\t')
         print(f"Loaded {len(df)} rows from {file_path}")
         return df
     except Exception as e:
@@ -32,6 +37,13 @@ def clean_data(df):
     for col in numeric_cols:
         df[col] = pd.to_numeric(df[col], errors='coerce')
     
+    # Remove runs that were pruned before converging (optimise_manual.py --prune)
+    if 'status' in df.columns:
+        pruned = df['status'] == 'pruned'
+        if pruned.any():
+            print(f"Removed {pruned.sum()} pruned runs")
+        df = df[~pruned]
+
     # Remove rows with missing critical values
     initial_rows = len(df)
     df = df.dropna(subset=['log-likelihood', 'AIC'])
@@ -285,7 +297,7 @@ def save_results(best_models_df, model_summary_df, output_dir, use_best_models_d
 
 def main():
     parser = argparse.ArgumentParser(description='Analyse dadi optimisation results')
-    parser.add_argument('input_file', help='Path to dadi optimisation results file')
+    parser.add_argument('input_file', help='Path to dadi optimisation results file or results database (.db)')
     parser.add_argument('-o', '--output', default='.', help='Output directory for CSV files')
     parser.add_argument('--no-save', action='store_true', help='Do not save CSV files')
     
@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+@author: Katharine Prata
+@date created: 18/10/26
+@description: Batched versions of the one population models that integrate many parameter sets at once.
+
+instant_change and bottleneck from demo_models_kp.py integrate K parameter sets as one (K, pts) phi with dadi's
+implicit scheme (neutral, h = 0.5). Their epochs have constant population sizes, so the time steps of each
+parameter set are combined into a few matrix products (see _integrate_const), in blocks of rows to bound the
+memory. Models whose population size changes within an epoch (e.g., bottlegrowth) have no batched version, as
+one Python step per time step is slower than dadi's own integration.
+
+score() gives the log-likelihoods of K parameter sets against a 1D data spectrum, e.g., a whole prescreen or
+differential evolution generation in optimise_manual.py, and evaluate() the extrapolated model spectra.
+
+Compatible with python 3.6.11 and dadi 2.1.1
+"""
+
+from dadi import Inference, Integration, Numerics, Spectrum
+import demo_models_kp
+import model_eval
+import model_utils
+import numpy
+from scipy.linalg import lapack
+
+# _integrate_const integrates the rows of phi in blocks whose (pts + 1)^2 step matrices take up at most this many
+# bytes per array.
+BLOCK_BYTES = 32 * 2 ** 20
+
+
+def _tridiag(a, b, c, r):
+    """
+    Solve the K tridiagonal systems a[:, i] x[:, i-1] + b[:, i] x[:, i] + c[:, i] x[:, i+1] = r[:, i].
+
+    a[:, 0] and c[:, -1] are zero, so the K systems are one block diagonal tridiagonal system of K * pts rows.
+    """
+    x = lapack.dgtsv(a.ravel()[1:], b.ravel(), c.ravel()[:-1], r.ravel())[3]
+    return x.reshape(r.shape)
+
+
+def _operator(xx, nu):
+    """The a, b and c diagonals of dadi's one population operator for each population size in nu."""
+    dx = numpy.diff(xx)
+    dfactor = numpy.zeros(len(xx))
+    dfactor[1:-1] = 2 / (dx[:-1] + dx[1:])
+    dfactor[0] = 2 / dx[0]
+    dfactor[-1] = 2 / dx[-1]
+    # As Integration._Vfunc, without selection M = 0, and delj = 0.5 drops out.
+    V = 1. / nu[:, numpy.newaxis] * xx * (1 - xx)
+
+    a = numpy.zeros(V.shape)
+    a[:, 1:] += dfactor[1:] * (-V[:, :-1] / (2 * dx))
+    c = numpy.zeros(V.shape)
+    c[:, :-1] += -dfactor[:-1] * (V[:, 1:] / (2 * dx))
+    b = numpy.zeros(V.shape)
+    b[:, :-1] += -dfactor[:-1] * (-V[:, :-1] / (2 * dx))
+    b[:, 1:] += dfactor[1:] * (V[:, 1:] / (2 * dx))
+    b[:, 0] += (0.5 / nu) * 2 / dx[0]
+    b[:, -1] += -(-0.5 / nu) * 2 / dx[-1]
+    return a, b, c
+
+
+def _injection(xx):
+    """Density of new mutations per unit time in phi[1], as Integration._inject_mutations_1D with theta0 = 1."""
+    return 1 / xx[1] * 1.0 / 2 * 2 / (xx[2] - xx[0])
+
+
+def _integrate_const(phi, xx, T, nu):
+    """Integrate with constant population sizes nu (K,), in blocks of rows of at most BLOCK_BYTES per matrix."""
+    rows = max(1, BLOCK_BYTES // (8 * (len(xx) + 1) ** 2))
+    if len(phi) <= rows:
+        return _integrate_block(phi, xx, T, nu)
+    return numpy.concatenate([_integrate_block(phi[i:i + rows], xx, T[i:i + rows], nu[i:i + rows])
+                              for i in range(0, len(phi), rows)])
+
+
+def _integrate_block(phi, xx, T, nu):
+    """
+    Integrate a block of rows with constant population sizes nu (K,).
+
+    dadi takes floor(T / dt) steps of length dt and a last shorter step. Every full step is the same affine map of
+    phi, phi -> (I + dt M)^-1 (phi + dt injection), so the full steps of each row are one power of that map, found
+    by repeated squaring in log2(T / dt) matrix products rather than T / dt solves.
+    """
+    K, n = phi.shape
+    dt = Integration.timescale_factor / (0.25 / nu)
+    steps = numpy.floor(T / dt).astype(int)
+    rest = T - steps * dt
+    a, b, c = _operator(xx, nu)
+
+    implicit = numpy.zeros((K, n, n))
+    diag = numpy.arange(n)
+    implicit[:, diag, diag] = 1 + dt[:, numpy.newaxis] * b
+    implicit[:, diag[1:], diag[:-1]] = dt[:, numpy.newaxis] * a[:, 1:]
+    implicit[:, diag[:-1], diag[1:]] = dt[:, numpy.newaxis] * c[:, :-1]
+    inverse = numpy.linalg.inv(implicit)
+    step = numpy.zeros((K, n + 1, n + 1))
+    step[:, :n, :n] = inverse
+    step[:, :n, n] = inverse[:, :, 1] * (dt * _injection(xx))[:, numpy.newaxis]
+    step[:, n, n] = 1
+
+    power = numpy.tile(numpy.identity(n + 1), (K, 1, 1))
+    while steps.any():
+        odd = steps % 2 == 1
+        power[odd] = step[odd] @ power[odd]
+        steps //= 2
+        squared = steps > 0
+        step[squared] = step[squared] @ step[squared]
+    phi = numpy.einsum("kij,kj->ki", power[:, :n, :n], phi) + power[:, :n, n]
+
+    rows = numpy.nonzero(rest > 0)[0]
+    if len(rows):
+        this_dt = rest[rows, numpy.newaxis]
+        r = phi[rows]
+        r[:, 1] += this_dt[:, 0] * _injection(xx)
+        phi[rows] = _tridiag(a[rows], b[rows] + 1 / this_dt, c[rows], r / this_dt)
+    return phi
+
+
+def integrate(phi, xx, T, nu):
+    """Integrate the rows of phi (K, pts) forward for times T (K,) at constant population sizes nu (K,)."""
+    return _integrate_const(phi, xx, numpy.asarray(T, dtype=float), numpy.asarray(nu, dtype=float))
+
+
+def instant_change(params, pts):
+    """Batched demo_models_kp.instant_change, params is (K, 2) and the result is phi (K, pts)."""
+    nu, T = params.T
+    xx = model_utils.default_grid(pts)
+    phi = numpy.tile(model_utils.equilibrium_phi(xx), (len(params), 1))
+    return integrate(phi, xx, T, nu)
+
+
+def bottleneck(params, pts):
+    """Batched demo_models_kp.bottleneck."""
+    nuB, nuF, TB, TF = params.T
+    xx = model_utils.default_grid(pts)
+    phi = numpy.tile(model_utils.equilibrium_phi(xx), (len(params), 1))
+    phi = integrate(phi, xx, TB, nuB)
+    return integrate(phi, xx, TF, nuF)
+
+
+BATCHED = {demo_models_kp.instant_change: instant_change,
+           demo_models_kp.bottleneck: bottleneck}
+
+
+def batched(model_fun):
+    """The batched version of a model function, or None if there is none."""
+    return BATCHED.get(model_fun)
+
+
+def _valid(params):
+    """Rows that dadi would integrate, the others raise errors (e.g., a population size of 0)."""
+    return numpy.all(numpy.isfinite(params) & (params > 0), axis=1)
+
+
+def evaluate(model_fun, params, ns, pts):
+    """
+    Model spectra of the K parameter sets in params (K, number of parameters), extrapolated as
+    Numerics.make_extrap_log_func does if pts is a list of grid sizes. Invalid parameter sets give None.
+    """
+    params = numpy.atleast_2d(numpy.asarray(params, dtype=float))
+    pts_l = [pts] if numpy.isscalar(pts) else list(pts)
+    valid = numpy.nonzero(_valid(params))[0]
+    spectra = {}
+    for p in pts_l:
+        xx = model_utils.default_grid(p)
+        phi = batched(model_fun)(params[valid], p)
+        spectra[p] = [Spectrum.from_phi(row, ns, (xx,)) for row in phi]
+
+    models = [None] * len(params)
+    if numpy.isscalar(pts):
+        for k, row in enumerate(valid):
+            models[row] = spectra[pts][k]
+        return models
+    extrap = Numerics.make_extrap_log_func(model_eval._lookup)
+    for k, row in enumerate(valid):
+        models[row] = extrap({p: spectra[p][k] for p in pts_l}, pts_l)
+    return models
+
+
+def score(model_fun, params, data, pts):
+    """Log-likelihoods of the K parameter sets in params against data, -inf where the model fails."""
+    scores = numpy.full(len(params), -numpy.inf)
+    with numpy.errstate(all="ignore"):
+        for k, model in enumerate(evaluate(model_fun, params, data.sample_sizes, pts)):
+            if model is not None:
+                ll = Inference.ll_multinom(model, data)
+                scores[k] = ll if numpy.isfinite(ll) else -numpy.inf
+    return scores
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+@author: Katharine Prata
+@date created: 18/10/26
+@description: Micro-benchmark of the grid and equilibrium phi set-up that every model evaluation repeats.
+
+Times Numerics.default_grid, PhiManip.phi_1D and phi_1D_to_2D at each PTS grid size against the cached
+model_utils.default_grid and equilibrium_phi, and reports the saving per extrapolated evaluation (one per grid size).
+
+python benchmark_grids.py
+python benchmark_grids.py --pts 40 50 60 -n 2000
+
+Compatible with python 3.6.11 and dadi 2.1.1
+"""
+
+import argparse
+import model_utils
+import SETTINGS
+import timeit
+from dadi import Numerics, PhiManip
+
+
+def uncached(pts):
+    xx = Numerics.default_grid(pts)
+    phi = PhiManip.phi_1D(xx)
+    return PhiManip.phi_1D_to_2D(xx, phi)
+
+
+def cached(pts):
+    xx = model_utils.default_grid(pts)
+    return model_utils.equilibrium_phi(xx, dims=2)
+
+
+def main(PTS, number):
+    print("Grid and equilibrium phi set-up, mean of {} calls\n".format(number))
+    print("{:<8}{:<16}{:<16}".format("pts", "uncached (us)", "cached (us)"))
+    total_uncached = 0
+    total_cached = 0
+    for pts in PTS:
+        t_uncached = timeit.timeit(lambda: uncached(pts), number=number) / number * 1e6
+        cached(pts)
+        t_cached = timeit.timeit(lambda: cached(pts), number=number) / number * 1e6
+        total_uncached += t_uncached
+        total_cached += t_cached
+        print("{:<8}{:<16.1f}{:<16.1f}".format(pts, t_uncached, t_cached))
+    print("\nPer extrapolated evaluation at PTS {}: {:.1f} us uncached, {:.1f} us cached, {:.1f} us saved"
+          .format(PTS, total_uncached, total_cached, total_uncached - total_cached))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        prog="Benchmark grids",
+        description="Time the per-evaluation grid and equilibrium phi set-up with and without the model_utils cache."
+    )
+    parser.add_argument(
+        "--pts",
+        nargs="+", type=int, default=SETTINGS.SET_PTS,
+        help="Grid sizes (default: SETTINGS.SET_PTS)."
+    )
+    parser.add_argument(
+        "-n", "--number",
+        type=int, default=1000,
+        help="Calls to time per grid size (default: 1000)."
+    )
+    args = parser.parse_args()
+
+    main(args.pts, args.number)
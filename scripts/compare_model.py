@@ -13,7 +13,8 @@ import argparse
 import numpy as np
 import matplotlib.pyplot as plt
 import os
-from dadi import Plotting, Spectrum, Numerics, Inference
+from dadi import Plotting, Spectrum, Inference
+import model_eval
 import SETTINGS
 
 
@@ -100,7 +101,7 @@ def main(data, model, mask, fold, opt, PTS, resid_range):
     print()
 
     # Simulate the model
-    model_func = Numerics.make_extrap_log_func(SETTINGS.get_settings(model))
+    model_func = model_eval.cached_extrap_func(SETTINGS.get_settings(model))
     sim_model = model_func(opt, fs.sample_sizes, PTS)
     theta = Inference.optimal_sfs_scaling(sim_model, fs)
     scaled_model = sim_model * theta
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+@author: Katharine Prata
+@date created: 18/10/26
+@description: Fit one parameter set to several versions of the spectrum of a pop pair, e.g., full, projected and
+masked, to compare projection and masking choices.
+
+Each spectrum is read from ../data/fs/<fs>.fs and masked with each of --masks as in optimise_manual.py. The model
+is integrated once per PTS grid size and only sampled again at the sample sizes of each spectrum, if it memoises
+its phi (see model_eval.evaluate_targets); a model that does not is integrated again, which is reported.
+
+python compare_targets.py iso_inbred group1-group2 group1-group2_projected0.8 --masks none low -o 1 1 0.1 0.1 1
+
+Compatible with python 3.6.11 and dadi 2.1.1
+"""
+
+import argparse
+import model_eval
+import model_utils
+import numpy
+import optimise_manual
+import SETTINGS
+
+
+def main(model, fs_names, masks, params, PTS):
+    model_fun = SETTINGS.get_settings(model)
+    func_ex = model_eval.cached_extrap_func(model_fun)
+
+    targets = []
+    labels = []
+    for fs in fs_names:
+        for masked in masks:
+            targets.append(optimise_manual.load_data(fs, masked))
+            labels.append((fs, masked))
+
+    results, integrated = model_eval.evaluate_targets(func_ex, params, targets, PTS)
+
+    print("\n* * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * *\n")
+    print("Model {} with parameters {}\n".format(model, params))
+    print("{:<40}{:<8}{:<16}{:<16}{:<12}".format("fs", "mask", "sample sizes", "log-likelihood", "theta"))
+    for (fs, masked), data, (sim_model, ll, theta) in zip(labels, targets, results):
+        print("{:<40}{:<8}{:<16}{:<16}{:<12}".format(fs, masked, ",".join(str(int(n)) for n in data.sample_sizes),
+                                                     numpy.around(ll, 4), numpy.around(theta, 4)))
+    print()
+    if integrated:
+        print("Model {} does not memoise its phi, it was integrated again for {} of the other sample sizes\n"
+              .format(model, integrated))
+    model_eval.print_cache_info()
+    model_utils.print_phi_cache_info()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        prog="Compare targets",
+        description="Log-likelihood of one parameter set for several spectra and masks of the same populations.",
+        usage="%(prog)s [options] <model> <fs> [<fs> ...] -o params"
+    )
+    parser.add_argument(
+        "model",
+        help="Model nickname as in SETTINGS.py, e.g., iso_inbred."
+    )
+    parser.add_argument(
+        "fs",
+        nargs="+",
+        help="Spectrum names without .fs in ../data/fs/, e.g., group1-group2 group1-group2_projected0.8."
+    )
+    parser.add_argument(
+        "--masks",
+        nargs="+", default=["none"],
+        help="Masks to apply to every spectrum: none, low or mid (default: none)."
+    )
+    parser.add_argument(
+        "-o", "--opt",
+        nargs="+", type=float, required=True,
+        help="Parameters of the model."
+    )
+    args = parser.parse_args()
+
+    PTS = SETTINGS.SET_PTS
+    main(args.model, args.fs, args.masks, args.opt, PTS)
@@ -12,8 +12,9 @@ Compatible with python 3.6.11 and dadi 2.1.1
 """
 
 from argparse import Namespace
-from dadi import Numerics, Spectrum, Inference, Godambe
+from dadi import Spectrum, Inference, Godambe
 import demo_models_kp
+import model_eval
 import numpy as np
 import argparse
 import plot_fs
@@ -50,7 +51,7 @@ def main(filepath, bootpath, function, model, eps, opt, PTS):
     model_fun, num, p_labels, upper, lower = SETTINGS.get_settings(model, ALL=True)
 
     # Model function
-    func_ex = Numerics.make_extrap_log_func(model_fun)
+    func_ex = model_eval.cached_extrap_func(model_fun)
     sim_model = func_ex(opt, ns, PTS)
     ll_model = Inference.ll_multinom(sim_model, fs)
 
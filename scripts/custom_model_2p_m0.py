@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 
-import dadi
-from dadi import Numerics, PhiManip, Integration, Spectrum
+from dadi import Spectrum
+import model_utils
 
 def model_func(params, ns, pts):
     """
@@ -14,26 +14,19 @@ def model_func(params, ns, pts):
 
     _Nanc_size = 1.0  # This value can be used in splits with fractions
      
-    xx = Numerics.default_grid(pts)
-
-    # First time period: mix no migration at P1 with 1-P1 gene flow
-    phiN1 = PhiManip.phi_1D(xx)
-    phiN1 = PhiManip.phi_1D_to_2D(xx, phiN1)
-    phiN1 = Integration.two_pops(phiN1, xx, T=t1, nu1=nu_1, nu2=nu_2, m12=0, m21=0)
-    phiN1 = Integration.two_pops(phiN1, xx, T=t1, nu1=nu11, nu2=nu12, m12=0, m21=0)
-
-    phiI1 = PhiManip.phi_1D(xx)
-    phiI1 = PhiManip.phi_1D_to_2D(xx, phiI1)
-    phiI1 = Integration.two_pops(phiI1, xx, T=t1, nu1=nu_1, nu2=nu_2, m12=0, m21=0)
-    phiI1 = Integration.two_pops(phiI1, xx, T=t1, nu1=nu11, nu2=nu12, m12=me1_12, m21=me1_21)
-
-    phi1 = P1 * phiN1 + (1 - P1) * phiI1
-
-    # Second time period: mix no migration at P2 with 1-P2 gene flow
-    phiN2 = Integration.two_pops(phi1, xx, T=t2, nu1=nu21, nu2=nu22, m12=0, m21=0)
-    phiI2 = Integration.two_pops(phi1, xx, T=t2, nu1=nu21, nu2=nu22, m12=me2_12, m21=me2_21)
-
-    phi = P2 * phiN2 + (1 - P2) * phiI2
+    xx = model_utils.default_grid(pts)
+
+    # First time period: mix no migration at P1 with 1-P1 gene flow, then
+    # second time period: mix no migration at P2 with 1-P2 gene flow
+    phiN2, phiI2 = model_utils.memoised_two_periods("custom_model_2p_m0.model_func", xx, pts, [
+        [dict(T=t1, nu1=nu_1, nu2=nu_2, m12=0, m21=0),
+         dict(T=t1, nu1=nu11, nu2=nu12, m12=0, m21=0)],
+        [dict(T=t1, nu1=nu_1, nu2=nu_2, m12=0, m21=0),
+         dict(T=t1, nu1=nu11, nu2=nu12, m12=me1_12, m21=me1_21)]], P1, [
+        [dict(T=t2, nu1=nu21, nu2=nu22, m12=0, m21=0)],
+        [dict(T=t2, nu1=nu21, nu2=nu22, m12=me2_12, m21=me2_21)]])
+
+    phi = model_utils.mix_phi(phiN2, phiI2, P2)
 
     fs = Spectrum.from_phi(phi, ns, [xx]*len(ns))
     return fs
@@ -8,8 +8,8 @@
 
 Compatible with python 3.6.11 and 2.1.1
 """
-from dadi import Numerics, PhiManip, Integration, Spectrum
-import numpy as np
+from dadi import PhiManip, Integration, Spectrum
+import model_utils
 
 
 # Models for testing one population scenarios.
@@ -23,8 +23,8 @@ def no_divergence_1d(notused, ns, pts):
     n1: Number of samples in resulting Spectrum
     pts: Number of grid points to use in integration.
     """
-    xx = Numerics.default_grid(pts)
-    phi = PhiManip.phi_1D(xx)
+    xx = model_utils.default_grid(pts)
+    phi = model_utils.equilibrium_phi(xx)
 
     fs = Spectrum.from_phi(phi, ns, (xx,))
     return fs
@@ -45,10 +45,10 @@ def instant_change(params, ns, pts):
     """
     nu, T = params
 
-    xx = Numerics.default_grid(pts)
-    phi = PhiManip.phi_1D(xx)
+    xx = model_utils.default_grid(pts)
 
-    phi = Integration.one_pop(phi, xx, T, nu)
+    phi = model_utils.memoised_phi("instant_change", xx, pts, [
+        (Integration.one_pop, dict(T=T, nu=nu))])
 
     fs = Spectrum.from_phi(phi, ns, (xx,))
     return fs
@@ -71,11 +71,12 @@ def bottlegrowth(params, ns, pts):
     """
     nuB, nuF, T = params
 
-    xx = Numerics.default_grid(pts)
-    phi = PhiManip.phi_1D(xx)
+    xx = model_utils.default_grid(pts)
 
-    nu_func = lambda t: nuB * np.exp(np.log(nuF / nuB) * t / T)
-    phi = Integration.one_pop(phi, xx, T, nu_func)
+    nu_func = model_utils.ExpGrowth(nuB, nuF, T)
+
+    phi = model_utils.memoised_phi("bottlegrowth", xx, pts, [
+        (Integration.one_pop, dict(T=T, nu=nu_func))])
 
     fs = Spectrum.from_phi(phi, ns, (xx,))
     return fs
@@ -84,11 +85,11 @@ def bottlegrowth(params, ns, pts):
 def bottleneck(params, ns, pts):
     nuB, nuF, TB, TF = params
 
-    xx = Numerics.default_grid(pts)
-    phi = PhiManip.phi_1D(xx)
+    xx = model_utils.default_grid(pts)
 
-    phi = Integration.one_pop(phi, xx, TB, nuB)
-    phi = Integration.one_pop(phi, xx, TF, nuF)
+    phi = model_utils.memoised_phi("bottleneck", xx, pts, [
+        (Integration.one_pop, dict(T=TB, nu=nuB)),
+        (Integration.one_pop, dict(T=TF, nu=nuF))])
 
     fs = Spectrum.from_phi(phi, ns, (xx,))
     return fs
@@ -100,10 +101,9 @@ def no_divergence(notused, ns, pts):
     Standard neutral model, populations never diverge.
     """
 
-    xx = Numerics.default_grid(pts)
+    xx = model_utils.default_grid(pts)
 
-    phi = PhiManip.phi_1D(xx)
-    phi = PhiManip.phi_1D_to_2D(xx, phi)
+    phi = model_utils.equilibrium_phi(xx, dims=2)
 
     fs = Spectrum.from_phi(phi, ns, (xx, xx))
     return fs
@@ -119,12 +119,11 @@ def no_migration(params, ns, pts):
     """
     nu1, nu2, T = params
 
-    xx = Numerics.default_grid(pts)
-
-    phi = PhiManip.phi_1D(xx)
-    phi = PhiManip.phi_1D_to_2D(xx, phi)
+    xx = model_utils.default_grid(pts)
 
-    phi = Integration.two_pops(phi, xx, T, nu1, nu2, m12=0, m21=0)
+    phi = model_utils.memoised_phi("no_migration", xx, pts, [
+        (PhiManip.phi_1D_to_2D, {}),
+        (Integration.two_pops, dict(T=T, nu1=nu1, nu2=nu2, m12=0, m21=0))])
 
     fs = Spectrum.from_phi(phi, ns, (xx, xx))
     return fs
@@ -141,12 +140,11 @@ def sym_migration(params, ns, pts):
     """
     nu1, nu2, m, T = params
 
-    xx = Numerics.default_grid(pts)
+    xx = model_utils.default_grid(pts)
 
-    phi = PhiManip.phi_1D(xx)
-    phi = PhiManip.phi_1D_to_2D(xx, phi)
-
-    phi = Integration.two_pops(phi, xx, T, nu1, nu2, m12=m, m21=m)
+    phi = model_utils.memoised_phi("sym_migration", xx, pts, [
+        (PhiManip.phi_1D_to_2D, {}),
+        (Integration.two_pops, dict(T=T, nu1=nu1, nu2=nu2, m12=m, m21=m))])
 
     fs = Spectrum.from_phi(phi, ns, (xx, xx))
     return fs
@@ -163,12 +161,12 @@ def asym_migration(params, ns, pts):
     m21: Migration from pop 1 to pop 2
     """
     nu1, nu2, m12, m21, T = params
-    xx = Numerics.default_grid(pts)
+    xx = model_utils.default_grid(pts)
 
-    phi = PhiManip.phi_1D(xx)
-    phi = PhiManip.phi_1D_to_2D(xx, phi)
+    phi = model_utils.memoised_phi("asym_migration", xx, pts, [
+        (PhiManip.phi_1D_to_2D, {}),
+        (Integration.two_pops, dict(T=T, nu1=nu1, nu2=nu2, m12=m12, m21=m21))])
 
-    phi = Integration.two_pops(phi, xx, T, nu1, nu2, m12=m12, m21=m21)
     fs = Spectrum.from_phi(phi, ns, (xx, xx))
     return fs
 
@@ -193,16 +191,15 @@ def split_bottlegrowth(params, ns, pts):
     """
     nu1, nu2, nu1F, nu2F, T1, T2 = params
 
-    xx = Numerics.default_grid(pts)
-
-    phi = PhiManip.phi_1D(xx)
-    phi = PhiManip.phi_1D_to_2D(xx, phi)
+    xx = model_utils.default_grid(pts)
 
-    nu_func1 = lambda T1: nu1 * np.exp(np.log(nu1F / nu1) * T1 / T2)
-    nu_func2 = lambda T1: nu2 * np.exp(np.log(nu2F / nu2) * T1 / T2)
+    nu_func1 = model_utils.ExpGrowth(nu1, nu1F, T2)
+    nu_func2 = model_utils.ExpGrowth(nu2, nu2F, T2)
 
-    phi = Integration.two_pops(phi, xx, T1, nu1=nu1, nu2=nu2, m12=0, m21=0)
-    phi = Integration.two_pops(phi, xx, T2, nu1=nu_func1, nu2=nu_func2, m12=0, m21=0)
+    phi = model_utils.memoised_phi("split_bottlegrowth", xx, pts, [
+        (PhiManip.phi_1D_to_2D, {}),
+        (Integration.two_pops, dict(T=T1, nu1=nu1, nu2=nu2, m12=0, m21=0)),
+        (Integration.two_pops, dict(T=T2, nu1=nu_func1, nu2=nu_func2, m12=0, m21=0))])
 
     fs = Spectrum.from_phi(phi, ns, (xx, xx))
     return fs
@@ -232,16 +229,15 @@ def split_bottlegrowth_asym_mig(params, ns, pts):
     """
     nu1, nu2, nu1F, nu2F, T1, T2, m12T1, m21T1, m12T2, m21T2 = params
 
-    xx = Numerics.default_grid(pts)
+    xx = model_utils.default_grid(pts)
 
-    phi = PhiManip.phi_1D(xx)
-    phi = PhiManip.phi_1D_to_2D(xx, phi)
+    nu_func1 = model_utils.ExpGrowth(nu1, nu1F, T2)
+    nu_func2 = model_utils.ExpGrowth(nu2, nu2F, T2)
 
-    nu_func1 = lambda T1: nu1 * np.exp(np.log(nu1F / nu1) * T1 / T2)
-    nu_func2 = lambda T1: nu2 * np.exp(np.log(nu2F / nu2) * T1 / T2)
-
-    phi = Integration.two_pops(phi, xx, T1, nu1=nu1, nu2=nu2, m12=m12T1, m21=m21T1)
-    phi = Integration.two_pops(phi, xx, T2, nu1=nu_func1, nu2=nu_func2, m12=m12T2, m21=m21T2)
+    phi = model_utils.memoised_phi("split_bottlegrowth_asym_mig", xx, pts, [
+        (PhiManip.phi_1D_to_2D, {}),
+        (Integration.two_pops, dict(T=T1, nu1=nu1, nu2=nu2, m12=m12T1, m21=m21T1)),
+        (Integration.two_pops, dict(T=T2, nu1=nu_func1, nu2=nu_func2, m12=m12T2, m21=m21T2))])
 
     fs = Spectrum.from_phi(phi, ns, (xx, xx))
     return fs
@@ -269,16 +265,15 @@ def split_bottlegrowth_ancient_asym_mig(params, ns, pts):
     """
     nu1, nu2, nu1F, nu2F, T1, T2, m12, m21 = params
 
-    xx = Numerics.default_grid(pts)
-
-    phi = PhiManip.phi_1D(xx)
-    phi = PhiManip.phi_1D_to_2D(xx, phi)
+    xx = model_utils.default_grid(pts)
 
-    nu_func1 = lambda T1: nu1 * np.exp(np.log(nu1F / nu1) * T1 / T2)
-    nu_func2 = lambda T1: nu2 * np.exp(np.log(nu2F / nu2) * T1 / T2)
+    nu_func1 = model_utils.ExpGrowth(nu1, nu1F, T2)
+    nu_func2 = model_utils.ExpGrowth(nu2, nu2F, T2)
 
-    phi = Integration.two_pops(phi, xx, T1, nu1=nu1, nu2=nu2, m12=m12, m21=m21)
-    phi = Integration.two_pops(phi, xx, T2, nu1=nu_func1, nu2=nu_func2, m12=0, m21=0)
+    phi = model_utils.memoised_phi("split_bottlegrowth_ancient_asym_mig", xx, pts, [
+        (PhiManip.phi_1D_to_2D, {}),
+        (Integration.two_pops, dict(T=T1, nu1=nu1, nu2=nu2, m12=m12, m21=m21)),
+        (Integration.two_pops, dict(T=T2, nu1=nu_func1, nu2=nu_func2, m12=0, m21=0))])
 
     fs = Spectrum.from_phi(phi, ns, (xx, xx))
     return fs
@@ -306,16 +301,15 @@ def split_bottlegrowth_second_asym_mig(params, ns, pts):
     """
     nu1, nu2, nu1F, nu2F, T1, T2, m12, m21 = params
 
-    xx = Numerics.default_grid(pts)
-
-    phi = PhiManip.phi_1D(xx)
-    phi = PhiManip.phi_1D_to_2D(xx, phi)
+    xx = model_utils.default_grid(pts)
 
-    nu_func1 = lambda T1: nu1 * np.exp(np.log(nu1F / nu1) * T1 / T2)
-    nu_func2 = lambda T1: nu2 * np.exp(np.log(nu2F / nu2) * T1 / T2)
+    nu_func1 = model_utils.ExpGrowth(nu1, nu1F, T2)
+    nu_func2 = model_utils.ExpGrowth(nu2, nu2F, T2)
 
-    phi = Integration.two_pops(phi, xx, T1, nu1=nu1, nu2=nu2, m12=0, m21=0)
-    phi = Integration.two_pops(phi, xx, T2, nu1=nu_func1, nu2=nu_func2, m12=m12, m21=m21)
+    phi = model_utils.memoised_phi("split_bottlegrowth_second_asym_mig", xx, pts, [
+        (PhiManip.phi_1D_to_2D, {}),
+        (Integration.two_pops, dict(T=T1, nu1=nu1, nu2=nu2, m12=0, m21=0)),
+        (Integration.two_pops, dict(T=T2, nu1=nu_func1, nu2=nu_func2, m12=m12, m21=m21))])
 
     fs = Spectrum.from_phi(phi, ns, (xx, xx))
     return fs
@@ -341,13 +335,12 @@ def split_sizechange(params, ns, pts):
     """
     nu1T1, nu2T1, nu1T2, nu2T2, T1, T2 = params
 
-    xx = Numerics.default_grid(pts)
+    xx = model_utils.default_grid(pts)
 
-    phi = PhiManip.phi_1D(xx)
-    phi = PhiManip.phi_1D_to_2D(xx, phi)
-
-    phi = Integration.two_pops(phi, xx, T1, nu1=nu1T1, nu2=nu2T1, m12=0, m21=0)
-    phi = Integration.two_pops(phi, xx, T2, nu1=nu1T2, nu2=nu2T2, m12=0, m21=0)
+    phi = model_utils.memoised_phi("split_sizechange", xx, pts, [
+        (PhiManip.phi_1D_to_2D, {}),
+        (Integration.two_pops, dict(T=T1, nu1=nu1T1, nu2=nu2T1, m12=0, m21=0)),
+        (Integration.two_pops, dict(T=T2, nu1=nu1T2, nu2=nu2T2, m12=0, m21=0))])
 
     fs = Spectrum.from_phi(phi, ns, (xx, xx))
     return fs
@@ -377,13 +370,12 @@ def split_sizechange_asym_mig(params, ns, pts):
     """
     nu1T1, nu2T1, nu1T2, nu2T2, T1, T2, m12T1, m21T1, m12T2, m21T2 = params
 
-    xx = Numerics.default_grid(pts)
-
-    phi = PhiManip.phi_1D(xx)
-    phi = PhiManip.phi_1D_to_2D(xx, phi)
+    xx = model_utils.default_grid(pts)
 
-    phi = Integration.two_pops(phi, xx, T1, nu1=nu1T1, nu2=nu2T1, m12=m12T1, m21=m21T1)
-    phi = Integration.two_pops(phi, xx, T2, nu1=nu1T2, nu2=nu2T2, m12=m12T2, m21=m21T2)
+    phi = model_utils.memoised_phi("split_sizechange_asym_mig", xx, pts, [
+        (PhiManip.phi_1D_to_2D, {}),
+        (Integration.two_pops, dict(T=T1, nu1=nu1T1, nu2=nu2T1, m12=m12T1, m21=m21T1)),
+        (Integration.two_pops, dict(T=T2, nu1=nu1T2, nu2=nu2T2, m12=m12T2, m21=m21T2))])
 
     fs = Spectrum.from_phi(phi, ns, (xx, xx))
     return fs
@@ -411,13 +403,12 @@ def split_sizechange_ancient_asym_mig(params, ns, pts):
     """
     nu1T1, nu2T1, nu1T2, nu2T2, T1, T2, m12, m21 = params
 
-    xx = Numerics.default_grid(pts)
+    xx = model_utils.default_grid(pts)
 
-    phi = PhiManip.phi_1D(xx)
-    phi = PhiManip.phi_1D_to_2D(xx, phi)
-
-    phi = Integration.two_pops(phi, xx, T1, nu1=nu1T1, nu2=nu2T1, m12=m12, m21=m21)
-    phi = Integration.two_pops(phi, xx, T2, nu1=nu1T2, nu2=nu2T2, m12=0, m21=0)
+    phi = model_utils.memoised_phi("split_sizechange_ancient_asym_mig", xx, pts, [
+        (PhiManip.phi_1D_to_2D, {}),
+        (Integration.two_pops, dict(T=T1, nu1=nu1T1, nu2=nu2T1, m12=m12, m21=m21)),
+        (Integration.two_pops, dict(T=T2, nu1=nu1T2, nu2=nu2T2, m12=0, m21=0))])
 
     fs = Spectrum.from_phi(phi, ns, (xx, xx))
     return fs
@@ -445,13 +436,12 @@ def split_sizechange_second_asym_mig(params, ns, pts):
     """
     nu1T1, nu2T1, nu1T2, nu2T2, T1, T2, m12, m21 = params
 
-    xx = Numerics.default_grid(pts)
-
-    phi = PhiManip.phi_1D(xx)
-    phi = PhiManip.phi_1D_to_2D(xx, phi)
+    xx = model_utils.default_grid(pts)
 
-    phi = Integration.two_pops(phi, xx, T1, nu1=nu1T1, nu2=nu2T1, m12=0, m21=0)
-    phi = Integration.two_pops(phi, xx, T2, nu1=nu1T2, nu2=nu2T2, m12=m12, m21=m21)
+    phi = model_utils.memoised_phi("split_sizechange_second_asym_mig", xx, pts, [
+        (PhiManip.phi_1D_to_2D, {}),
+        (Integration.two_pops, dict(T=T1, nu1=nu1T1, nu2=nu2T1, m12=0, m21=0)),
+        (Integration.two_pops, dict(T=T2, nu1=nu1T2, nu2=nu2T2, m12=m12, m21=m21))])
 
     fs = Spectrum.from_phi(phi, ns, (xx, xx))
     return fs
@@ -471,21 +461,13 @@ def hetero_asym_migration(params, ns, pts):
     P: The proportion of the genome evolving neutrally
     """
     nu1, nu2, m12, m21, me12, me21, T, P = params
-    xx = Numerics.default_grid(pts)
-
-    phiN = PhiManip.phi_1D(xx)
-    phiN = PhiManip.phi_1D_to_2D(xx, phiN)
-
-    phiN = Integration.two_pops(phiN, xx, T, nu1, nu2, m12=m12, m21=m21)
-    fsN = Spectrum.from_phi(phiN, ns, (xx, xx))
-
-    phiI = PhiManip.phi_1D(xx)
-    phiI = PhiManip.phi_1D_to_2D(xx, phiI)
+    xx = model_utils.default_grid(pts)
 
-    phiI = Integration.two_pops(phiI, xx, T, nu1, nu2, m12=me12, m21=me21)
-    fsI = Spectrum.from_phi(phiI, ns, (xx, xx))
+    phiN, phiI = model_utils.memoised_branches("hetero_asym_migration", xx, pts, [
+        [dict(T=T, nu1=nu1, nu2=nu2, m12=m12, m21=m21)],
+        [dict(T=T, nu1=nu1, nu2=nu2, m12=me12, m21=me21)]])
 
-    fs = P * fsN + (1 - P) * fsI
+    fs = model_utils.mixed_spectrum(phiN, phiI, P, ns, xx)
     return fs
 
 
@@ -505,27 +487,13 @@ def anc_hetero_asym_migration(params, ns, pts):
     """
     nu1, nu2, m12, m21, me12, me21, T1, T2, P = params
 
-    xx = Numerics.default_grid(pts)
+    xx = model_utils.default_grid(pts)
 
-    phiN = PhiManip.phi_1D(xx)
-    phiN = PhiManip.phi_1D_to_2D(xx, phiN)
+    phiN, phiI = model_utils.memoised_branches("anc_hetero_asym_migration", xx, pts, [
+        [dict(T=T1, nu1=nu1, nu2=nu2, m12=m12, m21=m21), dict(T=T2, nu1=nu1, nu2=nu2, m12=0, m21=0)],
+        [dict(T=T1, nu1=nu1, nu2=nu2, m12=me12, m21=me21), dict(T=T2, nu1=nu1, nu2=nu2, m12=0, m21=0)]])
 
-    phiN = Integration.two_pops(phiN, xx, T1, nu1, nu2, m12=m12, m21=m21)
-
-    phiN = Integration.two_pops(phiN, xx, T2, nu1, nu2, m12=0, m21=0)
-
-    fsN = Spectrum.from_phi(phiN, ns, (xx, xx))
-
-    phiI = PhiManip.phi_1D(xx)
-    phiI = PhiManip.phi_1D_to_2D(xx, phiI)
-
-    phiI = Integration.two_pops(phiI, xx, T1, nu1, nu2, m12=me12, m21=me21)
-
-    phiI = Integration.two_pops(phiI, xx, T2, nu1, nu2, m12=0, m21=0)
-
-    fsI = Spectrum.from_phi(phiI, ns, (xx, xx))
-
-    fs = P * fsN + (1 - P) * fsI
+    fs = model_utils.mixed_spectrum(phiN, phiI, P, ns, xx)
     return fs
 
 
@@ -545,27 +513,14 @@ def sec_contact_hetero_asym_migration(params, ns, pts):
     """
     nu1, nu2, m12, m21, me12, me21, T1, T2, P = params
 
-    xx = Numerics.default_grid(pts)
-
-    phiN = PhiManip.phi_1D(xx)
-    phiN = PhiManip.phi_1D_to_2D(xx, phiN)
-
-    phiN = Integration.two_pops(phiN, xx, T1, nu1, nu2, m12=0, m21=0)
-
-    phiN = Integration.two_pops(phiN, xx, T2, nu1, nu2, m12=m12, m21=m21)
-
-    fsN = Spectrum.from_phi(phiN, ns, (xx, xx))
-
-    phiI = PhiManip.phi_1D(xx)
-    phiI = PhiManip.phi_1D_to_2D(xx, phiI)
-
-    phiI = Integration.two_pops(phiI, xx, T1, nu1, nu2, m12=0, m21=0)
-
-    phiI = Integration.two_pops(phiI, xx, T2, nu1, nu2, m12=me12, m21=me21)
+    xx = model_utils.default_grid(pts)
 
-    fsI = Spectrum.from_phi(phiI, ns, (xx, xx))
+    # The first epoch, without migration, is the same for both parts of the genome and is integrated once.
+    phiN, phiI = model_utils.memoised_branches("sec_contact_hetero_asym_migration", xx, pts, [
+        [dict(T=T1, nu1=nu1, nu2=nu2, m12=0, m21=0), dict(T=T2, nu1=nu1, nu2=nu2, m12=m12, m21=m21)],
+        [dict(T=T1, nu1=nu1, nu2=nu2, m12=0, m21=0), dict(T=T2, nu1=nu1, nu2=nu2, m12=me12, m21=me21)]])
 
-    fs = P * fsN + (1 - P) * fsI
+    fs = model_utils.mixed_spectrum(phiN, phiI, P, ns, xx)
     return fs
 
 
@@ -598,28 +553,18 @@ def split_bottlegrowth_hetero_asym_mig(params, ns, pts):
     """
     nu1, nu2, nu1F, nu2F, T1, T2, m12T1, m21T1, me12T1, me21T1, m12T2, m21T2, me12T2, me21T2, P = params
 
-    xx = Numerics.default_grid(pts)
+    xx = model_utils.default_grid(pts)
 
-    phiN = PhiManip.phi_1D(xx)
-    phiN = PhiManip.phi_1D_to_2D(xx, phiN)
+    nu_func1 = model_utils.ExpGrowth(nu1, nu1F, T2)
+    nu_func2 = model_utils.ExpGrowth(nu2, nu2F, T2)
 
-    nu_func1 = lambda T1: nu1 * np.exp(np.log(nu1F / nu1) * T1 / T2)
-    nu_func2 = lambda T1: nu2 * np.exp(np.log(nu2F / nu2) * T1 / T2)
+    phiN, phiI = model_utils.memoised_branches("split_bottlegrowth_hetero_asym_mig", xx, pts, [
+        [dict(T=T1, nu1=nu1, nu2=nu2, m12=m12T1, m21=m21T1),
+         dict(T=T2, nu1=nu_func1, nu2=nu_func2, m12=m12T2, m21=m21T2)],
+        [dict(T=T1, nu1=nu1, nu2=nu2, m12=me12T1, m21=me21T1),
+         dict(T=T2, nu1=nu_func1, nu2=nu_func2, m12=me12T2, m21=me21T2)]])
 
-    phiN = Integration.two_pops(phiN, xx, T1, nu1=nu1, nu2=nu2, m12=m12T1, m21=m21T1)
-    phiN = Integration.two_pops(phiN, xx, T2, nu1=nu_func1, nu2=nu_func2, m12=m12T2, m21=m21T2)
-
-    fsN = Spectrum.from_phi(phiN, ns, (xx, xx))
-
-    phiI = PhiManip.phi_1D(xx)
-    phiI = PhiManip.phi_1D_to_2D(xx, phiI)
-
-    phiI = Integration.two_pops(phiI, xx, T1, nu1=nu1, nu2=nu2, m12=me12T1, m21=me21T1)
-    phiI = Integration.two_pops(phiI, xx, T2, nu1=nu_func1, nu2=nu_func2, m12=me12T2, m21=me21T2)
-
-    fsI = Spectrum.from_phi(phiI, ns, (xx, xx))
-
-    fs = P * fsN + (1 - P) * fsI
+    fs = model_utils.mixed_spectrum(phiN, phiI, P, ns, xx)
     return fs
 
 
@@ -648,28 +593,16 @@ def split_bottlegrowth_ancient_hetero_asym_mig(params, ns, pts):
     """
     nu1, nu2, nu1F, nu2F, T1, T2, m12, m21, me12, me21, P = params
 
-    xx = Numerics.default_grid(pts)
-
-    phiN = PhiManip.phi_1D(xx)
-    phiN = PhiManip.phi_1D_to_2D(xx, phiN)
-
-    nu_func1 = lambda T1: nu1 * np.exp(np.log(nu1F / nu1) * T1 / T2)
-    nu_func2 = lambda T1: nu2 * np.exp(np.log(nu2F / nu2) * T1 / T2)
+    xx = model_utils.default_grid(pts)
 
-    phiN = Integration.two_pops(phiN, xx, T1, nu1=nu1, nu2=nu2, m12=m12, m21=m21)
-    phiN = Integration.two_pops(phiN, xx, T2, nu1=nu_func1, nu2=nu_func2, m12=0, m21=0)
+    nu_func1 = model_utils.ExpGrowth(nu1, nu1F, T2)
+    nu_func2 = model_utils.ExpGrowth(nu2, nu2F, T2)
 
-    fsN = Spectrum.from_phi(phiN, ns, (xx, xx))
+    phiN, phiI = model_utils.memoised_branches("split_bottlegrowth_ancient_hetero_asym_mig", xx, pts, [
+        [dict(T=T1, nu1=nu1, nu2=nu2, m12=m12, m21=m21), dict(T=T2, nu1=nu_func1, nu2=nu_func2, m12=0, m21=0)],
+        [dict(T=T1, nu1=nu1, nu2=nu2, m12=me12, m21=me21), dict(T=T2, nu1=nu_func1, nu2=nu_func2, m12=0, m21=0)]])
 
-    phiI = PhiManip.phi_1D(xx)
-    phiI = PhiManip.phi_1D_to_2D(xx, phiI)
-
-    phiI = Integration.two_pops(phiI, xx, T1, nu1=nu1, nu2=nu2, m12=me12, m21=me21)
-    phiI = Integration.two_pops(phiI, xx, T2, nu1=nu_func1, nu2=nu_func2, m12=0, m21=0)
-
-    fsI = Spectrum.from_phi(phiI, ns, (xx, xx))
-
-    fs = P * fsN + (1 - P) * fsI
+    fs = model_utils.mixed_spectrum(phiN, phiI, P, ns, xx)
     return fs
 
 
@@ -698,28 +631,17 @@ def split_bottlegrowth_second_hetero_asym_mig(params, ns, pts):
     """
     nu1, nu2, nu1F, nu2F, T1, T2, m12, m21, me12, me21, P = params
 
-    xx = Numerics.default_grid(pts)
-
-    phiN = PhiManip.phi_1D(xx)
-    phiN = PhiManip.phi_1D_to_2D(xx, phiN)
-
-    nu_func1 = lambda T1: nu1 * np.exp(np.log(nu1F / nu1) * T1 / T2)
-    nu_func2 = lambda T1: nu2 * np.exp(np.log(nu2F / nu2) * T1 / T2)
-
-    phiN = Integration.two_pops(phiN, xx, T1, nu1=nu1, nu2=nu2, m12=0, m21=0)
-    phiN = Integration.two_pops(phiN, xx, T2, nu1=nu_func1, nu2=nu_func2, m12=m12, m21=m21)
-
-    fsN = Spectrum.from_phi(phiN, ns, (xx, xx))
+    xx = model_utils.default_grid(pts)
 
-    phiI = PhiManip.phi_1D(xx)
-    phiI = PhiManip.phi_1D_to_2D(xx, phiI)
+    nu_func1 = model_utils.ExpGrowth(nu1, nu1F, T2)
+    nu_func2 = model_utils.ExpGrowth(nu2, nu2F, T2)
 
-    phiI = Integration.two_pops(phiI, xx, T1, nu1=nu1, nu2=nu2, m12=0, m21=0)
-    phiI = Integration.two_pops(phiI, xx, T2, nu1=nu_func1, nu2=nu_func2, m12=me12, m21=me21)
+    # The first epoch, without migration, is the same for both parts of the genome and is integrated once.
+    phiN, phiI = model_utils.memoised_branches("split_bottlegrowth_second_hetero_asym_mig", xx, pts, [
+        [dict(T=T1, nu1=nu1, nu2=nu2, m12=0, m21=0), dict(T=T2, nu1=nu_func1, nu2=nu_func2, m12=m12, m21=m21)],
+        [dict(T=T1, nu1=nu1, nu2=nu2, m12=0, m21=0), dict(T=T2, nu1=nu_func1, nu2=nu_func2, m12=me12, m21=me21)]])
 
-    fsI = Spectrum.from_phi(phiI, ns, (xx, xx))
-
-    fs = P * fsN + (1 - P) * fsI
+    fs = model_utils.mixed_spectrum(phiN, phiI, P, ns, xx)
     return fs
 
 
@@ -752,25 +674,15 @@ def split_sizechange_hetero_asym_mig(params, ns, pts):
     """
     nu1T1, nu2T1, nu1T2, nu2T2, T1, T2, m12T1, m21T1, me12T1, me21T1, m12T2, m21T2, me12T2, me21T2, P = params
 
-    xx = Numerics.default_grid(pts)
-
-    phiN = PhiManip.phi_1D(xx)
-    phiN = PhiManip.phi_1D_to_2D(xx, phiN)
-
-    phiN = Integration.two_pops(phiN, xx, T1, nu1=nu1T1, nu2=nu2T1, m12=m12T1, m21=m21T1)
-    phiN = Integration.two_pops(phiN, xx, T2, nu1=nu1T2, nu2=nu2T2, m12=m12T2, m21=m21T2)
-
-    fsN = Spectrum.from_phi(phiN, ns, (xx, xx))
+    xx = model_utils.default_grid(pts)
 
-    phiI = PhiManip.phi_1D(xx)
-    phiI = PhiManip.phi_1D_to_2D(xx, phiI)
+    phiN, phiI = model_utils.memoised_branches("split_sizechange_hetero_asym_mig", xx, pts, [
+        [dict(T=T1, nu1=nu1T1, nu2=nu2T1, m12=m12T1, m21=m21T1),
+         dict(T=T2, nu1=nu1T2, nu2=nu2T2, m12=m12T2, m21=m21T2)],
+        [dict(T=T1, nu1=nu1T1, nu2=nu2T1, m12=me12T1, m21=me21T1),
+         dict(T=T2, nu1=nu1T2, nu2=nu2T2, m12=me12T2, m21=me21T2)]])
 
-    phiI = Integration.two_pops(phiI, xx, T1, nu1=nu1T1, nu2=nu2T1, m12=me12T1, m21=me21T1)
-    phiI = Integration.two_pops(phiI, xx, T2, nu1=nu1T2, nu2=nu2T2, m12=me12T2, m21=me21T2)
-
-    fsI = Spectrum.from_phi(phiI, ns, (xx, xx))
-
-    fs = P * fsN + (1 - P) * fsI
+    fs = model_utils.mixed_spectrum(phiN, phiI, P, ns, xx)
     return fs
 
 
@@ -799,25 +711,13 @@ def split_sizechange_ancient_hetero_asym_mig(params, ns, pts):
     """
     nu1T1, nu2T1, nu1T2, nu2T2, T1, T2, m12, m21, me12, me21, P = params
 
-    xx = Numerics.default_grid(pts)
-
-    phiN = PhiManip.phi_1D(xx)
-    phiN = PhiManip.phi_1D_to_2D(xx, phiN)
+    xx = model_utils.default_grid(pts)
 
-    phiN = Integration.two_pops(phiN, xx, T1, nu1=nu1T1, nu2=nu2T1, m12=m12, m21=m21)
-    phiN = Integration.two_pops(phiN, xx, T2, nu1=nu1T2, nu2=nu2T2, m12=0, m21=0)
+    phiN, phiI = model_utils.memoised_branches("split_sizechange_ancient_hetero_asym_mig", xx, pts, [
+        [dict(T=T1, nu1=nu1T1, nu2=nu2T1, m12=m12, m21=m21), dict(T=T2, nu1=nu1T2, nu2=nu2T2, m12=0, m21=0)],
+        [dict(T=T1, nu1=nu1T1, nu2=nu2T1, m12=me12, m21=me21), dict(T=T2, nu1=nu1T2, nu2=nu2T2, m12=0, m21=0)]])
 
-    fsN = Spectrum.from_phi(phiN, ns, (xx, xx))
-
-    phiI = PhiManip.phi_1D(xx)
-    phiI = PhiManip.phi_1D_to_2D(xx, phiI)
-
-    phiI = Integration.two_pops(phiI, xx, T1, nu1=nu1T1, nu2=nu2T1, m12=me12, m21=me21)
-    phiI = Integration.two_pops(phiI, xx, T2, nu1=nu1T2, nu2=nu2T2, m12=0, m21=0)
-
-    fsI = Spectrum.from_phi(phiI, ns, (xx, xx))
-
-    fs = P * fsN + (1 - P) * fsI
+    fs = model_utils.mixed_spectrum(phiN, phiI, P, ns, xx)
     return fs
 
 def twoepoch_het_mig(params, ns, pts):
@@ -828,30 +728,16 @@ def twoepoch_het_mig(params, ns, pts):
 
     _Nanc_size = 1.0  # This value can be used in splits with fractions
 
-    xx = Numerics.default_grid(pts)
-
-    phiN = PhiManip.phi_1D(xx)
-    phiN = PhiManip.phi_1D_to_2D(xx, phiN)
-
-    phiN = Integration.two_pops(phiN, xx, T=t1, nu1=nu_1, nu2=nu_2, m12=0, m21=0)
-    phiN = Integration.two_pops(phiN, xx, T=t1, nu1=nu11, nu2=nu12, m12=m1_12, m21=m1_21)
-    phiN = Integration.two_pops(phiN, xx, T=t2, nu1=nu21, nu2=nu22, m12=m2_12, m21=m2_21)
-
-    fsN = Spectrum.from_phi(phiN, ns, [xx]*len(ns))
-    
-    phiI = PhiManip.phi_1D(xx)
-    phiI = PhiManip.phi_1D_to_2D(xx, phiI)
+    xx = model_utils.default_grid(pts)
 
-    phiI = Integration.two_pops(phiI, xx, T=t1, nu1=nu_1, nu2=nu_2, m12=0, m21=0)
+    # The first epoch, without migration, is the same for both parts of the genome and is integrated once.
+    phiN, phiI = model_utils.memoised_branches("twoepoch_het_mig", xx, pts, [
+        [dict(T=t1, nu1=nu_1, nu2=nu_2, m12=0, m21=0), dict(T=t1, nu1=nu11, nu2=nu12, m12=m1_12, m21=m1_21),
+         dict(T=t2, nu1=nu21, nu2=nu22, m12=m2_12, m21=m2_21)],
+        [dict(T=t1, nu1=nu_1, nu2=nu_2, m12=0, m21=0), dict(T=t1, nu1=nu11, nu2=nu12, m12=me1_12, m21=me1_21),
+         dict(T=t2, nu1=nu21, nu2=nu22, m12=me2_12, m21=me2_21)]])
 
-    phiI = Integration.two_pops(phiI, xx, T=t1, nu1=nu11, nu2=nu12, m12=me1_12, m21=me1_21)
-
-    phiI = Integration.two_pops(phiI, xx, T=t2, nu1=nu21, nu2=nu22, m12=me2_12, m21=me2_21)
-    
-    fsI = Spectrum.from_phi(phiI, ns, [xx]*len(ns))
-
-
-    fs = P * fsN + (1 - P) * fsI
+    fs = model_utils.mixed_spectrum(phiN, phiI, P, ns, xx)
     return fs
 
 
@@ -880,25 +766,14 @@ def split_sizechange_second_hetero_asym_mig(params, ns, pts):
     """
     nu1T1, nu2T1, nu1T2, nu2T2, T1, T2, m12, m21, me12, me21, P = params
 
-    xx = Numerics.default_grid(pts)
-
-    phiN = PhiManip.phi_1D(xx)
-    phiN = PhiManip.phi_1D_to_2D(xx, phiN)
-
-    phiN = Integration.two_pops(phiN, xx, T1, nu1=nu1T1, nu2=nu2T1, m12=0, m21=0)
-    phiN = Integration.two_pops(phiN, xx, T2, nu1=nu1T2, nu2=nu2T2, m12=m12, m21=m21)
-
-    fsN = Spectrum.from_phi(phiN, ns, (xx, xx))
-
-    phiI = PhiManip.phi_1D(xx)
-    phiI = PhiManip.phi_1D_to_2D(xx, phiI)
+    xx = model_utils.default_grid(pts)
 
-    phiI = Integration.two_pops(phiI, xx, T1, nu1=nu1T1, nu2=nu2T1, m12=0, m21=0)
-    phiI = Integration.two_pops(phiI, xx, T2, nu1=nu1T2, nu2=nu2T2, m12=me12, m21=me21)
+    # The first epoch, without migration, is the same for both parts of the genome and is integrated once.
+    phiN, phiI = model_utils.memoised_branches("split_sizechange_second_hetero_asym_mig", xx, pts, [
+        [dict(T=T1, nu1=nu1T1, nu2=nu2T1, m12=0, m21=0), dict(T=T2, nu1=nu1T2, nu2=nu2T2, m12=m12, m21=m21)],
+        [dict(T=T1, nu1=nu1T1, nu2=nu2T1, m12=0, m21=0), dict(T=T2, nu1=nu1T2, nu2=nu2T2, m12=me12, m21=me21)]])
 
-    fsI = Spectrum.from_phi(phiI, ns, (xx, xx))
-
-    fs = P * fsN + (1 - P) * fsI
+    fs = model_utils.mixed_spectrum(phiN, phiI, P, ns, xx)
     return fs
 
 
@@ -915,14 +790,14 @@ def iso_inbreeding(params, ns, pts):
     """
     nu1, nu2, F1, F2, T = params
 
-    xx = Numerics.default_grid(pts)
-
-    phi = PhiManip.phi_1D(xx)
-    phi = PhiManip.phi_1D_to_2D(xx, phi)
+    xx = model_utils.default_grid(pts)
 
-    phi = Integration.two_pops(phi, xx, T, nu1, nu2)
+    # phi does not depend on F1 and F2, so evaluations that only change them reuse it.
+    phi = model_utils.memoised_phi("iso_inbreeding", xx, pts, [
+        (PhiManip.phi_1D_to_2D, {}),
+        (Integration.two_pops, dict(T=T, nu1=nu1, nu2=nu2))])
 
-    fs = Spectrum.from_phi_inbreeding(phi, ns, (xx, xx), (F1, F2), (2, 2))
+    fs = model_utils.from_phi_inbreeding(phi, ns, (xx, xx), (F1, F2), (2, 2))
     return fs
 
 
@@ -939,14 +814,14 @@ def mig_inbreeding(params, ns, pts):
     """
     nu1, nu2, F1, F2, m, T = params
 
-    xx = Numerics.default_grid(pts)
+    xx = model_utils.default_grid(pts)
 
-    phi = PhiManip.phi_1D(xx)
-    phi = PhiManip.phi_1D_to_2D(xx, phi)
+    # phi does not depend on F1 and F2, so evaluations that only change them reuse it.
+    phi = model_utils.memoised_phi("mig_inbreeding", xx, pts, [
+        (PhiManip.phi_1D_to_2D, {}),
+        (Integration.two_pops, dict(T=T, nu1=nu1, nu2=nu2, m12=m, m21=m))])
 
-    phi = Integration.two_pops(phi, xx, T, nu1, nu2, m12=m, m21=m)
-
-    fs = Spectrum.from_phi_inbreeding(phi, ns, (xx, xx), (F1, F2), (2, 2))
+    fs = model_utils.from_phi_inbreeding(phi, ns, (xx, xx), (F1, F2), (2, 2))
     return fs
 
 
@@ -968,14 +843,15 @@ def mig_be_inbred(params, ns, pts):
     """
     nu1, nu2, nu1a, nu2a, F1, F2, m1, m2, T1, T2 = params
 
-    xx = Numerics.default_grid(pts)
+    xx = model_utils.default_grid(pts)
 
-    phi = PhiManip.phi_1D(xx)
-    phi = PhiManip.phi_1D_to_2D(xx, phi)
-    phi = Integration.two_pops(phi, xx, T1, nu1=nu1, nu2=nu2, m12=m1, m21=m1)
+    # phi does not depend on F1 and F2, so evaluations that only change them reuse it.
+    phi = model_utils.memoised_phi("mig_be_inbred", xx, pts, [
+        (PhiManip.phi_1D_to_2D, {}),
+        (Integration.two_pops, dict(T=T1, nu1=nu1, nu2=nu2, m12=m1, m21=m1)),
+        (Integration.two_pops, dict(T=T2, nu1=nu1a, nu2=nu2a, m12=m2, m21=m2))])
 
-    phi = Integration.two_pops(phi, xx, T2, nu1=nu1a, nu2=nu2a, m12=m2, m21=m2)
-    fs = Spectrum.from_phi_inbreeding(phi, ns, (xx, xx), (F1, F2), (2, 2))
+    fs = model_utils.from_phi_inbreeding(phi, ns, (xx, xx), (F1, F2), (2, 2))
     return fs
 
 
@@ -991,14 +867,12 @@ def anc_sym_migration(params, ns, pts):
     """
     nu1, nu2, m, T1, T2 = params
 
-    xx = Numerics.default_grid(pts)
-
-    phi = PhiManip.phi_1D(xx)
-    phi = PhiManip.phi_1D_to_2D(xx, phi)
+    xx = model_utils.default_grid(pts)
 
-    phi = Integration.two_pops(phi, xx, T1, nu1, nu2, m12=m, m21=m)
-
-    phi = Integration.two_pops(phi, xx, T2, nu1, nu2, m12=0, m21=0)
+    phi = model_utils.memoised_phi("anc_sym_migration", xx, pts, [
+        (PhiManip.phi_1D_to_2D, {}),
+        (Integration.two_pops, dict(T=T1, nu1=nu1, nu2=nu2, m12=m, m21=m)),
+        (Integration.two_pops, dict(T=T2, nu1=nu1, nu2=nu2, m12=0, m21=0))])
 
     fs = Spectrum.from_phi(phi, ns, (xx, xx))
     return fs
@@ -1016,16 +890,15 @@ def anc_sym_mig_inbred(params, ns, pts):
     """
     nu1, nu2, F1, F2, m, T1, T2 = params
 
-    xx = Numerics.default_grid(pts)
-
-    phi = PhiManip.phi_1D(xx)
-    phi = PhiManip.phi_1D_to_2D(xx, phi)
-
-    phi = Integration.two_pops(phi, xx, T1, nu1, nu2, m12=m, m21=m)
+    xx = model_utils.default_grid(pts)
 
-    phi = Integration.two_pops(phi, xx, T2, nu1, nu2, m12=0, m21=0)
+    # phi does not depend on F1 and F2, so evaluations that only change them reuse it.
+    phi = model_utils.memoised_phi("anc_sym_mig_inbred", xx, pts, [
+        (PhiManip.phi_1D_to_2D, {}),
+        (Integration.two_pops, dict(T=T1, nu1=nu1, nu2=nu2, m12=m, m21=m)),
+        (Integration.two_pops, dict(T=T2, nu1=nu1, nu2=nu2, m12=0, m21=0))])
 
-    fs = Spectrum.from_phi_inbreeding(phi, ns, (xx, xx), (F1, F2), (2, 2))
+    fs = model_utils.from_phi_inbreeding(phi, ns, (xx, xx), (F1, F2), (2, 2))
     return fs
 
 
@@ -1042,14 +915,12 @@ def anc_asym_migration(params, ns, pts):
     """
     nu1, nu2, m12, m21, T1, T2 = params
 
-    xx = Numerics.default_grid(pts)
+    xx = model_utils.default_grid(pts)
 
-    phi = PhiManip.phi_1D(xx)
-    phi = PhiManip.phi_1D_to_2D(xx, phi)
-
-    phi = Integration.two_pops(phi, xx, T1, nu1, nu2, m12=m12, m21=m21)
-
-    phi = Integration.two_pops(phi, xx, T2, nu1, nu2, m12=0, m21=0)
+    phi = model_utils.memoised_phi("anc_asym_migration", xx, pts, [
+        (PhiManip.phi_1D_to_2D, {}),
+        (Integration.two_pops, dict(T=T1, nu1=nu1, nu2=nu2, m12=m12, m21=m21)),
+        (Integration.two_pops, dict(T=T2, nu1=nu1, nu2=nu2, m12=0, m21=0))])
 
     fs = Spectrum.from_phi(phi, ns, (xx, xx))
     return fs
@@ -1067,14 +938,12 @@ def sec_contact_sym_migration(params, ns, pts):
     """
     nu1, nu2, m, T1, T2 = params
 
-    xx = Numerics.default_grid(pts)
-
-    phi = PhiManip.phi_1D(xx)
-    phi = PhiManip.phi_1D_to_2D(xx, phi)
-
-    phi = Integration.two_pops(phi, xx, T1, nu1, nu2, m12=0, m21=0)
+    xx = model_utils.default_grid(pts)
 
-    phi = Integration.two_pops(phi, xx, T2, nu1, nu2, m12=m, m21=m)
+    phi = model_utils.memoised_phi("sec_contact_sym_migration", xx, pts, [
+        (PhiManip.phi_1D_to_2D, {}),
+        (Integration.two_pops, dict(T=T1, nu1=nu1, nu2=nu2, m12=0, m21=0)),
+        (Integration.two_pops, dict(T=T2, nu1=nu1, nu2=nu2, m12=m, m21=m))])
 
     fs = Spectrum.from_phi(phi, ns, (xx, xx))
     return fs
@@ -1092,16 +961,15 @@ def sec_contact_sym_mig_inbred(params, ns, pts):
     """
     nu1, nu2, F1, F2, m, T1, T2 = params
 
-    xx = Numerics.default_grid(pts)
+    xx = model_utils.default_grid(pts)
 
-    phi = PhiManip.phi_1D(xx)
-    phi = PhiManip.phi_1D_to_2D(xx, phi)
+    # phi does not depend on F1 and F2, so evaluations that only change them reuse it.
+    phi = model_utils.memoised_phi("sec_contact_sym_mig_inbred", xx, pts, [
+        (PhiManip.phi_1D_to_2D, {}),
+        (Integration.two_pops, dict(T=T1, nu1=nu1, nu2=nu2, m12=0, m21=0)),
+        (Integration.two_pops, dict(T=T2, nu1=nu1, nu2=nu2, m12=m, m21=m))])
 
-    phi = Integration.two_pops(phi, xx, T1, nu1, nu2, m12=0, m21=0)
-
-    phi = Integration.two_pops(phi, xx, T2, nu1, nu2, m12=m, m21=m)
-
-    fs = Spectrum.from_phi_inbreeding(phi, ns, (xx, xx), (F1, F2), (2, 2))
+    fs = model_utils.from_phi_inbreeding(phi, ns, (xx, xx), (F1, F2), (2, 2))
     return fs
 
 
@@ -1118,14 +986,12 @@ def sec_contact_asym_migration(params, ns, pts):
     """
     nu1, nu2, m12, m21, T1, T2 = params
 
-    xx = Numerics.default_grid(pts)
-
-    phi = PhiManip.phi_1D(xx)
-    phi = PhiManip.phi_1D_to_2D(xx, phi)
+    xx = model_utils.default_grid(pts)
 
-    phi = Integration.two_pops(phi, xx, T1, nu1, nu2, m12=0, m21=0)
-
-    phi = Integration.two_pops(phi, xx, T2, nu1, nu2, m12=m12, m21=m21)
+    phi = model_utils.memoised_phi("sec_contact_asym_migration", xx, pts, [
+        (PhiManip.phi_1D_to_2D, {}),
+        (Integration.two_pops, dict(T=T1, nu1=nu1, nu2=nu2, m12=0, m21=0)),
+        (Integration.two_pops, dict(T=T2, nu1=nu1, nu2=nu2, m12=m12, m21=m21))])
 
     fs = Spectrum.from_phi(phi, ns, (xx, xx))
     return fs
@@ -1149,17 +1015,16 @@ def split_nomig(params, ns, pts):
     # 9 parameters
     nu1, nuA, nu2, nu3, F1, F2, F3, T1, T2 = params
 
-    xx = Numerics.default_grid(pts)
-    phi = PhiManip.phi_1D(xx)
-    phi = PhiManip.phi_1D_to_2D(xx, phi)
-
-    phi = Integration.two_pops(phi, xx, T1, nu1=nu1, nu2=nuA, m12=0, m21=0)
+    xx = model_utils.default_grid(pts)
 
-    phi = PhiManip.phi_2D_to_3D_split_2(xx, phi)
+    # phi does not depend on F1, F2 and F3, so evaluations that only change them reuse it.
+    phi = model_utils.memoised_phi("split_nomig", xx, pts, [
+        (PhiManip.phi_1D_to_2D, {}),
+        (Integration.two_pops, dict(T=T1, nu1=nu1, nu2=nuA, m12=0, m21=0)),
+        (PhiManip.phi_2D_to_3D_split_2, {}),
+        (Integration.three_pops, dict(T=T2, nu1=nu1, nu2=nu2, nu3=nu3, m12=0, m21=0, m23=0, m32=0, m13=0, m31=0))])
 
-    phi = Integration.three_pops(phi, xx, T2, nu1=nu1, nu2=nu2, nu3=nu3, m12=0, m21=0, m23=0, m32=0, m13=0, m31=0)
-
-    fs = Spectrum.from_phi_inbreeding(phi, ns, (xx, xx, xx), (F1, F2, F3), (2, 2, 2))
+    fs = model_utils.from_phi_inbreeding(phi, ns, (xx, xx, xx), (F1, F2, F3), (2, 2, 2))
     return fs
 
 
@@ -1181,17 +1046,16 @@ def split_symmig_all(params, ns, pts):
     # 13 parameters
     nu1, nuA, nu2, nu3, F1, F2, F3, mA, m1, m2, m3, T1, T2 = params
 
-    xx = Numerics.default_grid(pts)
-    phi = PhiManip.phi_1D(xx)
-    phi = PhiManip.phi_1D_to_2D(xx, phi)
-
-    phi = Integration.two_pops(phi, xx, T1, nu1=nu1, nu2=nuA, m12=mA, m21=mA)
+    xx = model_utils.default_grid(pts)
 
-    phi = PhiManip.phi_2D_to_3D_split_2(xx, phi)
+    # phi does not depend on F1, F2 and F3, so evaluations that only change them reuse it.
+    phi = model_utils.memoised_phi("split_symmig_all", xx, pts, [
+        (PhiManip.phi_1D_to_2D, {}),
+        (Integration.two_pops, dict(T=T1, nu1=nu1, nu2=nuA, m12=mA, m21=mA)),
+        (PhiManip.phi_2D_to_3D_split_2, {}),
+        (Integration.three_pops, dict(T=T2, nu1=nu1, nu2=nu2, nu3=nu3, m12=m1, m21=m1, m23=m2, m32=m2, m13=m3, m31=m3))])
 
-    phi = Integration.three_pops(phi, xx, T2, nu1=nu1, nu2=nu2, nu3=nu3, m12=m1, m21=m1, m23=m2, m32=m2, m13=m3, m31=m3)
-
-    fs = Spectrum.from_phi_inbreeding(phi, ns, (xx, xx, xx), (F1, F2, F3), (2, 2, 2))
+    fs = model_utils.from_phi_inbreeding(phi, ns, (xx, xx, xx), (F1, F2, F3), (2, 2, 2))
     return fs
 
 
@@ -1214,17 +1078,16 @@ def split_symmig_adjacent(params, ns, pts):
     # 12 parameters
     nu1, nuA, nu2, nu3, mA, F1, F2, F3, m1, m2, T1, T2 = params
 
-    xx = Numerics.default_grid(pts)
-    phi = PhiManip.phi_1D(xx)
-    phi = PhiManip.phi_1D_to_2D(xx, phi)
-
-    phi = Integration.two_pops(phi, xx, T1, nu1=nu1, nu2=nuA, m12=mA, m21=mA)
-
-    phi = PhiManip.phi_2D_to_3D_split_2(xx, phi)
+    xx = model_utils.default_grid(pts)
 
-    phi = Integration.three_pops(phi, xx, T2, nu1=nu1, nu2=nu2, nu3=nu3, m12=m1, m21=m1, m23=m2, m32=m2, m13=0, m31=0)
+    # phi does not depend on F1, F2 and F3, so evaluations that only change them reuse it.
+    phi = model_utils.memoised_phi("split_symmig_adjacent", xx, pts, [
+        (PhiManip.phi_1D_to_2D, {}),
+        (Integration.two_pops, dict(T=T1, nu1=nu1, nu2=nuA, m12=mA, m21=mA)),
+        (PhiManip.phi_2D_to_3D_split_2, {}),
+        (Integration.three_pops, dict(T=T2, nu1=nu1, nu2=nu2, nu3=nu3, m12=m1, m21=m1, m23=m2, m32=m2, m13=0, m31=0))])
 
-    fs = Spectrum.from_phi_inbreeding(phi, ns, (xx, xx, xx), (F1, F2, F3), (2, 2, 2))
+    fs = model_utils.from_phi_inbreeding(phi, ns, (xx, xx, xx), (F1, F2, F3), (2, 2, 2))
     return fs
 
 
@@ -1247,17 +1110,16 @@ def sec_cont_mig_1(params, ns, pts):
     # 12 parameters
     nu1, nuA, nu2, nu3, F1, F2, F3, m1, m2, m3, T1, T2 = params
 
-    xx = Numerics.default_grid(pts)
-    phi = PhiManip.phi_1D(xx)
-    phi = PhiManip.phi_1D_to_2D(xx, phi)
+    xx = model_utils.default_grid(pts)
 
-    phi = Integration.two_pops(phi, xx, T1, nu1=nu1, nu2=nuA, m12=0, m21=0)
+    # phi does not depend on F1, F2 and F3, so evaluations that only change them reuse it.
+    phi = model_utils.memoised_phi("sec_cont_mig_1", xx, pts, [
+        (PhiManip.phi_1D_to_2D, {}),
+        (Integration.two_pops, dict(T=T1, nu1=nu1, nu2=nuA, m12=0, m21=0)),
+        (PhiManip.phi_2D_to_3D_split_2, {}),
+        (Integration.three_pops, dict(T=T2, nu1=nu1, nu2=nu2, nu3=nu3, m12=m1, m21=m1, m23=m2, m32=m2, m13=m3, m31=m3))])
 
-    phi = PhiManip.phi_2D_to_3D_split_2(xx, phi)
-
-    phi = Integration.three_pops(phi, xx, T2, nu1=nu1, nu2=nu2, nu3=nu3, m12=m1, m21=m1, m23=m2, m32=m2, m13=m3, m31=m3)
-
-    fs = Spectrum.from_phi_inbreeding(phi, ns, (xx, xx, xx), (F1, F2, F3), (2, 2, 2))
+    fs = model_utils.from_phi_inbreeding(phi, ns, (xx, xx, xx), (F1, F2, F3), (2, 2, 2))
     return fs
 
 
@@ -1280,19 +1142,17 @@ def sec_cont_mig_2(params, ns, pts):
     # 13 parameters
     nu1, nuA, nu2, nu3, F1, F2, F3, m1, m2, m3, T1, T2, T3 = params
 
-    xx = Numerics.default_grid(pts)
-    phi = PhiManip.phi_1D(xx)
-    phi = PhiManip.phi_1D_to_2D(xx, phi)
-
-    phi = Integration.two_pops(phi, xx, T1, nu1=nu1, nu2=nuA, m12=0, m21=0)
-
-    phi = PhiManip.phi_2D_to_3D_split_2(xx, phi)
+    xx = model_utils.default_grid(pts)
 
-    phi = Integration.three_pops(phi, xx, T2, nu1=nu1, nu2=nu2, nu3=nu3, m12=0, m21=0, m23=0, m32=0, m13=0, m31=0)
+    # phi does not depend on F1, F2 and F3, so evaluations that only change them reuse it.
+    phi = model_utils.memoised_phi("sec_cont_mig_2", xx, pts, [
+        (PhiManip.phi_1D_to_2D, {}),
+        (Integration.two_pops, dict(T=T1, nu1=nu1, nu2=nuA, m12=0, m21=0)),
+        (PhiManip.phi_2D_to_3D_split_2, {}),
+        (Integration.three_pops, dict(T=T2, nu1=nu1, nu2=nu2, nu3=nu3, m12=0, m21=0, m23=0, m32=0, m13=0, m31=0)),
+        (Integration.three_pops, dict(T=T3, nu1=nu1, nu2=nu2, nu3=nu3, m12=m1, m21=m1, m23=m2, m32=m2, m13=m2, m31=m2))])
 
-    phi = Integration.three_pops(phi, xx, T3, nu1=nu1, nu2=nu2, nu3=nu3, m12=m1, m21=m1, m23=m2, m32=m2, m13=m2, m31=m2)
-
-    fs = Spectrum.from_phi_inbreeding(phi, ns, (xx, xx, xx), (F1, F2, F3), (2, 2, 2))
+    fs = model_utils.from_phi_inbreeding(phi, ns, (xx, xx, xx), (F1, F2, F3), (2, 2, 2))
     return fs
 
 
@@ -1315,19 +1175,17 @@ def sec_cont_mig_3(params, ns, pts):
     # 14 parameters
     nu1, nuA, nu2, nu3, F1, F2, F3, mA, m1, m2, m3, T1a, T1b, T2 = params
 
-    xx = Numerics.default_grid(pts)
-    phi = PhiManip.phi_1D(xx)
-    phi = PhiManip.phi_1D_to_2D(xx, phi)
-
-    phi = Integration.two_pops(phi, xx, T1a, nu1=nu1, nu2=nuA, m12=0, m21=0)
-
-    phi = Integration.two_pops(phi, xx, T1a, nu1=nu1, nu2=nuA, m12=mA, m21=mA)
+    xx = model_utils.default_grid(pts)
 
-    phi = PhiManip.phi_2D_to_3D_split_2(xx, phi)
+    # phi does not depend on F1, F2 and F3, so evaluations that only change them reuse it.
+    phi = model_utils.memoised_phi("sec_cont_mig_3", xx, pts, [
+        (PhiManip.phi_1D_to_2D, {}),
+        (Integration.two_pops, dict(T=T1a, nu1=nu1, nu2=nuA, m12=0, m21=0)),
+        (Integration.two_pops, dict(T=T1a, nu1=nu1, nu2=nuA, m12=mA, m21=mA)),
+        (PhiManip.phi_2D_to_3D_split_2, {}),
+        (Integration.three_pops, dict(T=T2, nu1=nu1, nu2=nu2, nu3=nu3, m12=m1, m21=m1, m23=m2, m32=m2, m13=m3, m31=m3))])
 
-    phi = Integration.three_pops(phi, xx, T2, nu1=nu1, nu2=nu2, nu3=nu3, m12=m1, m21=m1, m23=m2, m32=m2, m13=m3, m31=m3)
-
-    fs = Spectrum.from_phi_inbreeding(phi, ns, (xx, xx, xx), (F1, F2, F3), (2, 2, 2))
+    fs = model_utils.from_phi_inbreeding(phi, ns, (xx, xx, xx), (F1, F2, F3), (2, 2, 2))
     return fs
 
 
@@ -1351,19 +1209,17 @@ def mig_sec_cont23(params, ns, pts):
     # 13 parameters
     nu1, nuA, nu2, nu3, F1, F2, F3, mA, m1, m2, T1, T2, T3 = params
 
-    xx = Numerics.default_grid(pts)
-    phi = PhiManip.phi_1D(xx)
-    phi = PhiManip.phi_1D_to_2D(xx, phi)
-
-    phi = Integration.two_pops(phi, xx, T1, nu1=nu1, nu2=nuA, m12=mA, m21=mA)
-
-    phi = PhiManip.phi_2D_to_3D_split_2(xx, phi)
-
-    phi = Integration.three_pops(phi, xx, T2, nu1=nu1, nu2=nu2, nu3=nu3, m12=0, m21=0, m23=m2, m32=m2, m13=m2, m31=m2)
+    xx = model_utils.default_grid(pts)
 
-    phi = Integration.three_pops(phi, xx, T3, nu1=nu1, nu2=nu2, nu3=nu3, m12=m1, m21=m1, m23=m2, m32=m2, m13=m2, m31=m2)
+    # phi does not depend on F1, F2 and F3, so evaluations that only change them reuse it.
+    phi = model_utils.memoised_phi("mig_sec_cont23", xx, pts, [
+        (PhiManip.phi_1D_to_2D, {}),
+        (Integration.two_pops, dict(T=T1, nu1=nu1, nu2=nuA, m12=mA, m21=mA)),
+        (PhiManip.phi_2D_to_3D_split_2, {}),
+        (Integration.three_pops, dict(T=T2, nu1=nu1, nu2=nu2, nu3=nu3, m12=0, m21=0, m23=m2, m32=m2, m13=m2, m31=m2)),
+        (Integration.three_pops, dict(T=T3, nu1=nu1, nu2=nu2, nu3=nu3, m12=m1, m21=m1, m23=m2, m32=m2, m13=m2, m31=m2))])
 
-    fs = Spectrum.from_phi_inbreeding(phi, ns, (xx, xx, xx), (F1, F2, F3), (2, 2, 2))
+    fs = model_utils.from_phi_inbreeding(phi, ns, (xx, xx, xx), (F1, F2, F3), (2, 2, 2))
     return fs
 
 def model_split1_then_23(params, ns, pts):
@@ -1379,22 +1235,17 @@ def model_split1_then_23(params, ns, pts):
     """
     nu1, nu2, nu3, T1_23, T23 = params
 
-    xx = Numerics.default_grid(pts)
-
-    # Start from 1D ancestral population
-    phi = PhiManip.phi_1D(xx)
-
-    # Split into pop1 and ancestral pop23
-    phi = PhiManip.phi_1D_to_2D(xx, phi)
-
-    # Integrate until pop2 and pop3 split
-    phi = Integration.two_pops(phi, xx, T1_23, nu1=nu1, nu2=1.0)
+    xx = model_utils.default_grid(pts)
 
-    # Split ancestral pop23 into pop2 and pop3 (pop1 stays untouched)
-    phi = PhiManip.phi_2D_to_3D_split_2(xx, phi)
-
-    # Final integration with 3 populations
-    phi = Integration.three_pops(phi, xx, T23, nu1=nu1, nu2=nu2, nu3=nu3)
+    phi = model_utils.memoised_phi("model_split1_then_23", xx, pts, [
+        # Split into pop1 and ancestral pop23
+        (PhiManip.phi_1D_to_2D, {}),
+        # Integrate until pop2 and pop3 split
+        (Integration.two_pops, dict(T=T1_23, nu1=nu1, nu2=1.0)),
+        # Split ancestral pop23 into pop2 and pop3 (pop1 stays untouched)
+        (PhiManip.phi_2D_to_3D_split_2, {}),
+        # Final integration with 3 populations
+        (Integration.three_pops, dict(T=T23, nu1=nu1, nu2=nu2, nu3=nu3))])
 
     # Convert phi to frequency spectrum
     fs = Spectrum.from_phi(phi, ns, (xx, xx, xx))
@@ -1416,20 +1267,16 @@ def model_split2_then_13(params, ns, pts):
     """
     nu1, nu2, nu3, T2_13, T13 = params
 
-    xx = Numerics.default_grid(pts)
-
-    # Start from 1D ancestral population
-    phi = PhiManip.phi_1D(xx)
-
-    # First split: pop2 and ancestor of (pop1, pop3)
-    phi = PhiManip.phi_1D_to_2D(xx, phi)
-    phi = Integration.two_pops(phi, xx, T2_13, nu1=1.0, nu2=1.0)  # ancestral sizes
-
-    # Second split: ancestor splits into pop1 and pop3
-    phi = PhiManip.phi_2D_to_3D_split_1(xx, phi)
+    xx = model_utils.default_grid(pts)
 
-    # Final integration of 3 pops
-    phi = Integration.three_pops(phi, xx, T13, nu1=nu1, nu2=nu2, nu3=nu3)
+    phi = model_utils.memoised_phi("model_split2_then_13", xx, pts, [
+        # First split: pop2 and ancestor of (pop1, pop3)
+        (PhiManip.phi_1D_to_2D, {}),
+        (Integration.two_pops, dict(T=T2_13, nu1=1.0, nu2=1.0)),  # ancestral sizes
+        # Second split: ancestor splits into pop1 and pop3
+        (PhiManip.phi_2D_to_3D_split_1, {}),
+        # Final integration of 3 pops
+        (Integration.three_pops, dict(T=T13, nu1=nu1, nu2=nu2, nu3=nu3))])
 
     fs = Spectrum.from_phi(phi, ns, (xx, xx, xx))
     return fs
@@ -1450,20 +1297,16 @@ def model_split3_then_12(params, ns, pts):
     """
     nu1, nu2, nu3, T3_12, T12 = params
 
-    xx = Numerics.default_grid(pts)
-
-    # Start from 1D ancestral population
-    phi = PhiManip.phi_1D(xx)
-
-    # First split: pop3 and ancestor of (pop1, pop2)
-    phi = PhiManip.phi_1D_to_2D(xx, phi)
-    phi = Integration.two_pops(phi, xx, T3_12, nu1=1.0, nu2=1.0)  # ancestral sizes
-
-    # Second split: (1,2) split
-    phi = PhiManip.phi_2D_to_3D_split_1(xx, phi)
+    xx = model_utils.default_grid(pts)
 
-    # Final integration of all three pops
-    phi = Integration.three_pops(phi, xx, T12, nu1=nu1, nu2=nu2, nu3=nu3)
+    phi = model_utils.memoised_phi("model_split3_then_12", xx, pts, [
+        # First split: pop3 and ancestor of (pop1, pop2)
+        (PhiManip.phi_1D_to_2D, {}),
+        (Integration.two_pops, dict(T=T3_12, nu1=1.0, nu2=1.0)),  # ancestral sizes
+        # Second split: (1,2) split
+        (PhiManip.phi_2D_to_3D_split_1, {}),
+        # Final integration of all three pops
+        (Integration.three_pops, dict(T=T12, nu1=nu1, nu2=nu2, nu3=nu3))])
 
     fs = Spectrum.from_phi(phi, ns, (xx, xx, xx))
     return fs
@@ -1494,26 +1337,19 @@ def custom_model_2p_m0(params, ns, pts):
 
     _Nanc_size = 1.0  # This value can be used in splits with fractions
      
-    xx = Numerics.default_grid(pts)
+    xx = model_utils.default_grid(pts)
 
-    # First time period: mix no migration at P1 with 1-P1 gene flow
-    phiN1 = PhiManip.phi_1D(xx)
-    phiN1 = PhiManip.phi_1D_to_2D(xx, phiN1)
-    phiN1 = Integration.two_pops(phiN1, xx, T=t1, nu1=nu_1, nu2=nu_2, m12=0, m21=0)
-    phiN1 = Integration.two_pops(phiN1, xx, T=t1, nu1=nu11, nu2=nu12, m12=0, m21=0)
-
-    phiI1 = PhiManip.phi_1D(xx)
-    phiI1 = PhiManip.phi_1D_to_2D(xx, phiI1)
-    phiI1 = Integration.two_pops(phiI1, xx, T=t1, nu1=nu_1, nu2=nu_2, m12=0, m21=0)
-    phiI1 = Integration.two_pops(phiI1, xx, T=t1, nu1=nu11, nu2=nu12, m12=me1_12, m21=me1_21)
+    # First time period: mix no migration at P1 with 1-P1 gene flow, then
+    # second time period: mix no migration at P2 with 1-P2 gene flow
+    phiN2, phiI2 = model_utils.memoised_two_periods("custom_model_2p_m0", xx, pts, [
+        [dict(T=t1, nu1=nu_1, nu2=nu_2, m12=0, m21=0),
+         dict(T=t1, nu1=nu11, nu2=nu12, m12=0, m21=0)],
+        [dict(T=t1, nu1=nu_1, nu2=nu_2, m12=0, m21=0),
+         dict(T=t1, nu1=nu11, nu2=nu12, m12=me1_12, m21=me1_21)]], P1, [
+        [dict(T=t2, nu1=nu21, nu2=nu22, m12=0, m21=0)],
+        [dict(T=t2, nu1=nu21, nu2=nu22, m12=me2_12, m21=me2_21)]])
 
-    phi1 = P1 * phiN1 + (1 - P1) * phiI1
-
-    # Second time period: mix no migration at P2 with 1-P2 gene flow
-    phiN2 = Integration.two_pops(phi1, xx, T=t2, nu1=nu21, nu2=nu22, m12=0, m21=0)
-    phiI2 = Integration.two_pops(phi1, xx, T=t2, nu1=nu21, nu2=nu22, m12=me2_12, m21=me2_21)
-
-    phi = P2 * phiN2 + (1 - P2) * phiI2
+    phi = model_utils.mix_phi(phiN2, phiI2, P2)
 
     fs = Spectrum.from_phi(phi, ns, [xx]*len(ns))
     return fs
@@ -1529,20 +1365,16 @@ def one_het_sym(params, ns, pts):
 
     _Nanc_size = 1.0  # This value can be used in splits with fractions
      
-    xx = Numerics.default_grid(pts)
+    xx = model_utils.default_grid(pts)
 
     # First time period: mix no migration at P1 with 1-P1 gene flow
-    phiN1 = PhiManip.phi_1D(xx)
-    phiN1 = PhiManip.phi_1D_to_2D(xx, phiN1)
-    phiN1 = Integration.two_pops(phiN1, xx, T=t1, nu1=nu_1, nu2=nu_2, m12=0, m21=0)
-    phiN1 = Integration.two_pops(phiN1, xx, T=t1, nu1=nu11, nu2=nu12, m12=0, m21=0)
-
-    phiI1 = PhiManip.phi_1D(xx)
-    phiI1 = PhiManip.phi_1D_to_2D(xx, phiI1)
-    phiI1 = Integration.two_pops(phiI1, xx, T=t1, nu1=nu_1, nu2=nu_2, m12=0, m21=0)
-    phiI1 = Integration.two_pops(phiI1, xx, T=t1, nu1=nu11, nu2=nu12, m12=me1_12, m21=me1_21)
+    phiN1, phiI1 = model_utils.memoised_branches("one_het_sym", xx, pts, [
+        [dict(T=t1, nu1=nu_1, nu2=nu_2, m12=0, m21=0),
+         dict(T=t1, nu1=nu11, nu2=nu12, m12=0, m21=0)],
+        [dict(T=t1, nu1=nu_1, nu2=nu_2, m12=0, m21=0),
+         dict(T=t1, nu1=nu11, nu2=nu12, m12=me1_12, m21=me1_21)]])
 
-    phi = P1 * phiN1 + (1 - P1) * phiI1
+    phi = model_utils.mix_phi(phiN1, phiI1, P1)
 
     fs = Spectrum.from_phi(phi, ns, [xx]*len(ns))
     return fs
@@ -1557,20 +1389,18 @@ def het_sec_contact(params, ns, pts):
 
     _Nanc_size = 1.0  # This value can be used in splits with fractions
      
-    xx = Numerics.default_grid(pts)
-
-    # First time period
-    phi1 = PhiManip.phi_1D(xx)
-    phi1 = PhiManip.phi_1D_to_2D(xx, phi1)
-    phi1 = Integration.two_pops(phi1, xx, T=t1, nu1=nu_1, nu2=nu_2, m12=0, m21=0)
-    phi1 = Integration.two_pops(phi1, xx, T=t1, nu1=nu11, nu2=nu12, m12=0, m21=0)
+    xx = model_utils.default_grid(pts)
 
+    # First time period, shared by both parts of the genome and integrated once
+    first = [dict(T=t1, nu1=nu_1, nu2=nu_2, m12=0, m21=0),
+             dict(T=t1, nu1=nu11, nu2=nu12, m12=0, m21=0)]
 
     # Second time period: mix no migration at P2 with 1-P2 gene flow
-    phiN2 = Integration.two_pops(phi1, xx, T=t2, nu1=nu21, nu2=nu22, m12=0, m21=0)
-    phiI2 = Integration.two_pops(phi1, xx, T=t2, nu1=nu21, nu2=nu22, m12=me2_12, m21=me2_21)
+    phiN2, phiI2 = model_utils.memoised_branches("het_sec_contact", xx, pts, [
+        first + [dict(T=t2, nu1=nu21, nu2=nu22, m12=0, m21=0)],
+        first + [dict(T=t2, nu1=nu21, nu2=nu22, m12=me2_12, m21=me2_21)]])
 
-    phi = P2 * phiN2 + (1 - P2) * phiI2
+    phi = model_utils.mix_phi(phiN2, phiI2, P2)
 
     fs = Spectrum.from_phi(phi, ns, [xx]*len(ns))
     return fs
@@ -3,7 +3,8 @@
 
 import argparse
 import numpy as np
-from dadi import Spectrum, Numerics, Inference, Godambe
+from dadi import Spectrum, Inference, Godambe
+import model_eval
 import plot_fs
 import SETTINGS
 import sys
@@ -21,8 +22,8 @@ def main(data, full_model, nested_model, bootpath, mask, opt_full, opt_nested, n
     # Prepare models
     model_fun_full = SETTINGS.get_settings(full_model)
     model_fun_nested = SETTINGS.get_settings(nested_model)
-    func_ex_full = Numerics.make_extrap_log_func(model_fun_full)
-    func_ex_nested = Numerics.make_extrap_log_func(model_fun_nested)
+    func_ex_full = model_eval.cached_extrap_func(model_fun_full)
+    func_ex_nested = model_eval.cached_extrap_func(model_fun_nested)
 
 
     # Simulate models
@@ -4,18 +4,25 @@
 """
 @author: Katharine Prata
 @date created: 23/4/21
-@description: vcf file is imported through make_data_dict_vcf and an fs is created.
+@description: vcf file is read in chunks by vcf_utils.py (as make_data_dict_vcf) and an fs is created.
 
 Input:
-File: .vcf file named with population names.
+File: .vcf or .vcf.gz file named with population names.
 Arguments:
 snps = vcf file named after your two populations broken by a hyphen (-)
 fold = unfolded or folded
-masked = yes or no
+masked = low or no
 method = subsample or projection
 genotypes = the number you want to subsample by in units of genotypes
 run from the scripts directory or change path variables
 
+(optional) --no_cache = do not use or write the allele count cache of the vcf in data/vcf/cache/
+(optional) --variants = text file with one "fold masked method genotypes" variant per line, instead of fold, masked,
+method and genotypes. Every variant is made from one parse of the vcf (see make_variants). A line may start with the
+populations of its spectrum (e.g., "group2-group3-group4 folded no projection 10 10 10") to use a multi-population vcf.
+(optional) --popfile = popfile of a multi-population vcf, instead of data/popfile/pop_<snps>.txt
+(optional) --pairs/--triples = make the variants for every pair/triple of the popfile populations (2D/3D spectra)
+
 Output: a subsampled fs for input into dadi analysis, a text file with statistics and plots of fs produced.
 
 Compatible with python 3.6.11 and dadi 2.1.1
@@ -23,22 +30,23 @@ Compatible with python 3.6.11 and dadi 2.1.1
 
 import argparse
 import copy
+import itertools
 from argparse import Namespace
 import dadi
 import numpy as np
 import pylab
 import matplotlib as plt
+import vcf_utils
 
+STATS_OUT_NAME = "../results/sfs_stats-2.txt"
+# Singletons and doubletons of 1D, 2D and 3D spectra, masked with masked = low.
+LOW_MASKS = {1: [(1, ), (2, )],
+             2: [(0, 1), (1, 0), (2, 0), (0, 2), (1, 1)],
+             3: [(0, 0, 1), (0, 1, 0), (1, 0, 0), (0, 1, 1), (1, 0, 1), (1, 1, 0), (2, 0, 0), (0, 2, 0), (0, 0, 2)]}
 
-def main(snps, fold, masked, method, genotypes):
-    # Import the spectrum and popfile from data/vcf/ and data/popfile/
-    snp_path = "../data/vcf/" + snps + ".vcf"
-    pop_path = "../data/popfile/pop_" + snps + ".txt"
-    pops = "{}".format(snps)
-    pop_ids = pops.split("-")
 
+def start_stats(stats_out_name):
     # make a file with statistics about your sfs
-    stats_out_name = "../results/sfs_stats-2.txt"
     with open(stats_out_name, 'a') as stats_out:
         if stats_out.tell() == 0:
             print('Creating a new file')
@@ -46,59 +54,45 @@ def main(snps, fold, masked, method, genotypes):
         else:
             print('file exists, appending')
 
-    # Configuring haplotypes and genotypes
-    if len(pop_ids) == 1:
-        print("One dimensional sfs")
-        proj = [genotypes[0] * 2]
-        subsample = {pop_ids[0]: genotypes[0]}
-    elif len(pop_ids) == 2:
-        print("Two dimensional sfs")
-        proj = [genotypes[0] * 2, genotypes[1] * 2]
-        subsample = {pop_ids[0]: genotypes[0], pop_ids[1]: genotypes[1]}
-    else:
-        proj = []
-        subsample = {}
-        for i in range(len(pop_ids)):
-            proj.append(20)
-            subsample["Pop{}".format(i)] = 10
-
-    if fold == "folded":
-        if method == "subsample":
-            dd = dadi.Misc.make_data_dict_vcf(snp_path, pop_path, subsample=subsample)
-            fs = dadi.Spectrum.from_data_dict(dd, pop_ids=pop_ids, projections=proj, polarized=False)
-            fs.to_file("../data/fs/{}_subsampled.fs".format(snps))
-        elif method == "projection":
-            dd = dadi.Misc.make_data_dict_vcf(snp_path, pop_path)
-            fs = dadi.Spectrum.from_data_dict(dd, pop_ids=pop_ids, projections=proj, polarized=False)
-            fs.to_file("../data/fs/{}_projected.fs".format(snps))
-        elif method == "no":
-            dd = dadi.Misc.make_data_dict_vcf(snp_path, pop_path)
-            fs = dadi.Spectrum.from_data_dict(dd, pop_ids=pop_ids, projections=proj, polarized=False)
-            fs.to_file("../data/fs/{}_projected.fs".format(snps))
-        else:
-            raise ValueError("Choose projection, subsample or no")
-    elif fold == "unfolded":
-        if method == "subsample":
-            dd = dadi.Misc.make_data_dict_vcf(snp_path, pop_path, subsample=subsample)
-            fs = dadi.Spectrum.from_data_dict(dd, pop_ids=pop_ids, projections=proj, polarized=True)
-            fs.to_file("../data/fs/{}_unfolded_subsampled.fs".format(snps))
-        elif method == "projection":
-            dd = dadi.Misc.make_data_dict_vcf(snp_path, pop_path)
-            fs = dadi.Spectrum.from_data_dict(dd, pop_ids=pop_ids, projections=proj, polarized=True)
-            fs.to_file("../data/fs/{}_unfolded_projected.fs".format(snps))
-    else:
+
+def sample_sizes(pop_ids, genotypes):
+    """Projections (haplotypes) and subsample dictionary (genotypes) of the populations."""
+    if len(pop_ids) > 2 and len(genotypes) < len(pop_ids):
+        genotypes = [10] * len(pop_ids)
+    proj = [genotypes[i] * 2 for i in range(len(pop_ids))]
+    subsample = {pop_ids[i]: genotypes[i] for i in range(len(pop_ids))}
+    return proj, subsample
+
+
+def fs_name(snps, fold, method):
+    """Name of the .fs file of a fold and method in data/fs/."""
+    if fold not in ["folded", "unfolded"]:
         raise ValueError("Need to choose whether folded or unfolded spectra")
+    if method not in ["subsample", "projection", "no"]:
+        raise ValueError("Choose projection, subsample or no")
+    name = "subsampled" if method == "subsample" else "projected"
+    return "{}_{}".format(snps, name) if fold == "folded" else "{}_unfolded_{}".format(snps, name)
 
-    # Printing out stats for the fs
-    print("The datafile will be named {}".format(snps))
+
+def mask_low(fs):
+    """Copy of fs with singletons and doubletons masked."""
+    fs = fs.copy()
+    for index in LOW_MASKS[len(fs.sample_sizes)]:
+        fs.mask[index] = True
+    return fs
+
+
+def write_stats(snps, fs, fold, stats_out_name, title="Data for site frequency spectrum:"):
+    """Print the statistics of fs and add them to the statistics file."""
     print("\n* * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * *\n")
-    print("Data for site frequency spectrum:\n")
+    print(title + "\n")
     print("Sample sizes: {}".format(fs.sample_sizes))
     print("Sum of SFS: {}".format(np.around(fs.S(), 2)))
-    if len(pop_ids) == 2:
+    stat = None
+    if len(fs.sample_sizes) == 2:
         print("FST of SFS: {}".format(np.around(fs.Fst(), 2)))
         stat = np.around(fs.Fst(), 2)
-    elif len(pop_ids) == 1:
+    elif len(fs.sample_sizes) == 1:
         print("Tajima's D of SFS: {}".format(np.around(fs.Tajima_D())))
         stat = np.around(fs.Tajima_D(), 2)
     print("\n* * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * *\n")
@@ -107,100 +101,149 @@ def main(snps, fold, masked, method, genotypes):
         stats_out.write("{0}\t{1}\t{2}\t{3}\t{4}\n".format(snps, fs.sample_sizes, fold, np.around(fs.S(), 2),
                                                            stat))
 
+
+def plot(fs, masked, plot_out_name):
+    """Plot fs (masked if masked is low) in plots/spectra/."""
     # Plotting sfs and masked sfs
     # Not using rainbow palette anymore due to error
-    colour_map = copy.copy(pylab.cm.get_cmap("hsv"))
+    colour_map = copy.copy(pylab.get_cmap("hsv"))
     # within figure function, cmap=colour_map
     v_min = 0.05
     fig_size = (2.5, 2)
-    fig1 = pylab.figure(figsize=fig_size)
+    fig = pylab.figure(figsize=fig_size)
     plt.rcParams.update({'font.size': 8})
 
-    plot_out_name = args.snps + "_" + "-".join(map(str, proj))
+    if masked == "low":
+        print('Masking singletons and doubletons')
+        fs = mask_low(fs)
+        suffix = "_masked"
+    elif masked == "no":
+        suffix = ""
+    else:
+        raise ValueError("choose appropriate masking!")
 
-    if len(pop_ids) == 1:
-        if masked == "low":
-            fs.mask[1] = True
-            fs.mask[2] = True
-            fig2 = pylab.figure(figsize=fig_size, cmap=colour_map)
-            dadi.Plotting.plot_1d_fs(fs)
-            fig2.tight_layout()
-            fig2.savefig("../plots/spectra/" + plot_out_name + "_masked.png", dpi=300)
-        elif masked == "no":
-            dadi.Plotting.plot_1d_fs(fs)
-            fig1.tight_layout()
-            fig1.savefig("../plots/spectra/" + plot_out_name + ".png", dpi=300)
-        else:
-            print(":(")
-    elif len(pop_ids) == 2:
-        if masked == "low":
-            fs.mask[0, 1] = True
-            fs.mask[1, 0] = True
-            fs.mask[2, 0] = True
-            fs.mask[0, 2] = True
-            fs.mask[1, 1] = True
-            fig2 = pylab.figure(figsize=fig_size)
-            dadi.Plotting.plot_single_2d_sfs(fs, vmin=v_min, cmap=colour_map)
-            fig2.tight_layout()
-            fig2.savefig("../plots/spectra/" + plot_out_name + "_2D_masked.png", dpi=300)
-        elif masked == "no":
-            dadi.Plotting.plot_single_2d_sfs(fs, vmin=v_min, cmap=colour_map)
-            #dadi.Plotting.plot_single_2d_sfs(fs, vmin=v_min)
-            fig1.tight_layout()
-            fig1.savefig("../plots/spectra/" + plot_out_name + "_2D.png", dpi=300)
-        else:
-            raise ValueError("choose appropriate masking!")
-    elif len(pop_ids) == 3:
-        if masked == "low":
-            print('Masking singletons and doubletons')
-            fs.mask[0, 0, 1] = True
-            fs.mask[0, 1, 0] = True
-            fs.mask[1, 0, 0] = True
-            fs.mask[0, 1, 1] = True
-            fs.mask[1, 0, 1] = True
-            fs.mask[1, 1, 0] = True
-            fs.mask[2, 0, 0] = True
-            fs.mask[0, 2, 0] = True
-            fs.mask[0, 0, 2] = True
-            dadi.Plotting.plot_3d_spectrum(fs, vmin=v_min, cmap=colour_map)
-            fig1.tight_layout()
-            fig1.savefig("../plots/spectra/" + plot_out_name + "_3D_masked.png", dpi=300)
-        elif masked == "no":
-            dadi.Plotting.plot_3d_spectrum(fs, vmin=v_min, cmap=colour_map)
-            fig1.tight_layout()
-            fig1.savefig("../plots/spectra/" + plot_out_name + "_3D.png", dpi=300)
-        else:
-            print(":(")
+    if len(fs.sample_sizes) == 1:
+        dadi.Plotting.plot_1d_fs(fs)
+        fig.tight_layout()
+        fig.savefig("../plots/spectra/" + plot_out_name + suffix + ".png", dpi=300)
+    elif len(fs.sample_sizes) == 2:
+        dadi.Plotting.plot_single_2d_sfs(fs, vmin=v_min, cmap=colour_map)
+        fig.tight_layout()
+        fig.savefig("../plots/spectra/" + plot_out_name + "_2D" + suffix + ".png", dpi=300)
+    elif len(fs.sample_sizes) == 3:
+        # plot_3d_spectrum colours with hsv itself
+        dadi.Plotting.plot_3d_spectrum(fs, fignum=fig.number, vmin=v_min, show=False)
+        fig.tight_layout()
+        fig.savefig("../plots/spectra/" + plot_out_name + "_3D" + suffix + ".png", dpi=300)
     else:
         raise ValueError("Pop IDs not configured appropriately - check input :)")
+    pylab.close(fig)
 
+
+def report(snps, fs, fold, masked, plot_out_name, stats_out_name, unmasked=True):
+    """Statistics and plot of fs, and statistics of fs masked if masked is low (unmasked=False skips the first)."""
+    if unmasked:
+        write_stats(snps, fs, fold, stats_out_name)
+    plot(fs, masked, plot_out_name)
     if masked == "low":
         print("\n...Masking spectra...\n")
-        fs.mask[0, 1] = True
-        fs.mask[1, 0] = True
-        fs.mask[2, 0] = True
-        fs.mask[0, 2] = True
-        fs.mask[1, 1] = True
-
-        print("\n* * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * *\n")
-        print("Data for masked site frequency spectrum:\n")
-        print("Sample sizes: {}".format(fs.sample_sizes))
-        print("Sum of SFS: {}".format(np.around(fs.S(), 2)))
-        if len(pop_ids) == 2:
-            print("FST of SFS: {}".format(np.around(fs.Fst(), 2)))
-            stat = np.around(fs.Fst(), 2)
-        elif len(pop_ids) == 1:
-            print("Tajima's D of SFS: {}".format(np.around(fs.Tajima_D())))
-            stat = np.around(fs.Tajima_D(), 2)
-        print("\n* * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * *\n")
-
-        with open(stats_out_name, "a") as stats_out:
-            stats_out.write("{0}\t{1}\t{2}\t{3}\t{4}\n".format(snps, fs.sample_sizes, fold, np.around(fs.S(), 2),
-                                                          stat))
-    elif masked == "no":
-        print("low frequency SNP masking not performed |-O-O-|")
+        write_stats(snps, mask_low(fs), fold, stats_out_name, title="Data for masked site frequency spectrum:")
     else:
-        print("choose an appropriate option for masking - \"low\" \"mid\" or \"no\"")
+        print("low frequency SNP masking not performed |-O-O-|")
+
+
+def main(snps, fold, masked, method, genotypes, cache=True):
+    # Import the spectrum and popfile from data/vcf/ and data/popfile/
+    snp_path = vcf_utils.vcf_path(snps)
+    pop_path = "../data/popfile/pop_" + snps + ".txt"
+    pops = "{}".format(snps)
+    pop_ids = pops.split("-")
+    start_stats(STATS_OUT_NAME)
+
+    # Configuring haplotypes and genotypes
+    if len(pop_ids) == 1:
+        print("One dimensional sfs")
+    elif len(pop_ids) == 2:
+        print("Two dimensional sfs")
+    proj, subsample = sample_sizes(pop_ids, genotypes)
+
+    name = fs_name(snps, fold, method)
+    fs = vcf_utils.spectrum_from_vcf(snp_path, pop_path, pop_ids, proj, polarized=fold == "unfolded",
+                                     subsample=subsample if method == "subsample" else None, cache=cache)
+    fs.to_file("../data/fs/{}.fs".format(name))
+
+    # Printing out stats for the fs
+    print("The datafile will be named {}".format(snps))
+    report(snps, fs, fold, masked, snps + "_" + "-".join(map(str, proj)), STATS_OUT_NAME)
+
+
+def read_variants(variants_path):
+    """
+    (pop_ids, fold, masked, method, genotypes) of each line of a variants file, skipping blank and # lines. pop_ids
+    is None unless the line starts with the populations of its spectrum.
+    """
+    variants = []
+    with open(variants_path) as variants_file:
+        for line in variants_file:
+            if line.strip() == "" or line.startswith("#"):
+                continue
+            fields = line.split()
+            pop_ids = None
+            if fields[0] not in ["folded", "unfolded"]:
+                pop_ids = fields.pop(0).split("-")
+            fold, masked, method, *genotypes = fields
+            variants.append((pop_ids, fold, masked, method, [int(g) for g in genotypes]))
+    return variants
+
+
+def population_variants(variants, pops, size):
+    """
+    The variants (without populations) for every combination of size (2 for pairs, 3 for triples) of pops, with the
+    genotypes of each population: one number for all of them, or one per population of pops.
+    """
+    combined = []
+    for pop_ids, fold, masked, method, genotypes in variants:
+        if len(genotypes) not in [1, len(pops)]:
+            raise ValueError("Give one number of genotypes, or one for each of {}".format(", ".join(pops)))
+        for pop_set in itertools.combinations(pops, size):
+            pop_genotypes = [genotypes[0] if len(genotypes) == 1 else genotypes[pops.index(pop)] for pop in pop_set]
+            combined.append((list(pop_set), fold, masked, method, pop_genotypes))
+    return combined
+
+
+def make_variants(snps, variants, cache=True, pop_path=None):
+    """
+    Every (pop_ids, fold, masked, method, genotypes) variant of the spectra of snps, from one parse of the vcf.
+
+    The allele counts of the vcf are read once in chunks, from the cache or the vcf, and vcf_utils.population_spectra
+    derives every population set, fold, projection and subsample with one unfolded spectrum per sample size; masks
+    are applied in memory. pop_ids of None are the populations of snps, otherwise snps can be a multi-population vcf
+    with its populations in pop_path. The .fs files and plots are named with the populations and sample sizes, e.g.,
+    AG1-AG2_projected_20-20.fs, so that variants do not overwrite each other.
+    """
+    snp_path = vcf_utils.vcf_path(snps)
+    if pop_path is None:
+        pop_path = "../data/popfile/pop_" + snps + ".txt"
+    start_stats(STATS_OUT_NAME)
+
+    requests = []
+    for pop_ids, fold, masked, method, genotypes in variants:
+        if pop_ids is None:
+            pop_ids = snps.split("-")
+        proj, subsample = sample_sizes(pop_ids, genotypes)
+        requests.append((pop_ids, proj, subsample if method == "subsample" else None, fold == "unfolded"))
+    spectra = vcf_utils.population_spectra(snp_path, pop_path, requests, cache=cache)
+
+    saved = set()
+    for (_, fold, masked, method, genotypes), (pop_ids, proj, _, _), fs in zip(variants, requests, spectra):
+        pops = "-".join(pop_ids)
+        name = fs_name(pops, fold, method) + "_" + "-".join(map(str, proj))
+        print("\n{} {} {} {} {}: {}".format(pops, fold, masked, method, genotypes, name))
+        # Variants that only differ in masking share the .fs file and unmasked statistics.
+        if name not in saved:
+            fs.to_file("../data/fs/{}.fs".format(name))
+        report(pops, fs, fold, masked, name, STATS_OUT_NAME, unmasked=name not in saved)
+        saved.add(name)
 
 
 if __name__ == '__main__':
@@ -218,34 +261,83 @@ if __name__ == '__main__':
     )
     parser.add_argument(
         "fold",
+        nargs="?",
         help="Fold type (e.g., 'unfolded' or 'folded')."
     )
     parser.add_argument(
         "masked",
-        help="Masking method (e.g., 'mid')."
+        nargs="?",
+        help="Masking method (e.g., 'low' or 'no')."
     )
     parser.add_argument(
         "method",
+        nargs="?",
         help="Where the fs is projected, subsampled or not (e.g., 'projection')."
     )
     parser.add_argument(
         "genotypes",
         type=int,
-        nargs="+",
+        nargs="*",
         help="List of integers specifying the genotype counts."
     )
+    parser.add_argument(
+        "--no_cache",
+        action="store_true",
+        help="Read the vcf without using or writing the allele count cache in data/vcf/cache/ (see vcf_utils.py)."
+    )
+    parser.add_argument(
+        "--variants",
+        help="Text file with one variant per line, '[populations] fold masked method genotypes' (e.g., 'folded low "
+             "projection 10 10' or 'group1-group2 folded low projection 10 10'), made from one parse of the vcf "
+             "instead of the fold, masked, method and genotypes arguments."
+    )
+    parser.add_argument(
+        "--popfile",
+        help="Popfile of a multi-population vcf (e.g., ../data/popfile/pop_ahya.txt), instead of "
+             "data/popfile/pop_<snps>.txt."
+    )
+    parser.add_argument(
+        "--pairs",
+        action="store_true",
+        help="Make the variants (without populations) for every pair of populations in the popfile."
+    )
+    parser.add_argument(
+        "--triples",
+        action="store_true",
+        help="Make the variants (without populations) for every triple of populations in the popfile."
+    )
 
     # Parse arguments
     args: Namespace = parser.parse_args()
 
-    # Setting variables
-    snps = args.snps
-    fold = args.fold
-    masked = args.masked
-    method = args.method
-    genotypes = args.genotypes
-
-    # Call the main function with parsed arguments
-    main(snps, fold, masked, method, genotypes)
+    if args.variants or args.pairs or args.triples or args.popfile:
+        if args.variants:
+            variants = read_variants(args.variants)
+        elif args.fold is None or args.masked is None or args.method is None or not args.genotypes:
+            parser.error("fold, masked, method and genotypes are required without --variants")
+        else:
+            variants = [(None, args.fold, args.masked, args.method, args.genotypes)]
+        pop_path = args.popfile if args.popfile else "../data/popfile/pop_" + args.snps + ".txt"
+        if args.pairs or args.triples:
+            pops = vcf_utils.popfile_pops(pop_path)
+            # Variants with their own populations are kept once, the others made for every pair and/or triple.
+            no_pops = [variant for variant in variants if variant[0] is None]
+            variants = [variant for variant in variants if variant[0] is not None]
+            if args.pairs:
+                variants += population_variants(no_pops, pops, 2)
+            if args.triples:
+                variants += population_variants(no_pops, pops, 3)
+        make_variants(args.snps, variants, cache=not args.no_cache, pop_path=pop_path)
+    else:
+        if args.fold is None or args.masked is None or args.method is None or not args.genotypes:
+            parser.error("fold, masked, method and genotypes are required without --variants")
 
+        # Setting variables
+        snps = args.snps
+        fold = args.fold
+        masked = args.masked
+        method = args.method
+        genotypes = args.genotypes
 
+        # Call the main function with parsed arguments
+        main(snps, fold, masked, method, genotypes, cache=not args.no_cache)
@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+@author: Katharine Prata
+@date created: 18/10/26
+@description: Shared helpers for evaluating extrapolated dadi models.
+
+cached_extrap_func wraps Numerics.make_extrap_(log_)func in a bounded LRU cache that is shared
+by every model in the process, so the same parameters, sample sizes and PTS are only ever
+simulated once (e.g., the optimiser's final point, or the optimised parameters in every bootstrap).
+The cache is per process: each pool worker (e.g., of optimise_manual.py --workers) keeps its own.
+
+parallel_extrap_func integrates the model at each PTS grid size in its own process and extrapolates
+the results exactly as dadi does, so one evaluation takes as long as its largest grid.
+
+evaluate_targets fits one parameter set to several spectra of the same populations (e.g., the full,
+projected and masked spectra). Models that memoise their phi (model_utils.memoised_phi, memoised_branches
+or memoised_two_periods) are then integrated once per grid size for all of them, and only the sampling is
+repeated for each sample size. Other models are integrated again for every sample size, which
+evaluate_targets counts.
+
+Compatible with python 3.6.11 and dadi 2.1.1
+"""
+
+from collections import OrderedDict
+from dadi import Inference, Numerics
+import model_utils
+import multiprocessing
+import numpy
+
+# Maximum number of model spectra kept, least recently used are dropped first.
+CACHE_SIZE = 256
+# Parameters are rounded to this many decimals for the cache key.
+CACHE_DECIMALS = 10
+
+_cache = OrderedDict()
+_stats = {"hits": 0, "misses": 0}
+# Process pool for the grid sizes of parallel_extrap_func, started on first use.
+_pts_pool = {"pool": None, "workers": 0}
+
+
+def model_name(model_fun):
+    """Name that identifies a model function across modules, e.g., demo_models_kp.iso_inbreeding."""
+    return "{}.{}".format(model_fun.__module__, model_fun.__name__)
+
+
+def cache_info():
+    """Return the hits, misses and current size of the model cache."""
+    return {"hits": _stats["hits"], "misses": _stats["misses"], "size": len(_cache), "maxsize": CACHE_SIZE}
+
+
+def print_cache_info():
+    info = cache_info()
+    print("Model cache: {} hits, {} misses, {} of {} spectra stored".format(info["hits"], info["misses"],
+                                                                          info["size"], info["maxsize"]))
+
+
+def clear_cache():
+    _cache.clear()
+    _stats["hits"] = 0
+    _stats["misses"] = 0
+
+
+class CachedModel:
+    """
+    Extrapolated model function whose spectra are kept in the LRU cache of this process. Pool workers each
+    have their own cache, so a spectrum simulated in one worker is simulated again in another.
+    """
+
+    def __init__(self, model_fun, func_ex, log=True):
+        self.model_fun = model_fun
+        self.func_ex = func_ex
+        self.name = model_name(model_fun)
+        self.log = log
+
+    def key(self, params, ns, pts):
+        return (self.name, self.log, tuple(numpy.around(numpy.asarray(params, dtype=float), CACHE_DECIMALS)),
+                tuple(int(n) for n in ns), tuple(int(p) for p in numpy.atleast_1d(pts)))
+
+    def __call__(self, params, ns, pts):
+        key = self.key(params, ns, pts)
+        if key in _cache:
+            _stats["hits"] += 1
+            _cache.move_to_end(key)
+            return _cache[key].copy()
+        _stats["misses"] += 1
+        sim_model = self.func_ex(params, ns, pts)
+        if CACHE_SIZE > 0:
+            _cache[key] = sim_model.copy()
+            while len(_cache) > CACHE_SIZE:
+                _cache.popitem(last=False)
+        return sim_model
+
+
+def _integrate(task):
+    """Evaluate a model at a single grid size in a pool worker."""
+    model_fun, params, ns, pts = task
+    return model_fun(params, ns, pts)
+
+
+def _lookup(results, pts):
+    """Stand-in model for dadi's extrapolation that returns an already integrated result."""
+    return results[pts]
+
+
+def get_pts_pool(workers):
+    """Return the shared pool for integrating grid sizes, or None if we are already inside a pool worker."""
+    if multiprocessing.current_process().daemon:
+        # Daemonic processes (e.g., optimise_manual --workers) cannot have children.
+        return None
+    if _pts_pool["pool"] is None or _pts_pool["workers"] != workers:
+        close_pts_pool()
+        _pts_pool["pool"] = multiprocessing.Pool(workers)
+        _pts_pool["workers"] = workers
+    return _pts_pool["pool"]
+
+
+def close_pts_pool():
+    if _pts_pool["pool"] is not None:
+        _pts_pool["pool"].terminate()
+        _pts_pool["pool"] = None
+        _pts_pool["workers"] = 0
+
+
+class ParallelExtrapModel:
+    """
+    Extrapolated model function that integrates each grid size in a separate process.
+
+    The model function must be importable from a module (e.g., demo_models_kp or a custom_model_*.py
+    file) so that it can be sent to the workers. Inside a daemonic pool worker the grid sizes are
+    integrated one after another instead.
+    """
+
+    def __init__(self, model_fun, log=True, workers=3):
+        self.model_fun = model_fun
+        self.workers = workers
+        self.extrap = Numerics.make_extrap_func(_lookup, extrap_log=log)
+
+    def __call__(self, params, ns, pts):
+        pts_l = [pts] if numpy.isscalar(pts) else list(pts)
+        tasks = [(self.model_fun, params, ns, p) for p in pts_l]
+        pool = get_pts_pool(self.workers)
+        if pool is None:
+            result_l = list(map(_integrate, tasks))
+        else:
+            result_l = pool.map(_integrate, tasks)
+        return self.extrap(dict(zip(pts_l, result_l)), pts_l)
+
+
+def parallel_extrap_func(model_fun, log=True, workers=3):
+    """Equivalent of Numerics.make_extrap_log_func that integrates the grid sizes in parallel."""
+    return ParallelExtrapModel(model_fun, log=log, workers=workers)
+
+
+def cached_extrap_func(model_fun, log=True, pts_workers=1):
+    """
+    Cached equivalent of Numerics.make_extrap_log_func (or make_extrap_func if log=False).
+
+    With pts_workers > 1 the grid sizes of each evaluation are integrated in parallel.
+    """
+    if pts_workers > 1:
+        func_ex = parallel_extrap_func(model_fun, log=log, workers=pts_workers)
+    elif log:
+        func_ex = Numerics.make_extrap_log_func(model_fun)
+    else:
+        func_ex = Numerics.make_extrap_func(model_fun)
+    return CachedModel(model_fun, func_ex, log=log)
+
+
+def evaluate_targets(func_ex, params, targets, pts):
+    """
+    Evaluate one parameter set against several data spectra of the same populations.
+
+    Returns one (sim_model, ll, theta) per target, and how many of the sample sizes after the first
+    integrated the model again. Targets with the same sample sizes (e.g., masked variants) share one
+    simulated spectrum, and for models that memoise their phi the other sample sizes only repeat the
+    sampling, not the integration. Other models (or a phi cache too small for the grids) re-integrate,
+    which is seen as an evaluation that did not take all of its phi from the cache.
+    """
+    results = []
+    sampled = set()
+    integrated = 0
+    for data in targets:
+        ns = tuple(data.sample_sizes)
+        before = model_utils.phi_cache_info()
+        sim_model = func_ex(params, data.sample_sizes, pts)
+        after = model_utils.phi_cache_info()
+        if sampled and ns not in sampled and (after["hits"] == before["hits"] or after["misses"] > before["misses"]
+                                              or after["resumed"] > before["resumed"]):
+            integrated += 1
+        sampled.add(ns)
+        ll = Inference.ll_multinom(sim_model, data)
+        theta = Inference.optimal_sfs_scaling(sim_model, data)
+        results.append((sim_model, ll, theta))
+    return results, integrated
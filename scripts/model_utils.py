@@ -0,0 +1,466 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+@author: Katharine Prata
+@date created: 18/10/26
+@description: Building blocks shared by the model functions in demo_models_kp.py and custom_model_*.py.
+
+The branches of integrate_branches (e.g., the neutral and island parts of the genome) are independent
+once their shared epochs are integrated, and set_branch_mode("process") or ("thread") integrates them
+concurrently. dadi's integrators hold the GIL for most of each timestep, so "process", which forks a pool
+of two workers, is normally the faster of the two.
+
+Compatible with python 3.6.11 and dadi 2.1.1
+"""
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dadi import Integration, Numerics, PhiManip, Spectrum
+from dadi.Numerics import BetaBinomConvolution
+import multiprocessing
+import numpy
+import os
+
+# The phi after each epoch of memoised_phi is kept for reuse until they take up more than this many bytes,
+# least recently used are dropped first.
+PHI_CACHE_BYTES = 256 * 2 ** 20
+
+_phi_cache = OrderedDict()
+_phi_stats = {"hits": 0, "resumed": 0, "misses": 0, "bytes": 0}
+_INTEGRATORS = (Integration.one_pop, Integration.two_pops, Integration.three_pops)
+
+# Grids and equilibrium phi of each grid size, shared by every model in the process.
+_grids = {}
+_equilibrium = {}
+
+# Sampling matrices of from_phi_inbreeding, least recently used are dropped first.
+SAMPLING_CACHE_SIZE = 64
+_sampling = OrderedDict()
+
+BRANCH_MODES = ["thread", "process"]
+# Pool for integrating branches concurrently, None runs them one after another.
+_branch_pool = {"mode": None, "pool": None, "pid": None}
+
+
+def _read_only(array):
+    array.setflags(write=False)
+    return array
+
+
+def default_grid(pts):
+    """
+    Numerics.default_grid(pts), computed once per grid size.
+
+    The grid is read-only, as it is shared by every evaluation.
+    """
+    pts = int(pts)
+    if pts not in _grids:
+        _grids[pts] = _read_only(Numerics.default_grid(pts))
+    return _grids[pts]
+
+
+def equilibrium_phi(xx, dims=1):
+    """
+    Neutral equilibrium phi_1D of grid xx, or phi_1D_to_2D of it (dims=2), computed once per grid.
+
+    The phi is read-only and shared by every evaluation. dadi's integrators and PhiManip return new arrays
+    and never write to the phi they are given, so it can be handed to them directly; copy it before
+    changing it in place.
+    """
+    key = (xx.tobytes(), dims)
+    if key not in _equilibrium:
+        phi = PhiManip.phi_1D(xx)
+        if dims == 2:
+            phi = PhiManip.phi_1D_to_2D(xx, phi)
+        _equilibrium[key] = _read_only(phi)
+    return _equilibrium[key]
+
+
+class ExpGrowth:
+    """
+    Exponential size change from nu0 to nuF over time T, for use as a time-dependent nu in Integration.
+
+    Same as lambda t: nu0 * numpy.exp(numpy.log(nuF / nu0) * t / T), but two with the same parameters
+    compare equal, so epochs that use one can be memoised (see memoised_phi).
+    """
+
+    def __init__(self, nu0, nuF, T):
+        self.nu0 = nu0
+        self.nuF = nuF
+        self.T = T
+
+    def __call__(self, t):
+        return self.nu0 * numpy.exp(numpy.log(self.nuF / self.nu0) * t / self.T)
+
+    def key(self):
+        return "ExpGrowth", float(self.nu0), float(self.nuF), float(self.T)
+
+    def __eq__(self, other):
+        return isinstance(other, ExpGrowth) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+
+def _key_value(value):
+    """Hashable form of an epoch parameter, i.e., a float, or the key of a callable like ExpGrowth."""
+    if hasattr(value, "key"):
+        return value.key()
+    return float(value)
+
+
+def epoch_key(epoch):
+    """Key of an epoch (function, kwargs) of memoised_phi."""
+    function, kwargs = epoch
+    return function.__name__, tuple(sorted((name, _key_value(value)) for name, value in kwargs.items()))
+
+
+def phi_key(model, epochs, pts):
+    """
+    Cache key of the phi of a model after the given epochs at a grid size.
+
+    Integration.timescale_factor changes the integrated phi (e.g., in optimise_manual's prescreen), so it is
+    part of the key.
+    """
+    return model, tuple(epoch_key(epoch) for epoch in epochs), int(pts), Integration.timescale_factor
+
+
+def store_phi(key, phi):
+    """Keep phi under key, dropping the least recently used phi to stay within PHI_CACHE_BYTES."""
+    if phi.nbytes > PHI_CACHE_BYTES or key in _phi_cache:
+        return
+    _phi_cache[key] = _read_only(phi)
+    _phi_stats["bytes"] += phi.nbytes
+    while _phi_stats["bytes"] > PHI_CACHE_BYTES:
+        _, dropped = _phi_cache.popitem(last=False)
+        _phi_stats["bytes"] -= dropped.nbytes
+
+
+def memoised_phi(model, xx, pts, epochs):
+    """
+    Integrate the ancestral phi_1D through a list of epochs and return the final phi.
+
+    Each epoch is (function, kwargs), where function is Integration.one_pop, two_pops or three_pops, or a
+    PhiManip function that adds a population, e.g., (PhiManip.phi_1D_to_2D, {}). The phi after each
+    integrated epoch is cached under the parameters of that epoch and all earlier ones, so an evaluation
+    that only changes later epochs restarts from the last epoch already integrated. Parameters that are
+    not part of any epoch (e.g., inbreeding coefficients) do not cause re-integration at all.
+
+    The phi returned may be shared with later evaluations, so do not modify it.
+    """
+    start = 0
+    phi = None
+    for n in range(len(epochs), 0, -1):
+        key = phi_key(model, epochs[:n], pts)
+        if key in _phi_cache:
+            _phi_cache.move_to_end(key)
+            phi = _phi_cache[key]
+            start = n
+            break
+    if start == len(epochs):
+        _phi_stats["hits"] += 1
+        return phi
+    _phi_stats["resumed" if start else "misses"] += 1
+
+    if phi is None:
+        phi = equilibrium_phi(xx)
+        if epochs[0][0] is PhiManip.phi_1D_to_2D:
+            phi = equilibrium_phi(xx, dims=2)
+            start = 1
+    for n in range(start, len(epochs)):
+        function, kwargs = epochs[n]
+        if function in _INTEGRATORS:
+            phi = function(phi, xx, **kwargs)
+            store_phi(phi_key(model, epochs[:n + 1], pts), phi)
+        else:
+            phi = function(xx, phi, **kwargs)
+    return phi
+
+
+def phi_cache_info():
+    """Return the hits, resumed (partial hits), misses, number and size in bytes of the stored phi."""
+    return {"hits": _phi_stats["hits"], "resumed": _phi_stats["resumed"], "misses": _phi_stats["misses"],
+            "size": len(_phi_cache),
+            "bytes": _phi_stats["bytes"], "maxbytes": PHI_CACHE_BYTES}
+
+
+def print_phi_cache_info():
+    info = phi_cache_info()
+    print("Phi cache: {} hits, {} resumed from an earlier epoch, {} misses, {} phi stored in {:.1f} of {:.1f} MB"
+          .format(info["hits"], info["resumed"], info["misses"], info["size"], info["bytes"] / 2 ** 20,
+                  info["maxbytes"] / 2 ** 20))
+
+
+def clear_phi_cache():
+    _phi_cache.clear()
+    _phi_stats["hits"] = 0
+    _phi_stats["resumed"] = 0
+    _phi_stats["misses"] = 0
+    _phi_stats["bytes"] = 0
+
+
+def ancestral_phi_2D(xx):
+    """phi of an equilibrium ancestral population split into two populations (read-only, see equilibrium_phi)."""
+    return equilibrium_phi(xx, dims=2)
+
+
+def integrate_epochs(phi, xx, epochs):
+    """Integrate phi through a list of epochs, each a dict of Integration.two_pops keyword arguments."""
+    for epoch in epochs:
+        phi = Integration.two_pops(phi, xx, **epoch)
+    return phi
+
+
+def shared_prefix(branches):
+    """Number of epochs that all branches start with, i.e., with identical parameters."""
+    n = 0
+    while all(len(epochs) > n for epochs in branches) and all(epochs[n] == branches[0][n] for epochs in branches):
+        n += 1
+    return n
+
+
+def _integrate_branch(task):
+    return integrate_epochs(*task)
+
+
+def set_branch_mode(mode):
+    """Integrate the branches of integrate_branches in a "thread" or "process" pool, or one after another (None)."""
+    if mode is not None and mode not in BRANCH_MODES:
+        raise ValueError("Branch mode must be one of {} or None, not {}".format(BRANCH_MODES, mode))
+    close_branch_pool()
+    _branch_pool["mode"] = mode
+
+
+def get_branch_pool():
+    """Return the pool for integrating branches, or None if they are integrated one after another."""
+    mode = _branch_pool["mode"]
+    if mode is None or (mode == "process" and multiprocessing.current_process().daemon):
+        # Daemonic processes (e.g., optimise_manual --workers) cannot have children.
+        return None
+    if _branch_pool["pool"] is None or _branch_pool["pid"] != os.getpid():
+        # A pool inherited through a fork has no threads or workers of its own, so start a new one.
+        if mode == "thread":
+            _branch_pool["pool"] = ThreadPoolExecutor(2)
+        else:
+            _branch_pool["pool"] = multiprocessing.Pool(2)
+        _branch_pool["pid"] = os.getpid()
+    return _branch_pool["pool"]
+
+
+def close_branch_pool():
+    pool = _branch_pool["pool"]
+    if pool is not None and _branch_pool["pid"] == os.getpid():
+        if _branch_pool["mode"] == "thread":
+            pool.shutdown()
+        else:
+            pool.terminate()
+    _branch_pool["pool"] = None
+    _branch_pool["pid"] = None
+
+
+def integrate_branches(phi, xx, branches):
+    """
+    Integrate phi through each branch's list of epochs (see integrate_epochs) and return the phi of each branch.
+
+    The epochs that all branches start with are integrated once, and each branch continues from
+    that phi (Integration.two_pops does not modify the phi it is given). With set_branch_mode the
+    branches are then integrated concurrently, and the results are returned once all have finished.
+    """
+    n = shared_prefix(branches)
+    phi = integrate_epochs(phi, xx, branches[0][:n])
+    tasks = [(phi, xx, epochs[n:]) for epochs in branches]
+    pool = get_branch_pool()
+    if pool is None:
+        return [_integrate_branch(task) for task in tasks]
+    return list(pool.map(_integrate_branch, tasks))
+
+
+def _epoch_phis(task):
+    """The phi after each epoch of integrate_epochs(phi, xx, epochs), for task (phi, xx, epochs)."""
+    phi, xx, epochs = task
+    phis = []
+    for epoch in epochs:
+        phi = Integration.two_pops(phi, xx, **epoch)
+        phis.append(phi)
+    return phis
+
+
+def _prefix_key(model, start, epochs, pts):
+    """Cache key of the phi after a list of two_pops epochs, integrated from the phi identified by start."""
+    return (model, "branch", start, tuple(epoch_key((Integration.two_pops, epoch)) for epoch in epochs), int(pts),
+            Integration.timescale_factor)
+
+
+def _cached_phi(key):
+    _phi_cache.move_to_end(key)
+    return _phi_cache[key]
+
+
+def _longest_cached(keys, n):
+    """Number of epochs in the longest of the first n epoch prefixes (keys) that is cached."""
+    return next((k for k in range(n, 0, -1) if keys[k - 1] in _phi_cache), 0)
+
+
+def _memoised_epochs(model, start, initial, xx, pts, branches):
+    """
+    integrate_branches from initial(), the phi identified by start, with the phi of every branch cached after
+    each of its epochs. Each branch resumes from the longest of its epoch prefixes that is cached, and the
+    prefixes that branches share are cached once, so only the epochs after a change are integrated.
+
+    Returns the phi of each branch and whether "all", "some" or "none" of their epochs were cached.
+    """
+    keys = [[_prefix_key(model, start, epochs[:k], pts) for k in range(1, len(epochs) + 1)] for epochs in branches]
+    done = [_longest_cached(branch_keys, len(branch_keys)) for branch_keys in keys]
+    initial_phi = []
+
+    def phi_at(b, k):
+        if k:
+            return _cached_phi(keys[b][k - 1])
+        if not initial_phi:
+            initial_phi.append(initial())
+        return initial_phi[0]
+
+    if all(k == len(epochs) for k, epochs in zip(done, branches)):
+        return [phi_at(b, k) for b, k in enumerate(done)], "all"
+    cached = "some" if any(done) else "none"
+
+    # The epochs that all branches start with have the same keys in every branch, so integrate them once.
+    n = shared_prefix(branches)
+    if any(k < n for k in done):
+        shared = _longest_cached(keys[0], n)
+        phi = phi_at(0, shared)
+        for k, phi in enumerate(_epoch_phis((phi, xx, branches[0][shared:n])), shared + 1):
+            store_phi(keys[0][k - 1], phi)
+        phis = [phi if k <= n else phi_at(b, k) for b, k in enumerate(done)]
+        done = [max(k, n) for k in done]
+    else:
+        phis = [phi_at(b, k) for b, k in enumerate(done)]
+
+    tasks = [(phi, xx, epochs[k:]) for phi, epochs, k in zip(phis, branches, done)]
+    pool = get_branch_pool()
+    if pool is None:
+        steps = [_epoch_phis(task) for task in tasks]
+    else:
+        steps = list(pool.map(_epoch_phis, tasks))
+    for b, branch_steps in enumerate(steps):
+        for k, phi in enumerate(branch_steps, done[b] + 1):
+            store_phi(keys[b][k - 1], phi)
+        if branch_steps:
+            phis[b] = branch_steps[-1]
+    return phis, cached
+
+
+_CACHE_STATS = {"all": "hits", "some": "resumed", "none": "misses"}
+
+
+def memoised_branches(model, xx, pts, branches):
+    """
+    integrate_branches from the ancestral phi_1D_to_2D, with the phi of every branch cached after each of its
+    epochs, so an evaluation that only changes later epochs of a branch resumes from the last epoch already
+    integrated (as in memoised_phi), and the same parameters at other sample sizes are not integrated again.
+
+    The phi returned may be shared with later evaluations, so do not modify them.
+    """
+    phis, cached = _memoised_epochs(model, None, lambda: ancestral_phi_2D(xx), xx, pts, branches)
+    _phi_stats[_CACHE_STATS[cached]] += 1
+    return phis
+
+
+def memoised_two_periods(model, xx, pts, first, P, second):
+    """
+    Branches of a heterogeneous model with two periods: memoised_branches of the first period, mixed at P
+    (see mix_phi), and integrate_branches of the second period from the mixture. The phi of every branch is
+    cached after each epoch of either period, the second period under the first one and P, so each branch
+    resumes from the last epoch already integrated.
+
+    The phi returned may be shared with later evaluations, so do not modify them.
+    """
+    first_cached = []
+
+    def mixed():
+        phis, cached = _memoised_epochs(model, None, lambda: ancestral_phi_2D(xx), xx, pts, first)
+        first_cached.append(cached)
+        return mix_phi(phis[0], phis[1], P)
+
+    start = ("mix", tuple(_prefix_key(model, None, epochs, pts) for epochs in first), _key_value(P))
+    phis, cached = _memoised_epochs(model, start, mixed, xx, pts, second)
+    if cached == "none" and first_cached != ["none"]:
+        cached = "some"
+    _phi_stats[_CACHE_STATS[cached]] += 1
+    return phis
+
+
+def mix_phi(phiN, phiI, P):
+    """Mixture P * phiN + (1 - P) * phiI of the phi of two parts of the genome (e.g., neutral and islands)."""
+    phi = phiN * P
+    phi += (1 - P) * phiI
+    return phi
+
+
+def mixed_spectrum(phiN, phiI, P, ns, xx):
+    """
+    Spectrum of the mixture of two phi.
+
+    Sampling is linear in phi, so projecting the mixed phi once gives the same spectrum as
+    mixing the spectra of phiN and phiI, at half the cost.
+    """
+    return Spectrum.from_phi(mix_phi(phiN, phiI, P), ns, [xx] * len(ns))
+
+
+def trapz_weights(xx):
+    """Weights w such that numpy.sum(w * y) is the trapezoid rule integral of y over grid xx."""
+    dx = numpy.diff(xx)
+    weights = numpy.zeros(len(xx))
+    weights[:-1] += dx / 2
+    weights[1:] += dx / 2
+    return weights
+
+
+def sampling_matrix(n, xx, F, ploidy=2):
+    """
+    Matrix that samples n chromosomes, from n / ploidy individuals with inbreeding F, out of phi on grid xx.
+
+    Row i is the probability of i derived alleles at each frequency in xx, times the trapezoid weights of
+    xx, so that one row dotted with phi integrates like Spectrum.from_phi_inbreeding does. Matrices are
+    cached on (n, xx, F, ploidy) and read-only.
+    """
+    key = (int(n), xx.tobytes(), float(F), int(ploidy))
+    if key in _sampling:
+        _sampling.move_to_end(key)
+        return _sampling[key]
+    if n % ploidy != 0:
+        raise ValueError('Number of chromosomes {0} is not divisible by ploidy {1}.'.format(str(n), str(ploidy)))
+    n_ind = n / ploidy
+    # As in Spectrum._from_phi_*_direct_inbreeding, which keeps the ends of the grid just inside (0, 1).
+    alpha = xx * ((1.0 - F) / F)
+    alpha[0], alpha[-1] = 1.0e-20 * ((1.0 - F) / F), (1.0 - 1.0e-20) * ((1.0 - F) / F)
+    beta = (1.0 - xx) * ((1.0 - F) / F)
+    beta[0], beta[-1] = (1.0 - 1.0e-20) * ((1.0 - F) / F), 1.0e-20 * ((1.0 - F) / F)
+    matrix = numpy.array([[BetaBinomConvolution(i, n_ind, alpha[j], beta[j], ploidy=ploidy) for j in range(len(xx))]
+                          for i in range(int(n) + 1)])
+    matrix *= trapz_weights(xx)
+
+    _sampling[key] = _read_only(matrix)
+    while len(_sampling) > SAMPLING_CACHE_SIZE:
+        _sampling.popitem(last=False)
+    return matrix
+
+
+def from_phi_inbreeding(phi, ns, xxs, Fs, ploidys):
+    """
+    Spectrum.from_phi_inbreeding as a contraction of phi with the cached sampling_matrix of each population.
+
+    Without inbreeding this is Spectrum.from_phi, which already samples with cached matrices of its own.
+    """
+    if numpy.all(numpy.asarray(Fs) == 0):
+        return Spectrum.from_phi(phi, ns, xxs)
+    if not phi.ndim == len(ns) == len(xxs) == len(Fs) == len(ploidys):
+        raise ValueError('Dimensionality of phi and lengths of ns, xxs, ploidys, and Fs do not all agree.')
+    Fs = numpy.minimum(Fs, 1 - 1e-10)
+    data = phi
+    for axis, (n, xx, F, ploidy) in enumerate(zip(ns, xxs, Fs, ploidys)):
+        data = numpy.moveaxis(numpy.tensordot(sampling_matrix(n, xx, F, ploidy), data, axes=([1], [axis])), 0, axis)
+    fs = Spectrum(data, mask_corners=True)
+    fs.extrap_x = xxs[0][1]
+    return fs
@@ -7,20 +7,26 @@
 @description: Create non-parametric bootstraps using the subsample option.
 
 script modified from YRI_CEU.py
+
+The bootstraps use the same sites and fragments as dadi.Misc.bootstraps_subsample_vcf (the last site at each
+CHROM_POS), but draw the subsamples and fragments from numpy.random in a different order (see
+vcf_utils.bootstraps_subsample), so they differ from dadi's bootstraps for the same seed.
 """
 
 import argparse
 import numpy
 import os.path
 import demo_models_kp
-from dadi import Misc, Numerics, Inference
+import model_eval
+from dadi import Inference
 import SETTINGS
 import plot_fs
+import vcf_utils
 
 
 def main(snps, model, sims, genotypes, chunk_size, opt, PTS, mask_type):
     # import the spectrum and popfile from data/vcf and data/popfile
-    snp_path = "../data/vcf/" + snps + ".vcf"
+    snp_path = vcf_utils.vcf_path(snps)
     pop_path = "../data/popfile/pop_" + snps + ".txt"
     pops = "{}".format(snps)
     pop_ids = pops.split("-")
@@ -47,9 +53,11 @@ def main(snps, model, sims, genotypes, chunk_size, opt, PTS, mask_type):
 
         # Making subsampled bootstraps
         # Need to alter chunk_size here depending on how long your contigs are
-    boots_subsample = Misc.bootstraps_subsample_vcf(snp_path, pop_path, chunk_size=chunk_size, Nboot=sims,
-                                                    subsample=subsample,
-                                                    pop_ids=pop_ids, polarized=False)
+    # The vcf is parsed once (or loaded from the allele count cache of make_fs.py) and subsampled for every bootstrap,
+    # with random draws that differ from dadi's (see the description above)
+    data = vcf_utils.load_counts(snp_path, pop_path)
+    boots_subsample = vcf_utils.bootstraps_subsample(data, pop_ids, subsample, Nboot=sims, chunk_size=chunk_size,
+                                                     polarized=False)
     # Saving your bootstraps to file
     for i in range(0, sims):
         bootstrap_out_name = "../results/bootstraps/{}_bootstrap_vcf_{}.fs".format(snps, i)
@@ -74,10 +82,11 @@ def main(snps, model, sims, genotypes, chunk_size, opt, PTS, mask_type):
         print("Please specify the correct model: iso_inbred, mig_inbred, anc_mig or sec_cont.")
 
     # Calculate how well your bootstraps fit your optimised parameters
+    # The model is cached, so it is only simulated once for each set of sample sizes.
+    func_exec = model_eval.cached_extrap_func(model_fun, log=False)
     for i in range(0, sims):
         # Use mask function from plot_fs.py
         plot_fs.apply_mask(boots_subsample[i], mask_type)
-        func_exec = Numerics.make_extrap_func(model_fun)
         sim_model = func_exec(opt, boots_subsample[i].sample_sizes, PTS)
         ll = Inference.ll_multinom(sim_model, boots_subsample[i])
         ll = numpy.around(ll, 2)
@@ -104,6 +113,7 @@ def main(snps, model, sims, genotypes, chunk_size, opt, PTS, mask_type):
         with open(out_name, 'a') as stat_out:
             stat_out.write("{0}\t{1}\t{2}\t{3}\t{4}\t{5}\t{6}\t{7}\n".format(snps, model, ll, aic,
                                                                              theta, boots_subsample[i].S(), chisq, i))
+    model_eval.print_cache_info()
 
 
 if __name__ == '__main__':
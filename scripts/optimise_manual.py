@@ -18,11 +18,34 @@ method = subsample, projection or no
 folds = any integer (best to use: 1, 2 or 3)
 path = outfile path
 (optional) int_params = -p 1 1 1 (any floats for your initial parameter guesses)
+(optional) --starts N --workers K = optimise N perturbed starts in a pool of K processes, the data spectrum is
+    loaded and masked once and each result is appended to the output as soon as it finishes
+(optional) --schedule 3 2 1 = run --starts starts at each fold in turn, seeding each stage from the best --seeds
+    distinct optima of the stage before, and stop once the best optimum has been found --repeats times (within --tol)
+(optional) --prune LL --prune_after N = abort runs still more than LL log-likelihood units behind the best run after
+    N evaluations, the best is shared between the runs of a pool and, with --best_file, between separate jobs
+(optional) --pts_workers 3 = integrate the three PTS grid sizes of every model evaluation in parallel (single start)
+(optional) --branches process = integrate the neutral and island parts of the genome of heterogeneous models at the
+    same time, in a forked pair of processes (single start) or with --branches thread in two threads
+(optional) --optimiser de --generations G --popsize P = one differential evolution search in log space within the
+    SETTINGS bounds, each generation evaluated across --workers, then polished with Nelder-Mead and written as usual
+    (--timeout S scores a candidate that takes longer than S seconds as failed, default 300)
+(optional) --checkpoint N --resume = save the simplex (or population), best point and evaluation count of each run
+    every N iterations, and continue the runs of a killed job with --resume (--checkpoint_dir sets where). The
+    checkpointed runs use scipy's minimize Nelder-Mead with the objective and tolerances of optimize_log_fmin
+(optional) --prescreen N --top K = score N Sobol (or --prescreen_method lhs) points in log space between the SETTINGS
+    bounds at SETTINGS.COARSE_PTS and optimise the best K of them, instead of perturbing the initial parameters
+    (without --workers, instant_change and bottleneck score the prescreen and each DE generation in one batch,
+    batch_1d.py)
+(optional) --coarse --verify = search at SETTINGS.COARSE_PTS before SET_PTS and re-evaluate the optimum at
+    SETTINGS.FINE_PTS, the grid, evaluation count and log-likelihood of each step go to dadi_pts_steps.txt
 
 Run from script path directory and make sure your custom demographic module is within the directory.
 
 Outputs: dadi_optimisation.txt
-Contains the optimal parameters of a run of any model x pop combination
+Contains the optimal parameters of a run of any model x pop combination, and whether the run was optimised or pruned
+(optional) --db results.db = write the results to a SQLite database that many jobs can share instead (see results_db.py)
+    (on a network file system, or with --db_shards, each job writes to a shard of its own, merged by results_db.py)
 
 Compatible with python 3.6.11 and dadi 2.1.1
 """
@@ -30,20 +53,41 @@ Compatible with python 3.6.11 and dadi 2.1.1
 import dadi
 import demo_models_kp
 import argparse
+import batch_1d
+import fcntl
+import functools
+import itertools
+import json
+import model_eval
+import model_utils
+import multiprocessing
+import os
 import numpy
+import results_db
 import SETTINGS
+import signal
+import time
+import warnings
+from scipy.optimize import differential_evolution, minimize
+from scipy.stats import qmc
 
+# Shared by the optimisation workers, set once per process by _init_worker.
+_worker = {}
 
-def main(fs, model, masked, folds, maxiter, int_params, PTS, method=None, path=None):
-    # Import and define data constants
+
+def fs_path(fs, method=None):
+    """Path of the data spectrum for the subsample, projection or neither method."""
     if method == "subsample":
-        data = dadi.Spectrum.from_file('../data/fs/{}_subsampled.fs'.format(fs))
+        return '../data/fs/{}_subsampled.fs'.format(fs)
     elif method == "projection":
-        data = dadi.Spectrum.from_file('../data/fs/{}_projected.fs'.format(fs))
+        return '../data/fs/{}_projected.fs'.format(fs)
     else:
-        data = dadi.Spectrum.from_file('../data/fs/{}.fs'.format(fs))
-    pops = "{}".format(fs)
-    pop_ids = pops.split("-")
+        return '../data/fs/{}.fs'.format(fs)
+
+
+def load_data(fs, masked, method=None):
+    """Import the data spectrum and apply the requested mask."""
+    data = dadi.Spectrum.from_file(fs_path(fs, method))
 
     # Masking
     if masked == "low" and len(data.sample_sizes) == 2:
@@ -64,6 +108,599 @@ def main(fs, model, masked, folds, maxiter, int_params, PTS, method=None, path=N
         print("Mid frequencies masked")
     else:
         print("No masking")
+    return data
+
+
+def fit_statistics(sim_model, data, param_opt):
+    """Log-likelihood, AIC, chi-squared and theta of a simulated model against the data."""
+    # Calculate theta
+    theta = dadi.Inference.optimal_sfs_scaling(sim_model, data)
+    theta = numpy.around(theta, 4)
+
+    # Calculate likelihood
+    ll = dadi.Inference.ll_multinom(sim_model, data)
+    ll = numpy.around(ll, 4)
+
+    # Calculate AIC
+    aic = (-2 * (float(ll))) + (2 * len(param_opt))
+
+    # Calculate  Chi^2
+    scaled_sim_model = sim_model * theta
+    folded_sim_model = scaled_sim_model.fold()
+    if data.folded == folded_sim_model.folded:
+        chi2 = numpy.sum((folded_sim_model - data) ** 2 / folded_sim_model)
+        chi2 = numpy.around(chi2, 4)
+    else:
+        chi2 = numpy.sum((scaled_sim_model - data) ** 2 / scaled_sim_model)
+        chi2 = numpy.around(chi2, 4)
+
+    return [ll, aic, chi2, theta, param_opt]
+
+
+def write_header(out_name):
+    """Create the log file with its header, or report that we are appending to it.
+
+    Returns whether the file has a status column, files created before it was added do not.
+    """
+    with open(out_name, 'a') as opt_out:
+        if opt_out.tell() == 0:
+            print('Creating a new file\n')
+            opt_out.write(
+                "Pop\tMask\tModel\tFolds\tlog-likelihood\tAIC\tchi-squared\ttheta\tinitial_params\toptimised_params\t"
+                "optimised_params_labels\tstatus\n")
+            return True
+        else:
+            print('File exists, appending\n')
+    with open(out_name) as opt_in:
+        return opt_in.readline().rstrip("\n").split("\t")[-1] == "status"
+
+
+def write_result(out_name, fs, masked, model, folds, results, p0, p_labels, status=None):
+    """Append one optimisation result to the log file."""
+    with open(out_name, "a") as opt_out:
+        easy_p = ",".join([str(numpy.around(x, 4)) for x in results[4]])
+        int_p = ",".join([str(numpy.around(x, 4)) for x in p0])
+        line = "{0}\t{1}\t{2}\t{3}\t{4}\t{5}\t{6}\t{7}\t{8}\t{9}\t{10}".format(fs, masked, model, folds[0],
+                                                                               results[0], results[1],
+                                                                               results[2],
+                                                                               results[3], int_p, easy_p,
+                                                                               p_labels)
+        if status is not None:
+            line += "\t{}".format(status)
+        opt_out.write(line + "\n")
+
+
+class PrunedRun(Exception):
+    """Raised inside the optimiser when a run lags too far behind the best log-likelihood."""
+
+
+class SharedBest:
+    """
+    Best log-likelihood found so far by any run of the same fs and model.
+
+    Held in shared memory for the runs of one pool and, if path is given, in a file
+    so that separate jobs (e.g., HPC array jobs) can also see each other's best.
+    """
+
+    def __init__(self, path=None):
+        self.value = multiprocessing.Value('d', -numpy.inf)
+        self.path = path
+
+    def _read_file(self, best_file):
+        best_file.seek(0)
+        text = best_file.read().strip()
+        return float(text) if text else -numpy.inf
+
+    def get(self):
+        best = self.value.value
+        if self.path is not None and os.path.exists(self.path):
+            with open(self.path) as best_file:
+                fcntl.flock(best_file, fcntl.LOCK_SH)
+                best = max(best, self._read_file(best_file))
+        return best
+
+    def update(self, ll):
+        with self.value.get_lock():
+            if ll > self.value.value:
+                self.value.value = ll
+        if self.path is not None:
+            with open(self.path, "a+") as best_file:
+                fcntl.flock(best_file, fcntl.LOCK_EX)
+                if ll > self._read_file(best_file):
+                    best_file.seek(0)
+                    best_file.truncate()
+                    best_file.write("{}\n".format(ll))
+
+
+class PruningModel:
+    """
+    Wraps the extrapolated model function for one run of the optimiser.
+
+    Keeps the run's best log-likelihood, parameters and model spectrum, shares the
+    log-likelihood with other runs, and raises PrunedRun once the run is still more than
+    margin log-likelihood units behind the shared best after a number of evaluations.
+    Only evaluations at the final grid pts are compared, shared or counted, so the
+    log-likelihoods of a coarse search are never set against (or written as) the best.
+    A run is not pruned before it has a finite log-likelihood, as there is no point to report.
+    """
+
+    def __init__(self, func_ex, data, best, margin, after, pts=None):
+        self.func_ex = func_ex
+        self.data = data
+        self.best = best
+        self.margin = margin
+        self.after = after
+        self.pts = pts
+        self.evaluations = 0
+        self.ll = -numpy.inf
+        self.params = None
+        self.sim_model = None
+
+    def __call__(self, params, ns, pts):
+        sim_model = self.func_ex(params, ns, pts)
+        if self.pts is not None and list(pts) != list(self.pts):
+            return sim_model
+        ll = dadi.Inference.ll_multinom(sim_model, self.data)
+        self.evaluations += 1
+        if ll > self.ll:
+            self.ll = ll
+            self.params = numpy.array(params)
+            self.sim_model = sim_model
+            self.best.update(ll)
+        if self.params is not None and self.evaluations >= self.after and self.ll < self.best.get() - self.margin:
+            raise PrunedRun()
+        return sim_model
+
+
+def load_checkpoint(name):
+    """Optimiser state saved by save_checkpoint, or None if there is none."""
+    if name is None or not os.path.exists(name):
+        return None
+    with open(name) as checkpoint:
+        return json.load(checkpoint)
+
+
+def save_checkpoint(name, state):
+    """Write the optimiser state to a temporary file and rename it, so a killed job never leaves half a checkpoint."""
+    with open(name + ".tmp", "w") as checkpoint:
+        json.dump(state, checkpoint, default=lambda x: x.tolist())
+    os.replace(name + ".tmp", name)
+
+
+def log_objective(log_p, data, model_func, pts, upper, lower):
+    """
+    Minus the log-likelihood at exp(log_p), as minimised by dadi.Inference.optimize_log_fmin: points out of
+    bounds, and models whose log-likelihood is not finite, get the same 1e8 penalty.
+    """
+    params = numpy.exp(log_p)
+    if numpy.any(params < lower) or numpy.any(params > upper):
+        return 1e8
+    ll = dadi.Inference.ll_multinom(model_func(params, data.sample_sizes, pts), data)
+    if not numpy.isfinite(ll):
+        return 1e8
+    return -ll
+
+
+def nelder_mead(p1, data, model_func, pts, upper, lower, maxiter, checkpoint, state, every=50):
+    """
+    Nelder-Mead in log space, as optimize_log_fmin, run every iterations at a time with the simplex,
+    iteration and evaluation counts saved to the checkpoint in between. scipy's minimize takes the same
+    steps and stops as the fmin of optimize_log_fmin (initial simplex, xtol = ftol = 1e-4, maxiter iterations
+    and no evaluation limit); restarting from the saved simplex only evaluates its vertices again.
+
+    Continues from the simplex in state if there is one. Returns the optimised parameters, minus
+    their log-likelihood and the number of evaluations.
+    """
+    log_p = numpy.log(p1)
+    result = None
+    # scipy counts the initial simplex as an iteration, so maxiter allows maxiter - 1 steps, and each restart is
+    # given one more iteration than the steps it should take.
+    while state["iterations"] < maxiter - 1:
+        options = {"maxiter": min(every, maxiter - 1 - state["iterations"]) + 1, "xatol": 1e-4, "fatol": 1e-4}
+        if state["simplex"] is not None:
+            options["initial_simplex"] = numpy.array(state["simplex"])
+        result = minimize(log_objective, log_p, args=(data, model_func, pts, upper, lower), method="Nelder-Mead",
+                          options=options)
+        log_p = result.x
+        state.update(simplex=result.final_simplex[0], params=numpy.exp(log_p), ll=-result.fun,
+                     iterations=state["iterations"] + result.nit - 1, evaluations=state["evaluations"] + result.nfev)
+        save_checkpoint(checkpoint, state)
+        if result.status == 0:
+            break
+    fopt = result.fun if result is not None else log_objective(log_p, data, model_func, pts, upper, lower)
+    return numpy.exp(log_p), fopt, state["evaluations"]
+
+
+def new_checkpoint(seed, p1):
+    """Optimiser state of a run that has not started yet."""
+    return {"seed": seed, "p1": p1, "grid": 0, "params": p1, "simplex": None, "iterations": 0, "evaluations": 0,
+            "steps": [], "done": False, "written": False}
+
+
+def optimise(p1, data, func_ex, PTS, upper, lower, maxiter, verbose=1, prune=None, coarse_pts=None, fine_pts=None,
+             checkpoint=None, every=50):
+    """
+    Run one Nelder-Mead optimisation from p1 and return its fit statistics, status and grid steps.
+
+    prune = (SharedBest, margin, after) aborts the run if it lags the shared best, in which
+    case the statistics are for the best point the run reached and the status is "pruned".
+    coarse_pts searches at a smaller grid first and continues from that optimum at PTS,
+    fine_pts re-evaluates the final optimum at a finer grid. Each step is returned as
+    (pts, evaluations, log-likelihood).
+    With a checkpoint file (see new_checkpoint) the optimiser state is saved every few iterations,
+    and the run continues from wherever the checkpoint had got to. With verbose=0 (e.g., in a pool, where
+    the lines of different starts would interleave) the run prints nothing.
+    """
+    model_func = func_ex
+    if prune is not None:
+        model_func = PruningModel(func_ex, data, *prune, pts=PTS)
+    grids = [PTS] if coarse_pts is None else [coarse_pts, PTS]
+    state = load_checkpoint(checkpoint)
+    if state is None:
+        first, steps, param_opt = 0, [], p1
+    else:
+        first, steps, param_opt = state["grid"], [tuple(step) for step in state["steps"]], state["params"]
+        if verbose and (state["iterations"] > 0 or first > 0):
+            print('Resuming from iteration {} at PTS {}'.format(state["iterations"], grids[min(first, len(grids) - 1)]))
+    try:
+        for grid in range(first, len(grids)):
+            pts = grids[grid]
+            if state is None:
+                param_opt, fopt, iters, funcalls, warnflag = dadi.Inference.optimize_log_fmin(param_opt, data,
+                                                                                              model_func, pts,
+                                                                                              lower_bound=lower,
+                                                                                              upper_bound=upper,
+                                                                                              verbose=verbose,
+                                                                                              maxiter=maxiter,
+                                                                                              full_output=True)
+            else:
+                param_opt, fopt, funcalls = nelder_mead(param_opt, data, model_func, pts, upper, lower, maxiter,
+                                                        checkpoint, state, every)
+            steps.append((pts, funcalls, -fopt))
+            if state is not None:
+                state.update(grid=grid + 1, params=param_opt, simplex=None, iterations=0, evaluations=0,
+                             steps=steps)
+                save_checkpoint(checkpoint, state)
+            if verbose and len(grids) > 1:
+                print('PTS {}: {} evaluations, log-likelihood {}'.format(pts, funcalls, numpy.around(-fopt, 4)))
+    except PrunedRun:
+        if verbose:
+            print('Run pruned after {} evaluations at log-likelihood {}'.format(model_func.evaluations,
+                                                                                numpy.around(model_func.ll, 4)))
+        results = fit_statistics(model_func.sim_model, data, model_func.params)
+        if state is not None:
+            state.update(done=True, results=results, status="pruned", steps=steps)
+            save_checkpoint(checkpoint, state)
+        return results, "pruned", steps
+    # The verbose argument controls how often progress of the optimizer should be
+    # printed. It's useful to keep track of optimisation process.
+
+    # Calculate sim model using parameters optimised (p_opt).
+    sim_model = func_ex(param_opt, data.sample_sizes, PTS)
+    results = fit_statistics(sim_model, data, param_opt)
+    if prune is not None:
+        prune[0].update(results[0])
+
+    # Check that the optimum does not move at a finer grid.
+    if fine_pts is not None:
+        fine_ll = dadi.Inference.ll_multinom(func_ex(param_opt, data.sample_sizes, fine_pts), data)
+        steps.append((fine_pts, 1, fine_ll))
+        if verbose:
+            print('PTS {}: log-likelihood {} (PTS {}: {})'.format(fine_pts, numpy.around(fine_ll, 4), PTS,
+                                                                 numpy.around(results[0], 4)))
+    if state is not None:
+        state.update(done=True, results=results, status="optimised", steps=steps)
+        save_checkpoint(checkpoint, state)
+    return results, "optimised", steps
+
+
+def write_steps_header(out_name):
+    """Create the grid steps log file with its header."""
+    with open(out_name, 'a') as steps_out:
+        if steps_out.tell() == 0:
+            steps_out.write("Pop\tMask\tModel\tFolds\tinitial_params\tPTS\tevaluations\tlog-likelihood\n")
+
+
+def write_steps(out_name, fs, masked, model, folds, steps, p0):
+    """Append the grid, evaluation count and log-likelihood of each step of one run."""
+    with open(out_name, "a") as steps_out:
+        int_p = ",".join([str(numpy.around(x, 4)) for x in p0])
+        for pts, evaluations, ll in steps:
+            steps_out.write("{0}\t{1}\t{2}\t{3}\t{4}\t{5}\t{6}\t{7}\n".format(fs, masked, model, folds[0], int_p,
+                                                                              ",".join(map(str, pts)), evaluations,
+                                                                              ll))
+
+
+def _init_worker(data, model, PTS, maxiter, prune, coarse_pts, fine_pts, every):
+    """Set up the spectrum and model once per worker process."""
+    model_fun, num, p_labels, upper, lower = SETTINGS.get_settings(model, ALL=True)
+    _worker["data"] = data
+    _worker["func_ex"] = model_eval.cached_extrap_func(model_fun)
+    _worker["PTS"] = PTS
+    _worker["upper"] = upper
+    _worker["lower"] = lower
+    _worker["maxiter"] = maxiter
+    _worker["prune"] = prune
+    _worker["coarse_pts"] = coarse_pts
+    _worker["fine_pts"] = fine_pts
+    _worker["every"] = every
+
+
+def _run_start(task):
+    """Optimise one perturbed start inside a worker process."""
+    start, seed, p1, checkpoint = task
+    started = time.time()
+    results, status, steps = optimise(p1, _worker["data"], _worker["func_ex"], _worker["PTS"], _worker["upper"],
+                                      _worker["lower"], _worker["maxiter"], verbose=0, prune=_worker["prune"],
+                                      coarse_pts=_worker["coarse_pts"], fine_pts=_worker["fine_pts"],
+                                      checkpoint=checkpoint, every=_worker["every"])
+    return start, seed, p1, results, status, steps, (started, time.time() - started)
+
+
+def run_starts(tasks, pool, data, func_ex, PTS, upper, lower, maxiter, prune=None, coarse_pts=None, fine_pts=None,
+               every=50):
+    """
+    Yield (start, seed, p1, results, status, steps, timing) for each (start, seed, p1, checkpoint) task, in the
+    pool if there is one.
+
+    timing is the (start time, seconds) of the run.
+    """
+    if pool is None:
+        for start, seed, p1, checkpoint in tasks:
+            print('\nInitial parameters are {}\n'.format(numpy.around(p1, 2)))
+            started = time.time()
+            results, status, steps = optimise(p1, data, func_ex, PTS, upper, lower, maxiter, prune=prune,
+                                              coarse_pts=coarse_pts, fine_pts=fine_pts, checkpoint=checkpoint,
+                                              every=every)
+            yield start, seed, p1, results, status, steps, (started, time.time() - started)
+    else:
+        for start, seed, p1, results, status, steps, timing in pool.imap_unordered(_run_start, tasks):
+            print('Start {}: initial parameters {}, log-likelihood {} ({})'.format(start, numpy.around(p1, 2),
+                                                                                    results[0], status))
+            yield start, seed, p1, results, status, steps, timing
+
+
+def _score_point(task):
+    """Log-likelihood of one prescreen point inside a worker process."""
+    p, pts, timescale = task
+    # The uncached model, so that the rough prescreen spectra are not reused by the optimiser.
+    return score_point(p, _worker["data"], _worker["func_ex"].func_ex, pts, timescale)
+
+
+class EvaluationTimeout(Exception):
+    """Raised when one model evaluation of score_point takes longer than its timeout."""
+
+
+def _alarm(signum, frame):
+    raise EvaluationTimeout()
+
+
+def score_point(p, data, func_ex, pts, timescale=None, timeout=None):
+    """
+    Log-likelihood of the model at p, points the model cannot be evaluated at score -inf.
+
+    timescale temporarily replaces dadi's integration timescale_factor, larger values take fewer time steps.
+    With a timeout (seconds, in the main thread of a process, e.g., a pool worker) a point whose evaluation
+    takes longer, e.g., extreme parameters at the bounds that need very many time steps, also scores -inf.
+    """
+    default_timescale = dadi.Integration.timescale_factor
+    if timescale is not None:
+        dadi.Integration.timescale_factor = timescale
+    if timeout:
+        previous = signal.signal(signal.SIGALRM, _alarm)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        with numpy.errstate(all="ignore"):
+            ll = dadi.Inference.ll_multinom(func_ex(p, data.sample_sizes, pts), data)
+    except (ValueError, FloatingPointError, ZeroDivisionError, EvaluationTimeout):
+        return -numpy.inf
+    finally:
+        if timeout:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+        dadi.Integration.timescale_factor = default_timescale
+    return ll if numpy.isfinite(ll) else -numpy.inf
+
+
+def score_batch(points, data, model_fun, pts, timescale=None):
+    """Log-likelihoods of all the points at once with the batched version of the model, see batch_1d.py."""
+    default_timescale = dadi.Integration.timescale_factor
+    if timescale is not None:
+        dadi.Integration.timescale_factor = timescale
+    try:
+        return batch_1d.score(model_fun, points, data, pts)
+    finally:
+        dadi.Integration.timescale_factor = default_timescale
+
+
+def prescreen(n_points, top, data, func_ex, pts, upper, lower, pool=None, method="sobol", timescale=None):
+    """
+    Draw n_points quasi-random parameter sets in log space between the lower and upper bounds,
+    score them on the grid pts (and coarser time steps, see score_point) and return the best top
+    of them, best first.
+    """
+    d = len(upper)
+    if method == "sobol":
+        sampler = qmc.Sobol(d, scramble=True, seed=numpy.random.randint(2 ** 31))
+    else:
+        sampler = qmc.LatinHypercube(d, seed=numpy.random.randint(2 ** 31))
+    with warnings.catch_warnings():
+        # Sobol points are only balanced for powers of two, which we do not insist on.
+        warnings.simplefilter("ignore", UserWarning)
+        unit = sampler.random(n_points)
+    points = numpy.exp(qmc.scale(unit, numpy.log(lower), numpy.log(upper)))
+
+    if pool is None and batch_1d.batched(func_ex.model_fun) is not None:
+        scores = score_batch(points, data, func_ex.model_fun, pts, timescale)
+    elif pool is None:
+        scores = [score_point(p, data, func_ex.func_ex, pts, timescale) for p in points]
+    else:
+        scores = pool.map(_score_point, [(p, pts, timescale) for p in points])
+    best = numpy.argsort(scores)[::-1][:top]
+    print('Prescreened {} {} points at PTS {}, best log-likelihoods: {}\n'.format(
+        n_points, method, pts, numpy.around([scores[i] for i in best], 2)))
+    return [points[i] for i in best]
+
+
+def neg_ll(log_p, data, func_ex, pts, timeout=None):
+    """Objective for the global search: minus the log-likelihood at exp(log_p)."""
+    ll = score_point(numpy.exp(log_p), data, func_ex, pts, timeout=timeout)
+    # dadi scores failed or out of bounds parameters the same way.
+    return -ll if numpy.isfinite(ll) else 1e8
+
+
+def batch_neg_ll(log_p, data, model_fun, pts):
+    """Vectorised global search objective for the columns of log_p, one candidate each."""
+    ll = score_batch(numpy.exp(log_p.T), data, model_fun, pts)
+    return numpy.where(numpy.isfinite(ll), -ll, 1e8)
+
+
+def _neg_ll(log_p, timeout=None):
+    """Global search objective inside a worker process."""
+    return neg_ll(log_p, _worker["data"], _worker["func_ex"], _worker["PTS"], timeout)
+
+
+def global_search(data, func_ex, PTS, upper, lower, pool=None, generations=100, popsize=15, checkpoint=None,
+                  every=50, timeout=None):
+    """
+    Differential evolution in log space between the lower and upper bounds.
+
+    Each generation's candidates are evaluated across the pool if there is one, or otherwise all together
+    if the model has a batched version (see batch_1d.py). A candidate whose evaluation takes longer than
+    timeout seconds scores as failed (not for batched models, whose candidates are evaluated together).
+    Returns the best parameters and their log-likelihood. With a checkpoint file the population is saved
+    every few generations, and the search continues from the saved population if there is one; each of
+    these chunks is a new call of differential_evolution, which scores its whole population again.
+    """
+    bounds = list(zip(numpy.log(lower), numpy.log(upper)))
+    vectorized = pool is None and batch_1d.batched(func_ex.model_fun) is not None
+    if vectorized:
+        objective, workers = lambda log_p: batch_neg_ll(log_p, data, func_ex.model_fun, PTS), 1
+    elif pool is None:
+        objective, workers = lambda log_p: neg_ll(log_p, data, func_ex, PTS, timeout), 1
+    else:
+        objective, workers = functools.partial(_neg_ll, timeout=timeout), pool.map
+
+    generation = [0]
+
+    def report(log_p, convergence=None):
+        generation[0] += 1
+        print('Generation {}: best parameters {}, convergence {}'.format(generation[0],
+                                                                        numpy.around(numpy.exp(log_p), 4),
+                                                                        numpy.around(convergence, 4)))
+
+    state = load_checkpoint(checkpoint)
+    if state is None:
+        state = {"population": None, "generations": 0, "evaluations": 0, "best": None, "ll": None, "done": False}
+    elif not state["done"]:
+        print('Resuming differential evolution from generation {}'.format(state["generations"]))
+    generation[0] = state["generations"]
+    message = "resumed after the search had finished"
+    while not state["done"] and state["generations"] < generations:
+        # Without a checkpoint this is a single run of all the generations.
+        chunk = generations - state["generations"]
+        if checkpoint is not None:
+            chunk = min(every, chunk)
+        init = "latinhypercube" if state["population"] is None else numpy.array(state["population"])
+        result = differential_evolution(objective, bounds, maxiter=chunk, popsize=popsize, init=init,
+                                        seed=numpy.random.randint(2 ** 31), polish=False, updating="deferred",
+                                        workers=workers, vectorized=vectorized, callback=report)
+        state.update(population=result.population, generations=state["generations"] + result.nit,
+                     evaluations=state["evaluations"] + result.nfev, best=numpy.exp(result.x), ll=-result.fun,
+                     done=bool(result.success) or state["generations"] + result.nit >= generations)
+        message = result.message
+        if checkpoint is not None:
+            save_checkpoint(checkpoint, state)
+    print('\nDifferential evolution finished after {} generations and {} evaluations: {}\n'.format(
+        state["generations"], state["evaluations"], message))
+    return numpy.array(state["best"]), state["ll"]
+
+
+def default_checkpoint_dir(path, fs, model, masked, method, folds, schedule):
+    """
+    Checkpoint directory of a job, named by everything its runs depend on (fs, model, mask, method, and folds or
+    schedule) and the task id of an HPC array job, so that jobs sharing out_path do not resume each other's runs.
+    """
+    parts = [fs, model, masked, method, "folds" + "-".join(str(fold) for fold in (schedule or folds))]
+    for variable in ["SLURM_ARRAY_TASK_ID", "PBS_ARRAY_INDEX", "PBS_ARRAYID", "SGE_TASK_ID", "LSB_JOBINDEX"]:
+        if os.environ.get(variable):
+            parts.append("task" + os.environ[variable])
+            break
+    return path + "_".join(str(part) for part in parts if part is not None) + "_checkpoints/"
+
+
+def checkpoint_tasks(tasks, checkpoint_dir, stage, resume=False):
+    """
+    Give each (start, seed, p1) task a checkpoint file, and split off the runs that had already finished.
+
+    Returns the (start, seed, p1, checkpoint) tasks still to run and the (checkpoint, state) of finished runs.
+    """
+    if checkpoint_dir is None:
+        return [task + (None,) for task in tasks], []
+    ready, finished = [], []
+    for start, seed, p1 in tasks:
+        name = checkpoint_dir + "stage{}_start{}.json".format(stage, start)
+        state = load_checkpoint(name) if resume else None
+        if state is None:
+            state = new_checkpoint(seed, p1)
+            state["start"] = start
+            save_checkpoint(name, state)
+        if state["done"]:
+            finished.append((name, state))
+        else:
+            ready.append((start, state["seed"], state["p1"], name))
+    return ready, finished
+
+
+def resume_tasks(checkpoint_dir, stage):
+    """The (start, seed, p1) tasks of a stage that was started before, from their checkpoints."""
+    tasks = []
+    start = 0
+    while os.path.exists(checkpoint_dir + "stage{}_start{}.json".format(stage, start)):
+        state = load_checkpoint(checkpoint_dir + "stage{}_start{}.json".format(stage, start))
+        tasks.append((start, state["seed"], state["p1"]))
+        start += 1
+    return tasks
+
+
+def finished_runs(finished):
+    """Yield runs that finished before a resume in the same form as run_starts."""
+    for name, state in finished:
+        yield (state["start"], state["seed"], state["p1"], state["results"], state["status"],
+               [tuple(step) for step in state["steps"]], (None, None))
+
+
+def same_optimum(params_a, params_b, tol):
+    """Whether two optimised parameter vectors agree within a relative tolerance."""
+    return numpy.allclose(params_a, params_b, rtol=tol, atol=1e-8)
+
+
+def distinct_optima(all_results, n, tol):
+    """The n best optima by log-likelihood that are not repeats of one another."""
+    optima = []
+    for results in sorted(all_results, key=lambda r: r[0], reverse=True):
+        if not any(same_optimum(results[4], o[4], tol) for o in optima):
+            optima.append(results)
+        if len(optima) == n:
+            break
+    return optima
+
+
+def count_repeats(all_results, tol):
+    """How many times the best parameter vector so far has been found."""
+    best = max(all_results, key=lambda r: r[0])
+    return sum(same_optimum(results[4], best[4], tol) for results in all_results)
+
+
+def main(fs, model, masked, folds, maxiter, int_params, PTS, method=None, path=None, starts=1, workers=1,
+         schedule=None, seeds=5, repeats=3, tol=0.01, prune_ll=None, prune_after=100, best_file=None,
+         coarse_pts=None, fine_pts=None, pts_workers=1, db=None, db_shards=None, prescreen_n=None,
+         prescreen_top=10, prescreen_method="sobol", optimiser="nelder-mead", generations=100, timeout=300, popsize=15,
+         checkpoint_every=None, resume=False, branches=None, checkpoint_dir=None):
+    # Import and define data constants
+    data = load_data(fs, masked, method)
+    pops = "{}".format(fs)
+    pop_ids = pops.split("-")
 
     # Print useful information about the sfs
     print("The datafile is {}".format(fs))
@@ -82,16 +719,22 @@ def main(fs, model, masked, folds, maxiter, int_params, PTS, method=None, path=N
     # Use nicknames for models, e.g., "snm" instead of model function name, e.g., "no_divergence"
     model_fun, num, p_labels, upper, lower = SETTINGS.get_settings(model, ALL=True)
 
-    # Create log file.
-    out_name = path + "dadi_optimisation.txt"
-    with open(out_name, 'a') as opt_out:
-        if opt_out.tell() == 0:
-            print('Creating a new file\n')
-            opt_out.write(
-                "Pop\tMask\tModel\tFolds\tlog-likelihood\tAIC\tchi-squared\ttheta\tinitial_params\toptimised_params\t"
-                "optimised_params_labels\n")
-        else:
-            print('File exists, appending\n')
+    # Create log file, or open the results database.
+    if db is None:
+        out_name = path + "dadi_optimisation.txt"
+        has_status = write_header(out_name)
+    else:
+        conn, db_path = results_db.open_writer(db, db_shards)
+        fs_hash = results_db.file_hash(fs_path(fs, method))
+        print('Writing results to database {}\n'.format(db_path))
+        if db_path != db:
+            print('Merge it into {} once every job has finished: python results_db.py {} --merge\n'.format(db, db))
+    # The grid steps of a coarse-to-fine search are logged to a separate file.
+    steps_name = None
+    if coarse_pts is not None or fine_pts is not None:
+        steps_name = path + "dadi_pts_steps.txt"
+        write_steps_header(steps_name)
+        print('Searching at PTS {} then {}, verifying at {}\n'.format(coarse_pts, PTS, fine_pts))
 
     # This is our initial guess for the parameters, which is somewhat arbitrary.
     if int_params is None:
@@ -99,15 +742,22 @@ def main(fs, model, masked, folds, maxiter, int_params, PTS, method=None, path=N
     else:
         p0 = int_params
 
-    p1 = p0
+    # Without a schedule there is a single stage at the requested folds and no
+    # convergence check, i.e., every start is run.
+    if schedule is None:
+        stages = [folds[0]]
+        repeats = None
+    else:
+        stages = schedule
 
     # Comments from software example (Gutenkunst et al., 2009)
-    # Make the extrapolating version of our demographic model function.
-    func_ex = dadi.Numerics.make_extrap_log_func(model_fun)
+    # Make the extrapolating version of our demographic model function. It is cached
+    # so that re-evaluating the optimiser's final point does not simulate it again.
+    # With pts_workers > 1 the PTS grid sizes of each evaluation are integrated in parallel.
+    func_ex = model_eval.cached_extrap_func(model_fun, pts_workers=pts_workers)
+    # The independent branches of heterogeneous models can be integrated concurrently.
+    model_utils.set_branch_mode(branches)
 
-    # Perturb our parameters before optimisation. This does so by taking each
-    # parameter a up to a factor of "folds" up or down.
-    p1 = dadi.Misc.perturb_params(p1, fold=folds, upper_bound=upper, lower_bound=lower)
     # Do the optimization. By default we assume that theta is a free parameter,
     # since it's trivial to find given the other parameters. If you want to fix
     # theta, add a multinom=False to the call.
@@ -116,54 +766,136 @@ def main(fs, model, masked, folds, maxiter, int_params, PTS, method=None, path=N
     # better convergence. You will also want to run optimization several times
     # using multiple sets of initial parameters, to be confident you've actually
     # found the true maximum likelihood parameters.
-
-    print('\nInitial parameters are {}\n'.format(numpy.around(p1, 2)))
     print('* * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * *')
     print('* * * * * * * * * * * * * * * * * * Beginning  optimisation * * * * * * * * * * * * * * * * * *')
     print('* * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * *')
-    param_opt = dadi.Inference.optimize_log_fmin(p1, data, func_ex, PTS,
-                                                 lower_bound=lower,
-                                                 upper_bound=upper,
-                                                 verbose=1, maxiter=maxiter)
-    # The verbose argument controls how often progress of the optimizer should be
-    # printed. It's useful to keep track of optimisation process.
-
-    # Calculate sim model using parameters optimised (p_opt).
-    sim_model = func_ex(param_opt, data.sample_sizes, PTS)
+    # Runs that are still more than prune_ll log-likelihood units behind the best run
+    # after prune_after evaluations are abandoned.
+    prune = None
+    if prune_ll is not None:
+        prune = (SharedBest(best_file), prune_ll, prune_after)
+        print('Pruning runs {} log-likelihood units behind the best after {} evaluations\n'.format(prune_ll,
+                                                                                               prune_after))
 
-    # Calculate theta
-    theta = dadi.Inference.optimal_sfs_scaling(sim_model, data)
-    theta = numpy.around(theta, 4)
+    # Checkpoints of the optimiser state of every run, so that a killed job can be resumed.
+    every = checkpoint_every or 50
+    if checkpoint_dir is None and (checkpoint_every is not None or resume):
+        checkpoint_dir = default_checkpoint_dir(path, fs, model, masked, method, folds, schedule)
+    if checkpoint_dir is not None:
+        checkpoint_dir = os.path.join(checkpoint_dir, "")
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        print('Checkpointing every {} iterations to {}\n'.format(every, checkpoint_dir))
 
-    # Calculate likelihood
-    ll = dadi.Inference.ll_multinom(sim_model, data)
-    ll = numpy.around(ll, 4)
+    pool = None
+    if starts > 1 or workers > 1:
+        # Multiple starts share one copy of the masked spectrum per worker and
+        # stream their results into the log file as each one finishes.
+        print('\nRunning {} starts per stage on {} workers\n'.format(starts, workers))
+        if pts_workers > 1:
+            print('--pts_workers is ignored when starts run in a pool, each start integrates its grids in turn\n')
+        if branches == "process":
+            print('--branches process is ignored when starts run in a pool, use --branches thread instead\n')
+        pool = multiprocessing.Pool(workers, initializer=_init_worker, initargs=(data, model, PTS, maxiter, prune,
+                                                                                coarse_pts, fine_pts, every))
+    # The prescreen and global search spread their evaluations over the pool if it has more than one worker,
+    # otherwise they are scored in the main process, in one batch for the models of batch_1d.py.
+    search_pool = pool if workers > 1 else None
 
-    # Calculate AIC
-    aic = (-2 * (float(ll))) + (2 * len(param_opt))
+    all_results = []
+    stage_seeds = [p0]
+    converged = False
+    try:
+        for stage, fold in enumerate(stages):
+            # Perturb our parameters before optimisation. This does so by taking each
+            # parameter a up to a factor of "folds" up or down. Starts are perturbed here,
+            # rather than in the workers, so that forked workers do not share a random state.
+            tasks = []
+            if resume:
+                # Runs of a stage that was started before continue from where they were.
+                tasks = resume_tasks(checkpoint_dir, stage)
+            if tasks:
+                print('\nResuming {} runs from {}\n'.format(len(tasks), checkpoint_dir))
+            elif stage == 0 and optimiser == "de":
+                # A single global search, polished by Nelder-Mead from its best point.
+                print('\nDifferential evolution with {} candidates per generation\n'.format(popsize * num))
+                best, ll = global_search(data, func_ex, PTS, upper, lower, search_pool, generations, popsize,
+                                         None if checkpoint_dir is None else checkpoint_dir + "de.json", every,
+                                         timeout)
+                print('Global search best log-likelihood {} at {}\n'.format(numpy.around(ll, 4),
+                                                                             numpy.around(best, 4)))
+                tasks = [(0, best, best)]
+            elif stage == 0 and prescreen_n is not None:
+                # The first stage starts, unperturbed, from the best of the prescreened points.
+                top = prescreen(prescreen_n, prescreen_top, data, func_ex, SETTINGS.COARSE_PTS, upper, lower,
+                                search_pool, prescreen_method, SETTINGS.PRESCREEN_TIMESCALE)
+                tasks = [(start, p1, p1) for start, p1 in enumerate(top)]
+            else:
+                for start in range(starts):
+                    seed = stage_seeds[start % len(stage_seeds)]
+                    p1 = dadi.Misc.perturb_params(seed, fold=fold, upper_bound=upper, lower_bound=lower)
+                    tasks.append((start, seed, p1))
+            if schedule is not None:
+                print('\nStage {}: {} starts at {}-fold from {} seed(s)\n'.format(stage + 1, len(tasks), fold,
+                                                                                 len(stage_seeds)))
 
-    # Calculate  Chi^2
-    scaled_sim_model = sim_model * theta
-    folded_sim_model = scaled_sim_model.fold()
-    if data.folded == folded_sim_model.folded:
-        chi2 = numpy.sum((folded_sim_model - data) ** 2 / folded_sim_model)
-        chi2 = numpy.around(chi2, 4)
-    else:
-        chi2 = numpy.sum((scaled_sim_model - data) ** 2 / scaled_sim_model)
-        chi2 = numpy.around(chi2, 4)
+            tasks, finished = checkpoint_tasks(tasks, checkpoint_dir, stage, resume)
+            written = set(state["start"] for name, state in finished if state["written"])
+            checkpoints = dict((task[0], task[3]) for task in tasks)
+            checkpoints.update((state["start"], name) for name, state in finished)
 
-    # Store results with likelihoods, theta and parameters (max. likelihood)
-    results = [ll, aic, chi2, theta, param_opt]
+            stage_results = []
+            stage_pruned = []
+            for start, seed, p1, results, status, steps, timing in itertools.chain(
+                    finished_runs(finished), run_starts(tasks, pool, data, func_ex, PTS, upper, lower, maxiter,
+                                                        prune, coarse_pts, fine_pts, every)):
+                # Export the results to file, unless this was done before the job was resumed
+                if start in written:
+                    pass
+                elif db is None:
+                    write_result(out_name, fs, masked, model, [fold], results, seed, p_labels,
+                                 status if has_status else None)
+                else:
+                    evaluations = sum(step[1] for step in steps) if steps else None
+                    results_db.insert_run(conn, fs, masked, model, fold, results, seed, p_labels, status=status,
+                                          method=method, fs_hash=fs_hash, pts=PTS, maxiter=maxiter,
+                                          evaluations=evaluations, started=timing[0], seconds=timing[1])
+                if steps_name is not None and start not in written:
+                    write_steps(steps_name, fs, masked, model, [fold], steps, seed)
+                if checkpoints[start] is not None and start not in written:
+                    state = load_checkpoint(checkpoints[start])
+                    state["written"] = True
+                    save_checkpoint(checkpoints[start], state)
+                if status == "pruned":
+                    if results[4] is not None:
+                        stage_pruned.append(results)
+                    continue
+                stage_results.append(results)
+                all_results.append(results)
+                if repeats is not None and count_repeats(all_results, tol) >= repeats:
+                    converged = True
+                    break
+            if converged:
+                best = max(all_results, key=lambda r: r[0])
+                print('\nOptimum with log-likelihood {} found {} times, stopping early\n'.format(best[0], repeats))
+                break
 
-    # Export the results to file
-    with open(out_name, "a") as opt_out:
-        easy_p = ",".join([str(numpy.around(x, 4)) for x in results[4]])
-        int_p = ",".join([str(numpy.around(x, 4)) for x in p0])
-        opt_out.write("{0}\t{1}\t{2}\t{3}\t{4}\t{5}\t{6}\t{7}\t{8}\t{9}\t{10}\n".format(fs, masked, model, folds[0],
-                                                                                        results[0], results[1],
-                                                                                        results[2],
-                                                                                        results[3], int_p, easy_p,
-                                                                                        p_labels))
+            # Seed the next stage from the best distinct optima of this one, or if every run was pruned from the
+            # best points the pruned runs reached, or else keep the seeds of this stage.
+            optima = distinct_optima(stage_results, seeds, tol) or distinct_optima(stage_pruned, seeds, tol)
+            if optima:
+                stage_seeds = [results[4] for results in optima]
+            elif schedule is not None:
+                print('\nNo run of stage {} finished, the next stage starts from the same seeds\n'.format(stage + 1))
+    finally:
+        if pool is not None:
+            pool.terminate()
+        model_eval.close_pts_pool()
+        model_utils.close_branch_pool()
+        if db is not None:
+            conn.close()
+    if pool is None:
+        model_eval.print_cache_info()
+        model_utils.print_phi_cache_info()
     print('* * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * *')
     print('* * * * * * * * * * * * * * * * * *  Finished optimisation  * * * * * * * * * * * * * * * * * *')
     print('* * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * *')
@@ -193,6 +925,139 @@ if __name__ == '__main__':
         type=float,
         help="Initial parameters for optimisation (space-separated list)."
     )
+    parser.add_argument(
+        "--starts",
+        type=int, default=1,
+        help="Number of perturbed starts to optimise (default: 1)."
+    )
+    parser.add_argument(
+        "--workers",
+        type=int, default=1,
+        help="Number of processes to run the starts in (default: 1)."
+    )
+    parser.add_argument(
+        "--schedule",
+        nargs="+", type=int,
+        help="Folds for each stage of a staged search (e.g., 3 2 1), each stage runs --starts starts. "
+             "Overrides folds."
+    )
+    parser.add_argument(
+        "--seeds",
+        type=int, default=5,
+        help="Number of distinct optima from one stage used to seed the next (default: 5)."
+    )
+    parser.add_argument(
+        "--repeats",
+        type=int, default=3,
+        help="Stop the schedule once the best optimum has been found this many times (default: 3)."
+    )
+    parser.add_argument(
+        "--tol",
+        type=float, default=0.01,
+        help="Relative tolerance for two optima to count as the same (default: 0.01)."
+    )
+    parser.add_argument(
+        "--db",
+        help="Write results to this SQLite results database instead of dadi_optimisation.txt."
+    )
+    parser.add_argument(
+        "--db_shards",
+        action="store_true", default=None,
+        help="Write the results to a shard of the --db database for this job, to merge later with results_db.py "
+             "--merge (default: only when the database is on a network file system)."
+    )
+    parser.add_argument(
+        "--pts_workers",
+        type=int, default=1,
+        help="Integrate the PTS grid sizes of each model evaluation in parallel on this many processes (default: 1)."
+    )
+    parser.add_argument(
+        "--branches",
+        choices=model_utils.BRANCH_MODES,
+        help="Integrate the branches of heterogeneous models (e.g., neutral and islands) concurrently, in a pair of "
+             "forked processes or in two threads (default: one after another)."
+    )
+    parser.add_argument(
+        "--checkpoint",
+        type=int,
+        help="Save the optimiser state of every run every this many iterations (or generations for --optimiser de), "
+             "to --checkpoint_dir or <out_path><fs>_<model>_<mask>_<method>_folds<folds>[_task<array id>]_checkpoints/"
+             ". With --optimiser de each chunk of generations restarts the search from the saved population, which "
+             "is scored again, one extra generation of evaluations per chunk."
+    )
+    parser.add_argument(
+        "--checkpoint_dir",
+        help="Directory of the checkpoints of this job (default: named by its arguments and HPC array task id)."
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue the runs saved in the checkpoints of an earlier job with the same arguments."
+    )
+    parser.add_argument(
+        "--optimiser",
+        choices=["nelder-mead", "de"], default="nelder-mead",
+        help="nelder-mead (default) runs local starts, de runs one differential evolution search over the SETTINGS "
+             "bounds, evaluating each generation across --workers, and polishes its best point with Nelder-Mead."
+    )
+    parser.add_argument(
+        "--generations",
+        type=int, default=100,
+        help="Maximum number of differential evolution generations (default: 100)."
+    )
+    parser.add_argument(
+        "--popsize",
+        type=int, default=15,
+        help="Differential evolution candidates per generation, as a multiple of the number of parameters "
+             "(default: 15)."
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float, default=300,
+        help="Score a differential evolution candidate whose evaluation takes longer than this many seconds as "
+             "failed, 0 for no limit (default: 300)."
+    )
+    parser.add_argument(
+        "--prescreen",
+        type=int,
+        help="Score this many quasi-random points between the SETTINGS bounds at SETTINGS.COARSE_PTS (and "
+             "SETTINGS.PRESCREEN_TIMESCALE) and start from the best --top of them instead of perturbing the initial "
+             "parameters."
+    )
+    parser.add_argument(
+        "--top",
+        type=int, default=10,
+        help="Number of prescreened points to optimise (default: 10)."
+    )
+    parser.add_argument(
+        "--prescreen_method",
+        choices=["sobol", "lhs"], default="sobol",
+        help="Sobol sequence or Latin hypercube for the prescreen (default: sobol)."
+    )
+    parser.add_argument(
+        "--coarse",
+        action="store_true",
+        help="Search at SETTINGS.COARSE_PTS first, then continue from that optimum at SETTINGS.SET_PTS."
+    )
+    parser.add_argument(
+        "--verify",
+        action="store_true",
+        help="Re-evaluate each optimum at SETTINGS.FINE_PTS."
+    )
+    parser.add_argument(
+        "--prune",
+        type=float,
+        help="Abort runs that are more than this many log-likelihood units behind the best run."
+    )
+    parser.add_argument(
+        "--prune_after",
+        type=int, default=100,
+        help="Number of model evaluations before a run can be pruned (default: 100)."
+    )
+    parser.add_argument(
+        "--best_file",
+        help="File for sharing the best log-likelihood between separate jobs when pruning."
+    )
 
     args = parser.parse_args()
 
@@ -204,15 +1069,32 @@ if __name__ == '__main__':
     folds = args.folds
     maxiter = args.maxiter
     int_params = args.int_params
+    starts = args.starts
+    workers = args.workers
+    schedule = args.schedule
+    seeds = args.seeds
+    repeats = args.repeats
+    tol = args.tol
+    prune_ll = args.prune
+    prune_after = args.prune_after
+    best_file = args.best_file
 
     # Need to manually define in SETTINGS.py
     # Define optimisation bounds
     PTS = SETTINGS.SET_PTS
     print("PTS is {}".format(PTS))
+    coarse_pts = SETTINGS.COARSE_PTS if args.coarse else None
+    fine_pts = SETTINGS.FINE_PTS if args.verify else None
 
     # If you are wanting to export data to a specific location,
     # uncomment the proceeding comment and argument parse,
     # then add path variable to main function.
     path = "{}".format(args.out_path)
 
-    main(fs, model, masked, folds, maxiter, int_params, PTS, method=method, path=path)
+    main(fs, model, masked, folds, maxiter, int_params, PTS, method=method, path=path, starts=starts, workers=workers,
+         schedule=schedule, seeds=seeds, repeats=repeats, tol=tol, prune_ll=prune_ll, prune_after=prune_after,
+         best_file=best_file, coarse_pts=coarse_pts, fine_pts=fine_pts, pts_workers=args.pts_workers, db=args.db,
+         db_shards=args.db_shards, prescreen_n=args.prescreen, prescreen_top=args.top,
+         prescreen_method=args.prescreen_method, optimiser=args.optimiser, generations=args.generations,
+         timeout=args.timeout, popsize=args.popsize, checkpoint_every=args.checkpoint, resume=args.resume,
+         branches=args.branches, checkpoint_dir=args.checkpoint_dir)
@@ -0,0 +1,277 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+@author: Katharine Prata
+@date created: 18/10/26
+@description: SQLite store for optimisation results that many runs can write to at once.
+
+The database is opened in WAL mode, so concurrent optimise_manual.py jobs (--db) can each append
+their runs without a per-run file and a later concatenation. Every run records its fit statistics,
+status, timings, host and a SHA-256 hash of the input spectrum in the runs table, and one typed row
+per parameter (label, initial and optimised value) in the params table.
+
+WAL needs all writers to be on the same host (it uses shared memory), and SQLite locking is not reliable
+over network file systems. So when the database is on a network file system (NFS, Lustre, GPFS, ...) or
+with --db_shards, each job writes its runs to its own shard database, <db>.shards/<host>_<job>.db, and
+the shards are merged into the database afterwards by one process:
+python results_db.py ../results/optimisation.db --merge
+
+Export to the dadi_optimisation.txt layout used by analyse_dadi_results.py:
+python results_db.py ../results/optimisation.db ../results/dadi_optimisation.txt
+or of one model with a column per parameter:
+python results_db.py ../results/optimisation.db ../results/iso_inbred.txt -m iso_inbred
+
+Compatible with python 3.6.11
+"""
+
+import argparse
+import glob
+import hashlib
+import os
+import socket
+import sqlite3
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    pop TEXT NOT NULL,
+    mask TEXT,
+    model TEXT NOT NULL,
+    folds INTEGER,
+    method TEXT,
+    log_likelihood REAL,
+    aic REAL,
+    chi_squared REAL,
+    theta REAL,
+    status TEXT,
+    fs_hash TEXT,
+    pts TEXT,
+    maxiter INTEGER,
+    evaluations INTEGER,
+    started TEXT,
+    seconds REAL,
+    host TEXT,
+    pid INTEGER
+);
+CREATE TABLE IF NOT EXISTS params (
+    run_id INTEGER NOT NULL REFERENCES runs (run_id),
+    position INTEGER NOT NULL,
+    label TEXT,
+    initial REAL,
+    optimised REAL,
+    PRIMARY KEY (run_id, position)
+);
+CREATE INDEX IF NOT EXISTS runs_pop_model ON runs (pop, mask, model);
+"""
+
+# File system types (from /proc/mounts) that many hosts can mount at once.
+NETWORK_FS = {"nfs", "nfs4", "lustre", "gpfs", "cifs", "smb3", "smbfs", "beegfs", "ceph", "fuse.ceph", "panfs",
+              "afs", "fuse.glusterfs", "fuse.sshfs", "9p"}
+
+HEADER = ["Pop", "Mask", "Model", "Folds", "log-likelihood", "AIC", "chi-squared", "theta", "initial_params",
+          "optimised_params", "optimised_params_labels", "status"]
+
+
+def file_hash(path):
+    """SHA-256 of a file's contents, e.g., the input spectrum."""
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def file_system(path):
+    """Type of the file system that path is (or would be) on, from /proc/mounts, or None if it is not known."""
+    path = os.path.realpath(os.path.dirname(os.path.abspath(path)))
+    try:
+        with open("/proc/mounts") as mounts:
+            entries = [line.split()[1:3] for line in mounts]
+    except OSError:
+        return None
+    fs_type, longest = None, -1
+    for mount, mount_type in entries:
+        mount = mount.replace("\\040", " ")
+        if (path == mount or path.startswith(mount.rstrip("/") + "/")) and len(mount) > longest:
+            fs_type, longest = mount_type, len(mount)
+    return fs_type
+
+
+def on_network_fs(path):
+    """Whether path is on a file system that other hosts can write to at the same time."""
+    return file_system(path) in NETWORK_FS
+
+
+def connect(db_path, timeout=60):
+    """
+    Open (and create if needed) the results database, in WAL mode unless it is on a network file system, where
+    it keeps a rollback journal and should only have one writer (see open_writer and merge).
+    """
+    conn = sqlite3.connect(db_path, timeout=timeout)
+    conn.execute("PRAGMA journal_mode={}".format("DELETE" if on_network_fs(db_path) else "WAL"))
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def connect_readonly(db_path):
+    """Open an existing results database read-only, without creating it or changing its journal mode."""
+    return sqlite3.connect("file:{}?mode=ro".format(os.path.abspath(db_path)), uri=True)
+
+
+def shard_dir(db_path):
+    """Directory of the per-job shard databases of db_path."""
+    return db_path + ".shards"
+
+
+def shard_path(db_path):
+    """Shard database of this job: named by host and the scheduler's job id (SLURM or PBS) or else the process id."""
+    job = os.environ.get("SLURM_JOB_ID") or os.environ.get("PBS_JOBID") or os.environ.get("JOB_ID")
+    name = "{}_{}".format(socket.gethostname(), os.getpid() if job is None else "{}-{}".format(job, os.getpid()))
+    return os.path.join(shard_dir(db_path), name + ".db")
+
+
+def open_writer(db_path, shards=None, timeout=60):
+    """
+    Connection that one job writes its runs to: the database itself, or with shards (by default, whenever the
+    database is on a network file system) a shard database of its own, to be merged into the database later.
+    Returns the connection and the path it writes to.
+    """
+    if shards is None:
+        shards = on_network_fs(db_path)
+    if not shards:
+        return connect(db_path, timeout), db_path
+    path = shard_path(db_path)
+    os.makedirs(shard_dir(db_path), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=timeout)
+    conn.execute("PRAGMA journal_mode=DELETE")
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.executescript(SCHEMA)
+    return conn, path
+
+
+def merge(db_path, remove=True):
+    """
+    Append the runs of every shard database of db_path to it, renumbering their run ids, one shard per
+    transaction, and remove each shard once it is merged. Run this from one process after the jobs have finished.
+    """
+    conn = connect(db_path)
+    columns = ("pop, mask, model, folds, method, log_likelihood, aic, chi_squared, theta, status, fs_hash, pts, "
+               "maxiter, evaluations, started, seconds, host, pid")
+    shards = sorted(glob.glob(os.path.join(shard_dir(db_path), "*.db")))
+    merged = 0
+    for shard in shards:
+        conn.execute("ATTACH DATABASE ? AS shard", (shard,))
+        with conn:
+            offset = conn.execute("SELECT COALESCE(MAX(run_id), 0) FROM runs").fetchone()[0]
+            runs = conn.execute("SELECT COUNT(*) FROM shard.runs").fetchone()[0]
+            conn.execute("INSERT INTO runs (run_id, {0}) SELECT run_id + ?, {0} FROM shard.runs "
+                         "ORDER BY run_id".format(columns), (offset,))
+            conn.execute("INSERT INTO params (run_id, position, label, initial, optimised) "
+                         "SELECT run_id + ?, position, label, initial, optimised FROM shard.params", (offset,))
+        conn.execute("DETACH DATABASE shard")
+        if remove:
+            os.remove(shard)
+        merged += runs
+    conn.close()
+    if remove and shards and not os.listdir(shard_dir(db_path)):
+        os.rmdir(shard_dir(db_path))
+    print("Merged {} runs from {} shards into {}".format(merged, len(shards), db_path))
+
+
+def insert_run(conn, fs, masked, model, folds, results, p0, p_labels, status=None, method=None, fs_hash=None,
+               pts=None, maxiter=None, evaluations=None, started=None, seconds=None):
+    """Write one optimisation result (as returned by optimise_manual.fit_statistics) in a single transaction."""
+    labels = [label.strip() for label in p_labels.split(",")]
+    if started is not None:
+        started = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(started))
+    with conn:
+        cursor = conn.execute(
+            "INSERT INTO runs (pop, mask, model, folds, method, log_likelihood, aic, chi_squared, theta, status, "
+            "fs_hash, pts, maxiter, evaluations, started, seconds, host, pid) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (fs, masked, model, folds, method, float(results[0]), float(results[1]), float(results[2]),
+             float(results[3]), status, fs_hash, None if pts is None else ",".join(map(str, pts)), maxiter,
+             evaluations, started, seconds, socket.gethostname(), os.getpid()))
+        run_id = cursor.lastrowid
+        conn.executemany("INSERT INTO params (run_id, position, label, initial, optimised) VALUES (?, ?, ?, ?, ?)",
+                         [(run_id, i, labels[i] if i < len(labels) else None, float(p0[i]), float(p))
+                          for i, p in enumerate(results[4])])
+    return run_id
+
+
+def read_runs(conn, model=None):
+    """
+    Return the header and rows of the runs, one column per parameter of the model.
+
+    Without a model the parameters are joined with commas, as in dadi_optimisation.txt.
+    """
+    where, args = "", ()
+    if model is not None:
+        where, args = " WHERE model = ?", (model,)
+    runs = conn.execute("SELECT run_id, pop, mask, model, folds, log_likelihood, aic, chi_squared, theta, status "
+                        "FROM runs" + where + " ORDER BY run_id", args).fetchall()
+    params = {}
+    for run_id, label, initial, optimised in conn.execute(
+            "SELECT run_id, label, initial, optimised FROM params ORDER BY run_id, position"):
+        params.setdefault(run_id, []).append((label, initial, optimised))
+
+    rows = []
+    if model is None:
+        for run in runs:
+            p = params.get(run[0], [])
+            rows.append(list(run[1:9]) + [",".join(str(round(x[1], 4)) for x in p),
+                                          ",".join(str(round(x[2], 4)) for x in p),
+                                          ", ".join(x[0] or "" for x in p), run[9]])
+        return HEADER, rows
+    labels = [x[0] for x in params.get(runs[0][0], [])] if runs else []
+    for run in runs:
+        rows.append(list(run[1:10]) + [x[2] for x in params.get(run[0], [])])
+    return HEADER[:8] + ["status"] + labels, rows
+
+
+def export_tsv(conn, out_name, model=None):
+    """Write every run in the dadi_optimisation.txt layout, or the runs of one model with a column per parameter."""
+    header, rows = read_runs(conn, model)
+    with open(out_name, "w") as out:
+        out.write("\t".join(header) + "\n")
+        for row in rows:
+            out.write("\t".join(str(x) for x in row) + "\n")
+    print("Exported {} runs to {}".format(len(rows), out_name))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        prog="Results database",
+        description="Merge the shard databases of a results database and export its results to a tab-separated "
+                    "file.",
+        usage="%(prog)s [options] <db> [out_file]"
+    )
+    parser.add_argument(
+        "db",
+        help="SQLite results database written by optimise_manual.py --db."
+    )
+    parser.add_argument(
+        "out_file", nargs="?",
+        help="Tab-separated output file."
+    )
+    parser.add_argument(
+        "--merge",
+        action="store_true",
+        help="First merge the shard databases (<db>.shards/) written by optimise_manual.py into the database."
+    )
+    parser.add_argument(
+        "-m", "--model",
+        help="Only export this model, with one column per parameter."
+    )
+    args = parser.parse_args()
+
+    if args.merge:
+        merge(args.db)
+    elif os.path.isdir(shard_dir(args.db)):
+        print("Warning: {} has shards that are not merged yet, see --merge".format(args.db))
+    if args.out_file is not None:
+        export_tsv(connect_readonly(args.db), args.out_file, args.model)
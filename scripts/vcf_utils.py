@@ -0,0 +1,641 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+@author: Katharine Prata
+@date created: 18/10/26
+@description: Streaming VCF parsing and allele count caches for make_fs.py and nonparametric_bootstrap_subsample.py.
+
+dadi.Misc.make_data_dict_vcf keeps a dictionary entry for every SNP of the VCF before Spectrum.from_data_dict counts
+them. Here the VCF (plain or gzipped/bgzipped .vcf.gz) is read in chunks of CHUNK_SITES sites into arrays of, for
+every site and population of the popfile,
+    counts: called and derived alleles (as make_data_dict_vcf and count_data_dict without subsampling),
+    genotypes: genotyped individuals (diploid) with 0, 1 and 2 derived alleles, that subsampling draws from,
+with the contig, position and whether each site was polarised by an ancestral allele (derived counts are of the ALT
+allele otherwise).
+
+Spectra are built from these arrays rather than from a data dictionary: sites called in exactly the projected sample
+sizes (e.g., subsampled) go into one bincount over the flattened spectrum (histogram), and the others are grouped by
+SNP configuration and projected a block of configurations at a time (project). spectrum_from_vcf reduces each chunk
+to a histogram or configuration counts, so memory depends on the size of the spectrum and the number of distinct
+configurations rather than the number of sites.
+The chunks are also written, one at a time as they are read, to an .npz cache in CACHE_DIR named after the hashes of
+the VCF and popfile contents (count_chunks), so that later spectra of the same VCF (any fold, projection or
+subsample) read the chunks from the cache rather than parsing the VCF, still one chunk at a time. The hashes are
+kept in the cache directory by path, size and modification time, so a VCF is only hashed again when it changes.
+load_counts concatenates
+the chunks of all the sites, for the bootstraps. population_spectra makes the spectra of any populations of a
+multi-population VCF (e.g., every pair and triple) from one pass over its chunks.
+
+Subsampling draws subsample[pop] of the genotyped individuals of each population without replacement, as
+make_data_dict_vcf does, but from the genotype counts rather than with make_data_dict_vcf's draws of numpy's random
+state, so subsampled spectra differ from dadi's for the same seed.
+
+Compatible with python 3.6.11 and dadi 2.1.1
+"""
+
+import collections
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import zipfile
+import numpy
+import dadi
+from dadi.Numerics import _cached_projection
+
+CHUNK_SITES = 100000
+# Spectrum entries per block of SNP configurations projected at once.
+PROJECTION_BLOCK = 2 ** 16
+CACHE_DIR = "../data/vcf/cache/"
+# Change when the cached arrays change, so that old caches are not used.
+CACHE_VERSION = 2
+# Hashes of the VCFs and popfiles in a cache directory, by path, size and modification time (cached_hash).
+HASH_INDEX = "hashes.json"
+CHUNK_KEYS = ["contig", "pos", "counts", "genotypes", "polarized"]
+BASES = ['A', 'C', 'G', 'T']
+
+
+def open_text(path):
+    """Open a plain or gzipped (including bgzipped) text file for reading."""
+    if os.path.splitext(path)[1] == '.gz':
+        return gzip.open(path, 'rt')
+    return open(path)
+
+
+def vcf_path(snps, vcf_dir="../data/vcf/"):
+    """Path to the VCF of snps in vcf_dir, <snps>.vcf or else <snps>.vcf.gz."""
+    path = os.path.join(vcf_dir, snps + ".vcf")
+    if not os.path.isfile(path) and os.path.isfile(path + ".gz"):
+        return path + ".gz"
+    return path
+
+
+def read_popfile(pop_path):
+    """Dictionary of sample name: population name, as dadi reads popfiles."""
+    with open_text(pop_path) as popinfo_file:
+        return dadi.Misc._get_popinfo(popinfo_file)
+
+
+def popfile_pops(pop_path):
+    """Populations of a popfile, in the order they first appear."""
+    return list(collections.OrderedDict.fromkeys(read_popfile(pop_path).values()))
+
+
+def _outgroup(info):
+    """Ancestral allele from the INFO column, or '-' if it is missing or not a single base."""
+    for field in info.split(';'):
+        if field.startswith('AA=') or field.startswith('AA_ensembl=') or field.startswith('AA_chimp='):
+            outgroup_allele = field.split('=')[1].upper().split("|")[0]
+            return outgroup_allele if outgroup_allele in BASES else '-'
+    return '-'
+
+
+def _site(samples, poplist, n_pops, gtindex, dpindex, covindex):
+    """
+    Reference and alternative allele calls (n_pops, 2) as make_data_dict_vcf without subsampling, and the genotyped
+    individuals with 0, 1 and 2 alternative alleles (n_pops, 3) as make_data_dict_vcf picks them for subsampling.
+    """
+    calls = numpy.zeros((n_pops, 2), dtype=int)
+    genotypes = numpy.zeros((n_pops, 3), dtype=int)
+    for pop, sample in zip(poplist, samples):
+        if pop is None:
+            continue
+        fields = sample.split(':')
+        gt = fields[gtindex]
+        dp = fields[dpindex] if dpindex is not None else None
+        if '.' not in gt and not (dp == '0' or dp == '.'):
+            genotypes[pop, gt[::2].count('1')] += 1
+        # make_data_dict_vcf only skips missing samples (DP=0 or AD=0,0) when there is an AD field.
+        try:
+            if fields[covindex] == '0,0' or fields[dpindex] == '0':
+                continue
+        except (IndexError, TypeError):
+            pass
+        calls[pop] += gt[::2].count('0'), gt[::2].count('1')
+    return calls, genotypes
+
+
+def _chunk(contig, pos, counts, genotypes, polarized):
+    """Arrays of the sites of a chunk."""
+    return {"contig": numpy.array(contig), "pos": numpy.array(pos, dtype=numpy.int64),
+            "counts": numpy.array(counts, dtype=numpy.uint16), "genotypes": numpy.array(genotypes, dtype=numpy.uint16),
+            "polarized": numpy.array(polarized, dtype=bool)}
+
+
+def read_chunks(vcf_path, pop_path, filter=True, chunk_sites=CHUNK_SITES):
+    """
+    Read the biallelic SNPs of a VCF in chunks of chunk_sites sites.
+
+    Yields a dictionary of arrays per chunk: contig, pos, counts (sites, pops, 2) of called and derived alleles,
+    genotypes (sites, pops, 3) and polarized (sites,), with the populations in popfile_pops order.
+    """
+    pops = popfile_pops(pop_path)
+    popinfo_dict = read_popfile(pop_path)
+    pop_index = {pop: ii for ii, pop in enumerate(pops)}
+    poplist = None
+    contig, pos, counts, genotypes, polarized = [], [], [], [], []
+    with open_text(vcf_path) as vcf_file:
+        for line in vcf_file:
+            if line.startswith('##'):
+                continue
+            if line.startswith('#'):
+                header_cols = line.split()
+                if len(header_cols) <= 9:
+                    raise ValueError("No samples in VCF file")
+                poplist = [pop_index.get(popinfo_dict.get(sample)) for sample in header_cols[9:]]
+                continue
+
+            cols = line.split("\t")
+            if filter and cols[6] != 'PASS' and cols[6] != '.':
+                continue
+            ref, alt = (allele.upper() for allele in cols[3:5])
+            if ref not in BASES or alt not in BASES:
+                continue
+
+            fmt = cols[8].split(':')
+            gtindex = fmt.index('GT')
+            dpindex = fmt.index('DP') if 'DP' in fmt else None
+            covindex = fmt.index('AD') if 'AD' in fmt else None
+            calls, site_genotypes = _site(cols[9:], poplist, len(pops), gtindex, dpindex, covindex)
+
+            # As count_data_dict, the derived allele is the one that differs from the ancestral allele.
+            outgroup_allele = _outgroup(cols[7])
+            if outgroup_allele == alt:
+                calls = calls[:, ::-1]
+                site_genotypes = site_genotypes[:, ::-1]
+            contig.append(cols[0])
+            pos.append(int(cols[1]))
+            counts.append(numpy.column_stack([calls.sum(axis=1), calls[:, 1]]))
+            genotypes.append(site_genotypes)
+            polarized.append(outgroup_allele in (ref, alt))
+
+            if len(pos) == chunk_sites:
+                yield _chunk(contig, pos, counts, genotypes, polarized)
+                contig, pos, counts, genotypes, polarized = [], [], [], [], []
+    if pos:
+        yield _chunk(contig, pos, counts, genotypes, polarized)
+
+
+def file_hash(path, block=2 ** 20):
+    """SHA-256 of the contents of a file."""
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for data in iter(lambda: f.read(block), b''):
+            sha.update(data)
+    return sha.hexdigest()
+
+
+def _umask():
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+def _read_hashes(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def cached_hash(path, cache_dir):
+    """
+    file_hash of a file, kept in the HASH_INDEX of cache_dir under its path, size and modification time, so that
+    the file is only hashed again when it changes.
+    """
+    stat = os.stat(path)
+    # Taken before hashing, so that a file changed while it is hashed does not match its entry.
+    entry = [stat.st_size, stat.st_mtime_ns]
+    key = os.path.realpath(path)
+    index_path = os.path.join(cache_dir, HASH_INDEX)
+    hashes = _read_hashes(index_path)
+    if hashes.get(key, [None, None])[:2] == entry:
+        return hashes[key][2]
+
+    digest = file_hash(path)
+    os.makedirs(cache_dir, exist_ok=True)
+    # Read again, as another job may have added to it, and replaced whole so that readers never see part of it.
+    hashes = _read_hashes(index_path)
+    hashes[key] = entry + [digest]
+    fd, tmp = tempfile.mkstemp(suffix=".json", prefix=HASH_INDEX + ".", dir=cache_dir)
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(hashes, f, indent=1, sort_keys=True)
+        os.chmod(tmp, 0o666 & ~_umask())
+        os.replace(tmp, index_path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return digest
+
+
+def cache_path(vcf_path, pop_path, cache_dir=None):
+    """Cache file of a VCF and popfile in cache_dir (CACHE_DIR), named after the VCF and the hash of their contents."""
+    cache_dir = CACHE_DIR if cache_dir is None else cache_dir
+    key = hashlib.sha256("{} {} {}".format(cached_hash(vcf_path, cache_dir), cached_hash(pop_path, cache_dir),
+                                           CACHE_VERSION).encode())
+    name = os.path.basename(vcf_path).split(".vcf")[0]
+    return os.path.join(cache_dir, "{}.{}.npz".format(name, key.hexdigest()[:16]))
+
+
+def _concatenate(chunks, pops):
+    """The arrays of all the chunks, and pops, the populations of their columns."""
+    chunks = list(chunks)
+    data = {key: numpy.concatenate([chunk[key] for chunk in chunks]) for key in CHUNK_KEYS} if chunks else {}
+    data["pops"] = numpy.array(pops)
+    return data
+
+
+def parse_counts(vcf_path, pop_path, filter=True, chunk_sites=CHUNK_SITES):
+    """The arrays of read_chunks for all the sites of a VCF, and pops, the populations of their columns."""
+    return _concatenate(read_chunks(vcf_path, pop_path, filter, chunk_sites), popfile_pops(pop_path))
+
+
+def _write_array(archive, name, array):
+    """Add array to an open .npz zip archive as name.npy, as numpy.savez does."""
+    with archive.open(name + ".npy", "w", force_zip64=True) as member:
+        numpy.lib.format.write_array(member, numpy.asanyarray(array), allow_pickle=False)
+
+
+def _cached_chunks(path):
+    """The chunks of a cache written by count_chunks, read one at a time, with pops."""
+    print("Loading allele counts from {}".format(path))
+    with numpy.load(path) as cached:
+        pops = cached["pops"]
+        for ii in range(int(cached["chunks"])):
+            chunk = {key: cached["chunk{}_{}".format(ii, key)] for key in CHUNK_KEYS}
+            chunk["pops"] = pops
+            yield chunk
+
+
+def _caching_chunks(vcf_path, pop_path, path, chunk_sites):
+    """The chunks of read_chunks, with pops, each written to the cache at path before it is yielded."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    pops = numpy.array(popfile_pops(pop_path))
+    # Written under a temporary name, unique to this job, so that a killed job (or a reader that stops early)
+    # leaves no partial cache and jobs caching the same VCF at once do not write to the same file.
+    fd, tmp = tempfile.mkstemp(suffix=".npz", prefix=os.path.basename(path) + ".", dir=os.path.dirname(path))
+    n_chunks = n_sites = 0
+    try:
+        with os.fdopen(fd, "wb") as f, zipfile.ZipFile(f, "w", zipfile.ZIP_STORED, allowZip64=True) as archive:
+            _write_array(archive, "pops", pops)
+            for chunk in read_chunks(vcf_path, pop_path, chunk_sites=chunk_sites):
+                for key in CHUNK_KEYS:
+                    _write_array(archive, "chunk{}_{}".format(n_chunks, key), chunk[key])
+                n_chunks += 1
+                n_sites += len(chunk["pos"])
+                chunk["pops"] = pops
+                yield chunk
+            _write_array(archive, "chunks", n_chunks)
+        # mkstemp makes the file private, but the cache may be shared, so give it the usual permissions.
+        os.chmod(tmp, 0o666 & ~_umask())
+        os.replace(tmp, path)
+        print("Allele counts of {} sites cached in {}".format(n_sites, path))
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def count_chunks(vcf_path, pop_path, cache=True, chunk_sites=CHUNK_SITES, cache_dir=None):
+    """
+    The chunks of read_chunks (with pops, the populations of their columns), from the cache of the VCF and popfile
+    if there is one. Otherwise the VCF is read in chunks of chunk_sites sites, and with cache each chunk is also
+    written to the cache, so that only one chunk of sites is ever in memory.
+    """
+    if not cache:
+        pops = numpy.array(popfile_pops(pop_path))
+        return (dict(chunk, pops=pops) for chunk in read_chunks(vcf_path, pop_path, chunk_sites=chunk_sites))
+    path = cache_path(vcf_path, pop_path, cache_dir)
+    if os.path.isfile(path):
+        return _cached_chunks(path)
+    return _caching_chunks(vcf_path, pop_path, path, chunk_sites)
+
+
+def load_counts(vcf_path, pop_path, cache_dir=None):
+    """The arrays of parse_counts, from the cache of the VCF and popfile if there is one, else parsed and cached."""
+    return _concatenate(count_chunks(vcf_path, pop_path, cache_dir=cache_dir), popfile_pops(pop_path))
+
+
+def _hypergeometric(ngood, nbad, nsample):
+    """numpy.random.hypergeometric, allowing samples of size 0."""
+    drawn = numpy.zeros(ngood.shape, dtype=int)
+    some = nsample > 0
+    drawn[some] = numpy.random.hypergeometric(ngood[some], nbad[some], nsample[some])
+    return drawn
+
+
+def subsampled_sites(data, subsample):
+    """Sites with at least subsample[pop] genotyped individuals in each population of subsample."""
+    columns = [ii for ii, pop in enumerate(data["pops"]) if pop in subsample]
+    sizes = [subsample[data["pops"][ii]] for ii in columns]
+    return numpy.all(data["genotypes"][:, columns].astype(int).sum(axis=2) >= sizes, axis=1)
+
+
+def select(data, pop_ids, subsample=None):
+    """
+    Called and derived allele counts (sites, len(pop_ids)) and polarized (sites,) of the pop_ids populations.
+
+    With subsample, a dictionary of population: individuals, only the subsampled_sites are kept, and the alleles of
+    subsample[pop] individuals drawn at random are counted.
+    """
+    columns = [list(data["pops"]).index(pop) for pop in pop_ids]
+    if subsample is None:
+        counts = data["counts"][:, columns].astype(int)
+        return counts[..., 0], counts[..., 1], data["polarized"]
+
+    keep = subsampled_sites(data, subsample)
+    genotypes = data["genotypes"][keep][:, columns].astype(int)
+    n = numpy.broadcast_to([subsample[pop] for pop in pop_ids], genotypes.shape[:2])
+    # Draw the individuals with 0 derived alleles, then those with 1 among the rest.
+    hom_ancestral = _hypergeometric(genotypes[..., 0], genotypes[..., 1] + genotypes[..., 2], n)
+    het = _hypergeometric(genotypes[..., 1], genotypes[..., 2], n - hom_ancestral)
+    derived = het + 2 * (n - hom_ancestral - het)
+    return 2 * n, derived, data["polarized"][keep]
+
+
+def configurations(called, derived, polarized):
+    """
+    Distinct SNP configurations of the sites in the order they first occur, as count_data_dict: arrays of their
+    called and derived counts, whether they are polarized, and the number of sites of each.
+    """
+    rows = numpy.column_stack([called, derived, polarized]).astype(numpy.int64)
+    # One integer per configuration, so that numpy.unique sorts numbers rather than rows.
+    keys = numpy.ravel_multi_index(tuple(rows.T), tuple(rows.max(axis=0) + 1)) if len(rows) else rows[:, 0]
+    unique, first, counts = numpy.unique(keys, return_index=True, return_counts=True)
+    order = numpy.argsort(first)
+    configs = rows[first[order]]
+    n_pops = called.shape[1]
+    return configs[:, :n_pops], configs[:, n_pops:2 * n_pops], configs[:, -1].astype(bool), counts[order]
+
+
+def count_configurations(chunks, count_dict=None):
+    """
+    Add the SNP configurations of each (called, derived, polarized) chunk to count_dict, a dictionary of
+    (called, derived, polarized): number of SNPs in the order the configurations first occur, as count_data_dict.
+    """
+    if count_dict is None:
+        count_dict = collections.OrderedDict()
+    for chunk in chunks:
+        for called, derived, polarized, count in zip(*configurations(*chunk)):
+            key = (tuple(int(x) for x in called), tuple(int(x) for x in derived), bool(polarized))
+            count_dict[key] = count_dict.get(key, 0) + int(count)
+    return count_dict
+
+
+def _projection_rows(projection, called, derived):
+    """dadi's projection of each (called, derived) pair of one population to projection, computed once per pair."""
+    size = called.max() + 1
+    pairs, index = numpy.unique(called * size + derived, return_inverse=True)
+    table = numpy.array([_cached_projection(projection, int(pair // size), int(pair % size)) for pair in pairs])
+    return table[index.ravel()]
+
+
+def project(called, derived, polarized, counts, projections, pop_ids, polarize=True):
+    """
+    Spectrum of SNP configurations (see configurations) projected to projections, as Spectrum._from_count_dict.
+
+    The projection of each configuration is the product of one row per population from a table of dadi's
+    projections, and a block of configurations is projected at once. The blocks are added up with a cumulative sum
+    over the configurations in their order, the same additions as dadi's loop, so the spectrum is bit-identical to
+    dadi's. Configurations with fewer calls than projections in a population add nothing and are skipped.
+    """
+    shape = tuple(numpy.array(projections) + 1)
+    total = numpy.zeros(shape)
+    keep = numpy.all(called >= projections, axis=1) & (polarized | (not polarize))
+    called, derived, counts = called[keep], derived[keep], counts[keep].astype(float)
+    if len(counts):
+        rows = [_projection_rows(projections[ii], called[:, ii], derived[:, ii]) for ii in range(len(shape))]
+        block = max(1, PROJECTION_BLOCK // int(numpy.prod(shape)))
+        for start in range(0, len(counts), block):
+            end = start + block
+            fs_proj = None
+            for ii, pop_rows in enumerate(rows):
+                # Broadcast each population's rows along its own axis of the spectrum.
+                contrib = pop_rows[start:end].reshape((-1, ) + tuple(n if jj == ii else 1
+                                                                     for jj, n in enumerate(shape)))
+                fs_proj = contrib if fs_proj is None else fs_proj * contrib
+            fs_proj = fs_proj * counts[start:end].reshape((-1, ) + (1, ) * len(shape))
+            fs_proj[0] += total
+            numpy.cumsum(fs_proj, axis=0, out=fs_proj)
+            total = fs_proj[-1]
+
+    fs_total = dadi.Spectrum(numpy.zeros(shape), pop_ids=pop_ids, mask_corners=True)
+    # As dadi's in-place addition, which leaves the masked corners at 0.
+    fs_total += total
+    return fs_total if polarize else fs_total.fold()
+
+
+def count_dict_configurations(count_dict, n_pops):
+    """The configurations of a count_configurations dictionary as the arrays of configurations."""
+    called = numpy.array([config[0] for config in count_dict], dtype=int).reshape(-1, n_pops)
+    derived = numpy.array([config[1] for config in count_dict], dtype=int).reshape(-1, n_pops)
+    polarized = numpy.array([config[2] for config in count_dict], dtype=bool)
+    counts = numpy.array(list(count_dict.values()), dtype=int)
+    return called, derived, polarized, counts
+
+
+def project_count_dict(count_dict, projections, pop_ids, polarize=True):
+    """project the configurations of a count_configurations dictionary."""
+    return project(*count_dict_configurations(count_dict, len(projections)), projections, pop_ids, polarize)
+
+
+def histogram(derived, projections, groups=None, n_groups=1, weights=None):
+    """
+    Number of sites with each derived allele configuration (an array of shape projections + 1), in one bincount
+    over the flattened spectrum. With groups (e.g., fragments), an array of shape (n_groups, ...) with the sites of
+    each group. weights are the number of sites of each row of derived (e.g., of configurations), if not 1.
+    """
+    shape = tuple(numpy.array(projections) + 1)
+    bins = numpy.ravel_multi_index(tuple(derived.T), shape)
+    if groups is not None:
+        bins = bins + groups * int(numpy.prod(shape))
+        shape = (n_groups, ) + shape
+    return numpy.bincount(bins, weights, minlength=int(numpy.prod(shape))).reshape(shape)
+
+
+def _spectrum(data, pop_ids, polarize):
+    """Spectrum of site counts, folded unless polarize, as Spectrum._from_count_dict makes it."""
+    fs = dadi.Spectrum(data.astype(float), pop_ids=pop_ids, mask_corners=True)
+    return fs if polarize else fs.fold()
+
+
+def spectrum_from_counts(called, derived, polarized, pop_ids, projections, polarize=True):
+    """
+    Spectrum of the sites of select, as Spectrum.from_data_dict(..., polarized=polarize).
+
+    Sites called in fewer than projections chromosomes are left out as in dadi. If the others are all called in
+    exactly projections chromosomes (e.g., subsampled), the spectrum is their histogram, otherwise their configurations
+    are projected (see project).
+    """
+    if polarize:
+        called, derived, polarized = called[polarized], derived[polarized], polarized[polarized]
+    enough = numpy.all(called >= projections, axis=1)
+    called, derived, polarized = called[enough], derived[enough], polarized[enough]
+    if numpy.all(called == projections):
+        return _spectrum(histogram(derived, projections), pop_ids, polarize)
+    return project(*configurations(called, derived, polarized), projections, pop_ids, polarize)
+
+
+def spectrum_from_vcf(vcf_path, pop_path, pop_ids, projections, polarized=True, subsample=None, cache=True,
+                      chunk_sites=CHUNK_SITES):
+    """
+    Spectrum of a VCF as Spectrum.from_data_dict(make_data_dict_vcf(vcf_path, pop_path, subsample), pop_ids,
+    projections, polarized=polarized), from the chunks of the allele count cache, or of the VCF read in chunks of
+    chunk_sites sites (and cached unless cache=False), without keeping the sites (see count_chunks).
+    """
+    chunks = (select(chunk, pop_ids, subsample) for chunk in count_chunks(vcf_path, pop_path, cache, chunk_sites))
+    if subsample is not None:
+        # Subsampled sites are all called in the projected sample sizes, so the chunks add up to one histogram.
+        total = sum(histogram(derived[site_polarized | (not polarized)], projections)
+                    for called, derived, site_polarized in chunks)
+        return _spectrum(total, pop_ids, polarized)
+    return project_count_dict(count_configurations(chunks), projections, pop_ids, polarized)
+
+
+def _unfolded(configs, projections, pop_ids):
+    """
+    Unfolded spectra of SNP configurations, of all the sites (counting the ALT allele where a site is not polarized)
+    and of the polarized sites only, the same spectrum if every site is polarized.
+    """
+    called, derived, polarized, counts = configs
+    enough = numpy.all(called >= projections, axis=1)
+    if numpy.all(called[enough] == projections):
+        derived, polarized, counts = derived[enough], polarized[enough], counts[enough]
+        fs_all = _spectrum(histogram(derived, projections, weights=counts), pop_ids, True)
+        if polarized.all():
+            return fs_all, fs_all
+        return fs_all, _spectrum(histogram(derived[polarized], projections, weights=counts[polarized]), pop_ids,
+                                 True)
+    fs_all = project(called, derived, numpy.ones(len(counts), dtype=bool), counts, projections, pop_ids)
+    if polarized.all():
+        return fs_all, fs_all
+    return fs_all, project(called, derived, polarized, counts, projections, pop_ids)
+
+
+def _subsample_key(subsample):
+    """Hashable subsample dictionary, None without subsampling."""
+    return None if subsample is None else tuple(sorted(subsample.items()))
+
+
+def _variant_spectra(configs, pop_ids, variants):
+    """
+    Spectra of (projections, subsample, polarize) variants, from configs, a dictionary of the SNP configurations of
+    the sites of each _subsample_key. Each sample size gives one unfolded spectrum: a folded variant is the fold of
+    the unfolded spectrum of all the sites, which is what Spectrum.from_data_dict(..., polarized=False) folds.
+    """
+    unfolded = {}
+    spectra = []
+    for projections, subsample, polarize in variants:
+        key = (tuple(projections), _subsample_key(subsample))
+        if key not in unfolded:
+            unfolded[key] = _unfolded(configs[key[1]], projections, pop_ids)
+        fs_all, fs_polarized = unfolded[key]
+        spectra.append(fs_polarized.copy() if polarize else fs_all.fold())
+    return spectra
+
+
+def spectrum_variants(data, pop_ids, variants):
+    """
+    Spectra of several (projections, subsample, polarize) variants of the same sites, each as
+    spectrum_from_counts(*select(data, pop_ids, subsample), pop_ids, projections, polarize).
+
+    The SNP configurations of the sites are found once (and a subsample drawn once) for every subsample, and shared
+    by the folds and projections of the variants (see _variant_spectra).
+    """
+    configs = {}
+    for projections, subsample, polarize in variants:
+        if _subsample_key(subsample) not in configs:
+            configs[_subsample_key(subsample)] = configurations(*select(data, pop_ids, subsample))
+    return _variant_spectra(configs, pop_ids, variants)
+
+
+def population_spectra(vcf_path, pop_path, requests, cache=True, chunk_sites=CHUNK_SITES):
+    """
+    Spectra of (pop_ids, projections, subsample, polarize) requests of the populations of one multi-population VCF
+    (e.g., every pair and triple of its populations), as spectrum_variants of the requests of each pop_ids, from one
+    pass over the chunks of the VCF or its allele count cache (see count_chunks), in which the SNP configurations
+    of every pop_ids and subsample are counted.
+    """
+    sets = collections.OrderedDict()
+    for pop_ids, projections, subsample, polarize in requests:
+        sets.setdefault(tuple(pop_ids), collections.OrderedDict())[_subsample_key(subsample)] = subsample
+
+    count_dicts = {pop_ids: {key: collections.OrderedDict() for key in subsamples}
+                   for pop_ids, subsamples in sets.items()}
+    for chunk in count_chunks(vcf_path, pop_path, cache, chunk_sites):
+        for pop_ids, subsamples in sets.items():
+            for key, subsample in subsamples.items():
+                count_configurations([select(chunk, list(pop_ids), subsample)], count_dicts[pop_ids][key])
+    configs = {pop_ids: {key: count_dict_configurations(count_dict, len(pop_ids))
+                         for key, count_dict in count_dicts[pop_ids].items()}
+               for pop_ids in sets}
+
+    spectra = [None] * len(requests)
+    for pop_ids in sets:
+        indices = [ii for ii, request in enumerate(requests) if tuple(request[0]) == pop_ids]
+        variants = [requests[ii][1:] for ii in indices]
+        for ii, fs in zip(indices, _variant_spectra(configs[pop_ids], list(pop_ids), variants)):
+            spectra[ii] = fs
+    return spectra
+
+
+def fragments(data, chunk_size):
+    """
+    Index of the fragment of chunk_size basepairs of each site, as Misc.fragment_data_dict, and the number of
+    fragments (including the empty fragments between sites of a contig).
+    """
+    contigs, contig_index = numpy.unique(data["contig"], return_inverse=True)
+    chunk = numpy.maximum(data["pos"] - 1, 0) // chunk_size
+    n_chunks = numpy.zeros(len(contigs), dtype=int)
+    numpy.maximum.at(n_chunks, contig_index, chunk + 1)
+    offsets = numpy.concatenate([[0], numpy.cumsum(n_chunks)[:-1]])
+    return offsets[contig_index] + chunk, int(n_chunks.sum())
+
+
+def last_sites(data, keep):
+    """
+    Of the sites in keep (a boolean array), those that are the last site in keep at their contig and position, as in
+    dadi's data dictionaries, where a later site of the VCF at the same CHROM_POS replaces an earlier one.
+    """
+    sites = numpy.flatnonzero(keep)
+    last = numpy.zeros(len(keep), dtype=bool)
+    if not len(sites):
+        return last
+    _, contig_index = numpy.unique(data["contig"], return_inverse=True)
+    site = contig_index.astype(numpy.int64) * (int(data["pos"].max()) + 1) + data["pos"]
+    _, first_reversed = numpy.unique(site[sites][::-1], return_index=True)
+    last[sites[len(sites) - 1 - first_reversed]] = True
+    return last
+
+
+def bootstraps_subsample(data, pop_ids, subsample, Nboot, chunk_size, polarized=True):
+    """
+    Bootstrap spectra of subsampled data, as Misc.bootstraps_subsample_vcf: every bootstrap subsamples the sites
+    again and resamples fragments of chunk_size basepairs with replacement.
+
+    As in dadi, only the last of the subsampled sites at each contig and position is used, and the fragments are
+    those of the subsampled sites. The random draws differ from dadi's, so the bootstraps differ for the same seed:
+    each bootstrap draws the subsample of every site and population from numpy.random (see select), and then the
+    fragments with numpy.random.randint, where dadi draws the individuals of each site with numpy.random.choice
+    and the fragments with python's random.choices.
+    """
+    projections = [subsample[pop] * 2 for pop in pop_ids]
+    keep = subsampled_sites(data, subsample)
+    unique = last_sites(data, keep)[keep]
+    fragment, n_fragments = fragments({key: data[key][keep][unique] for key in ("contig", "pos")}, chunk_size)
+    bootstraps = []
+    for ii in range(Nboot):
+        called, derived, site_polarized = select(data, pop_ids, subsample)
+        derived, site_polarized = derived[unique], site_polarized[unique]
+        if polarized:
+            derived, site_fragment = derived[site_polarized], fragment[site_polarized]
+        else:
+            site_fragment = fragment
+        # The spectrum of every fragment at once, weighted by the times each fragment is drawn.
+        spectra = histogram(derived, projections, site_fragment, n_fragments)
+        drawn = numpy.bincount(numpy.random.randint(n_fragments, size=n_fragments), minlength=n_fragments)
+        bootstraps.append(_spectrum(numpy.tensordot(drawn, spectra, axes=1), pop_ids, polarized))
+    return bootstraps